@@ -5,16 +5,21 @@ Main application entry point with API routes and configuration.
 
 import logging
 import sys
+import threading
+import time
 from pathlib import Path
-from flask import Flask, jsonify
+from flask import Flask, request
+from werkzeug.exceptions import HTTPException, NotFound
 from flask_cors import CORS
 
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from backend.config import get_config
-from backend.models import init_db
+from backend.models import db, init_db
 from backend.routes import data_bp, correlation_bp
+from backend.services.rate_limit import init_rate_limiter, limiter
+from backend.utils.responses import ORJSONProvider, ORJSONResponse, dumps, json_response
 import backend.routes.correlation_extended  # Registers /matrix and /trends routes
 
 # Configure logging
@@ -29,6 +34,89 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Static responses, serialized once at import
+HEALTH_BODY = dumps({
+    'status': 'healthy',
+    'service': 'Data Weaver Dashboard',
+    'version': '1.0.0'
+})
+
+ROOT_BODY = dumps({
+    'service': 'Data Weaver Dashboard API',
+    'version': '1.0.0',
+    'endpoints': {
+        'health': '/api/health',
+        'data': {
+            'refresh': 'POST /api/data/refresh',
+            'timeseries': 'GET /api/data/timeseries'
+        },
+        'correlations': {
+            'analyze': 'POST /api/correlations/analyze',
+            'get': 'GET /api/correlations/<id>',
+            'recent': 'GET /api/correlations/recent',
+            'search': 'GET /api/correlations/search',
+            'insights': 'GET /api/correlations/insights/<id>'
+        }
+    }
+})
+
+NOT_FOUND_BODY = dumps({'error': 'Not found', 'message': str(NotFound())})
+
+# Server errors are logged with tracebacks at most once per interval so an
+# error storm doesn't saturate the log file
+ERROR_LOG_INTERVAL_SECONDS = 1.0
+_error_log_lock = threading.Lock()
+_last_error_logged_at = 0.0
+_suppressed_errors = 0
+
+
+def _log_server_error(message):
+    """Log a server error with its traceback, rate limited."""
+    global _last_error_logged_at, _suppressed_errors
+    
+    with _error_log_lock:
+        now = time.monotonic()
+        if now - _last_error_logged_at < ERROR_LOG_INTERVAL_SECONDS:
+            _suppressed_errors += 1
+            return
+        suppressed = _suppressed_errors
+        _last_error_logged_at = now
+        _suppressed_errors = 0
+    
+    if suppressed:
+        message = f"{message} ({suppressed} similar errors suppressed)"
+    logger.error(message, exc_info=True)
+
+
+def not_found(error):
+    """Handle 404 errors."""
+    logger.debug(f"Not found: {request.path}")
+    return ORJSONResponse(NOT_FOUND_BODY, status=404)
+
+
+def rate_limited(error):
+    """Handle rate limit errors."""
+    return json_response({'error': 'Rate limit exceeded', 'message': error.description}, 429)
+
+
+def internal_error(error):
+    """Handle 500 errors."""
+    _log_server_error(f"Internal error: {error}")
+    return json_response({'error': 'Internal server error'}, 500)
+
+
+def handle_exception(error):
+    """Handle all unhandled exceptions."""
+    if isinstance(error, HTTPException):
+        # Other HTTP errors (405, 400, ...) keep their status code
+        return json_response({'error': error.name, 'message': error.description}, error.code)
+    
+    _log_server_error(f"Unhandled exception: {error}")
+    return json_response({
+        'error': 'An unexpected error occurred',
+        'message': str(error)
+    }, 500)
+
 
 def create_app(config_name=None):
     """
@@ -41,6 +129,7 @@ def create_app(config_name=None):
         Flask application instance
     """
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
     
     # Load configuration
     config_class = get_config(config_name)
@@ -49,79 +138,53 @@ def create_app(config_name=None):
     logger.info(f"Starting Data Weaver Dashboard with {config_class.__name__}")
     
     # Initialize extensions
-    # Enable CORS with full support for preflight requests
+    # Enable CORS for the configured origins; preflights are cached for 24h
     CORS(app, 
-         resources={r"/api/*": {"origins": "*"}},
+         resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}},
          supports_credentials=True,
          allow_headers=["Content-Type", "Authorization"],
-         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+         max_age=86400
     )
     init_db(app)
+    init_rate_limiter(app)
     
     # Register blueprints
     app.register_blueprint(data_bp)
     app.register_blueprint(correlation_bp)  # Includes extended routes from correlation_extended.py
     
-    # Health check endpoint
-    @app.route('/api/health', methods=['GET'])
+    # Health check endpoint (not rate limited, used by liveness probes)
+    @app.route('/api/health', methods=['GET'], strict_slashes=False)
+    @limiter.exempt
     def health_check():
         """Health check endpoint."""
-        return jsonify({
-            'status': 'healthy',
-            'service': 'Data Weaver Dashboard',
-            'version': '1.0.0'
-        }), 200
+        return ORJSONResponse(HEALTH_BODY)
     
     # Root endpoint
-    @app.route('/', methods=['GET'])
+    @app.route('/', methods=['GET'], strict_slashes=False)
     def root():
         """Root endpoint with API information."""
-        return jsonify({
-            'service': 'Data Weaver Dashboard API',
-            'version': '1.0.0',
-            'endpoints': {
-                'health': '/api/health',
-                'data': {
-                    'refresh': 'POST /api/data/refresh',
-                    'timeseries': 'GET /api/data/timeseries'
-                },
-                'correlations': {
-                    'analyze': 'POST /api/correlations/analyze',
-                    'get': 'GET /api/correlations/<id>',
-                    'recent': 'GET /api/correlations/recent',
-                    'search': 'GET /api/correlations/search',
-                    'insights': 'GET /api/correlations/insights/<id>'
-                }
-            }
-        }), 200
+        return ORJSONResponse(ROOT_BODY)
     
     # Error handlers
-    @app.errorhandler(404)
-    def not_found(error):
-        """Handle 404 errors."""
-        return jsonify({'error': 'Not found', 'message': str(error)}), 404
-    
-    @app.errorhandler(500)
-    def internal_error(error):
-        """Handle 500 errors."""
-        logger.error(f"Internal error: {error}", exc_info=True)
-        return jsonify({'error': 'Internal server error'}), 500
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(429, rate_limited)
+    app.register_error_handler(500, internal_error)
+    app.register_error_handler(Exception, handle_exception)
     
-    @app.errorhandler(Exception)
-    def handle_exception(error):
-        """Handle all unhandled exceptions."""
-        logger.error(f"Unhandled exception: {error}", exc_info=True)
-        return jsonify({
-            'error': 'An unexpected error occurred',
-            'message': str(error)
-        }), 500
-    
-    # Create database tables
-    with app.app_context():
-        from backend.models import db
+    # Database initialization command
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create all database tables."""
         db.create_all()
         logger.info("Database tables created")
     
+    # Create database tables on startup only where configured (development)
+    if app.config.get('AUTO_CREATE_TABLES', False):
+        with app.app_context():
+            db.create_all()
+            logger.info("Database tables created")
+    
     return app
 
 
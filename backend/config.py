@@ -4,12 +4,64 @@ Handles environment variables and application settings.
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
+from sqlalchemy.pool import StaticPool
 
-# Load environment variables from .env file
 BASE_DIR = Path(__file__).parent.parent
-load_dotenv(BASE_DIR / '.env')
+
+# Marker set once .env has been applied; child processes (gunicorn workers,
+# pytest-xdist) inherit it together with the loaded values
+_ENV_LOADED_MARKER = 'DATAWEAVER_ENV_LOADED'
+_LOADED = False
+
+
+def _ensure_env_loaded():
+    """Load environment variables from the .env file once per process tree."""
+    global _LOADED
+    if _LOADED:
+        return
+    if os.environ.get(_ENV_LOADED_MARKER) != '1':
+        load_dotenv(BASE_DIR / '.env')
+        os.environ[_ENV_LOADED_MARKER] = '1'
+    _LOADED = True
+
+
+_ensure_env_loaded()
+
+
+def build_engine_options(database_uri):
+    """
+    Build SQLAlchemy engine options for a database URI.
+    
+    Server databases get a sized QueuePool with pre-ping and recycling.
+    SQLite gains nothing from a large pool: in-memory databases share a
+    single StaticPool connection, file databases keep SQLAlchemy's default
+    pool but may be used from any worker thread.
+    
+    All engines get a compiled statement cache (default 500 entries in
+    SQLAlchemy) sized for the read endpoints' query variants.
+    """
+    query_cache_size = int(os.getenv('DB_QUERY_CACHE_SIZE', 1200))
+    
+    if database_uri.startswith('sqlite'):
+        options = {
+            'connect_args': {'check_same_thread': False},
+            'query_cache_size': query_cache_size
+        }
+        if ':memory:' in database_uri or database_uri.rstrip('/') == 'sqlite:':
+            options['poolclass'] = StaticPool
+        return options
+    
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 40)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+        'query_cache_size': query_cache_size
+    }
 
 
 class Config:
@@ -26,8 +78,10 @@ class Config:
         'DATABASE_URL',
         f'sqlite:///{BASE_DIR / "dataweaver.db"}'
     )
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    AUTO_CREATE_TABLES = os.getenv('AUTO_CREATE_TABLES', 'false').lower() == 'true'
     
     # Redis Configuration
     REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
@@ -40,12 +94,29 @@ class Config:
     ALPHA_VANTAGE_API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY')
     
     # CORS Settings
-    CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000').split(',')
     
     # API Rate Limiting
     RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', 60))
+    # Worker processes serving the app; each counts its share of the local budget
+    RATE_LIMIT_WORKERS = int(os.getenv('RATE_LIMIT_WORKERS', os.getenv('WEB_CONCURRENCY', 1)))
+    RATELIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
     CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 3600))
     
+    # Response Caching (TTL policies in seconds)
+    RESPONSE_CACHE_TTLS = {
+        'short': 60,
+        'normal': 300,
+        'long': 600,
+        'immutable': 86400
+    }
+    CACHE_FALLBACK = os.getenv('CACHE_FALLBACK', 'true').lower() == 'true'
+    CACHE_STALE_SECONDS = int(os.getenv('CACHE_STALE_SECONDS', 3600))
+    
+    # Correlation reuse: /analyze returns a stored result computed within
+    # this many minutes for the same inputs and dateRange (0 disables)
+    ANALYSIS_REUSE_MINUTES = int(os.getenv('ANALYSIS_REUSE_MINUTES', 15))
+    
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'app.log')
@@ -58,6 +129,7 @@ class DevelopmentConfig(Config):
     """Development environment configuration."""
     DEBUG = True
     SQLALCHEMY_ECHO = True
+    AUTO_CREATE_TABLES = True
     LOG_LEVEL = 'DEBUG'
 
 
@@ -68,7 +140,9 @@ class TestingConfig(Config):
         'DATABASE_TEST_URL',
         'sqlite:///:memory:'  # In-memory database for testing
     )
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(SQLALCHEMY_DATABASE_URI)
     REDIS_DB = 1  # Use separate Redis DB for testing
+    RATELIMIT_ENABLED = False
 
 
 class ProductionConfig(Config):
@@ -105,3 +179,9 @@ def get_config(env=None):
     if env is None:
         env = os.getenv('FLASK_ENV', 'development')
     return config.get(env, config['default'])
+
+
+@lru_cache(maxsize=1)
+def get_settings():
+    """Get the current environment's configuration, resolved once per process."""
+    return get_config()()
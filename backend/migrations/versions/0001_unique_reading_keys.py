@@ -0,0 +1,60 @@
+"""Deduplicate readings and add the (key, timestamp) unique indexes
+
+Ingestion inserts with ON CONFLICT (city|symbol, timestamp) DO NOTHING,
+which needs a unique index on those columns. Tables created by init-db
+before the constraints were added to the models lack it; tables created
+since already have it and are left alone.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-14 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (table, key column, unique index name)
+READING_KEYS = (
+    ('weather_data', 'city', 'uq_weather_city_ts'),
+    ('stock_data', 'symbol', 'uq_stock_symbol_ts'),
+)
+
+
+def _has_unique_key(inspector, table, key_column):
+    """Whether the table already has a unique constraint or index on (key, timestamp)."""
+    wanted = [key_column, 'timestamp']
+    keys = inspector.get_unique_constraints(table) + [
+        index for index in inspector.get_indexes(table) if index.get('unique')
+    ]
+    return any(key['column_names'] == wanted for key in keys)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table, key_column, name in READING_KEYS:
+        if table not in tables or _has_unique_key(inspector, table, key_column):
+            continue
+        # Keep the first stored row of each duplicate group
+        op.execute(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT MIN(id) FROM {table} GROUP BY {key_column}, timestamp)"
+        )
+        op.create_index(name, table, [key_column, 'timestamp'], unique=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, _, name in READING_KEYS:
+        # Only the index made by upgrade(); model-defined constraints stay
+        constraints = {constraint['name'] for constraint in inspector.get_unique_constraints(table)}
+        indexes = {index['name'] for index in inspector.get_indexes(table)}
+        if name in indexes and name not in constraints:
+            op.drop_index(name, table_name=table)
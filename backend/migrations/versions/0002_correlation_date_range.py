@@ -0,0 +1,38 @@
+"""Store the requested dateRange with correlation results
+
+/analyze reuses a fresh result only for the same requested range; older
+rows keep NULL and are never reused.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-14 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector):
+    return {column['name'] for column in inspector.get_columns('correlation_results')}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'correlation_results' not in inspector.get_table_names():
+        return
+    if 'date_range' not in _columns(inspector):
+        op.add_column('correlation_results', sa.Column('date_range', sa.String(64), nullable=True))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'date_range' in _columns(inspector):
+        with op.batch_alter_table('correlation_results') as batch_op:
+            batch_op.drop_column('date_range')
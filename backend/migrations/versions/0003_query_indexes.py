@@ -0,0 +1,85 @@
+"""Add the covering reading indexes and the correlation lookup indexes
+
+Range queries read (key, timestamp) plus the numeric columns from a
+covering index: on SQLite the values are trailing key columns, on
+PostgreSQL INCLUDE columns. get_recent and get_by_city_and_symbol read
+correlation results in calculated_at order from their own indexes.
+Tables created by init-db before the indexes were added to the models
+lack them; indexes already present are left alone.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-14 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# (table, key column, numeric columns, SQLite index name, PostgreSQL index name)
+COVERING_INDEXES = (
+    ('weather_data', 'city', ('temperature', 'humidity', 'precipitation', 'wind_speed'),
+     'idx_weather_city_ts_cov', 'idx_weather_city_ts_incl'),
+    ('stock_data', 'symbol', ('open_price', 'close_price', 'high_price', 'low_price', 'volume'),
+     'idx_stock_symbol_ts_cov', 'idx_stock_symbol_ts_incl'),
+)
+
+# (index name, columns) on correlation_results
+CORRELATION_INDEXES = (
+    ('ix_corr_calc_at', ['calculated_at DESC']),
+    ('ix_corr_city_symbol_calc', ['city', 'symbol', 'calculated_at DESC']),
+)
+
+
+def _index_names(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    for table, key_column, numeric_columns, sqlite_name, postgresql_name in COVERING_INDEXES:
+        if table not in tables:
+            continue
+        indexes = _index_names(inspector, table)
+        if bind.dialect.name == 'postgresql':
+            if postgresql_name not in indexes:
+                op.create_index(
+                    postgresql_name, table, [key_column, 'timestamp'],
+                    postgresql_include=list(numeric_columns)
+                )
+        elif bind.dialect.name == 'sqlite' and sqlite_name not in indexes:
+            op.create_index(sqlite_name, table, [key_column, 'timestamp', *numeric_columns])
+
+    if 'correlation_results' not in tables:
+        return
+    indexes = _index_names(inspector, 'correlation_results')
+    for name, columns in CORRELATION_INDEXES:
+        if name not in indexes:
+            op.create_index(name, 'correlation_results', [sa.text(column) for column in columns])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table, _, _, sqlite_name, postgresql_name in COVERING_INDEXES:
+        if table not in tables:
+            continue
+        indexes = _index_names(inspector, table)
+        for name in (sqlite_name, postgresql_name):
+            if name in indexes:
+                op.drop_index(name, table_name=table)
+
+    if 'correlation_results' not in tables:
+        return
+    indexes = _index_names(inspector, 'correlation_results')
+    for name, _ in CORRELATION_INDEXES:
+        if name in indexes:
+            op.drop_index(name, table_name='correlation_results')
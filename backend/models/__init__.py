@@ -1,14 +1,44 @@
 """Initialize database models package."""
 
+import sqlite3
+from pathlib import Path
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 migrate = Migrate()
 
+# Alembic scripts for databases created before a schema change; found
+# regardless of the directory `flask db upgrade` is run from
+MIGRATIONS_DIR = Path(__file__).parent.parent / 'migrations'
+
+# Applied to every new SQLite connection: WAL lets reads run alongside
+# correlation writes, and the journal is only fsynced at checkpoints
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configure SQLite connections for concurrent reads."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
 
 def init_db(app):
     """Initialize database with Flask app."""
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, directory=str(MIGRATIONS_DIR))
     return db
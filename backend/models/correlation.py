@@ -1,17 +1,28 @@
 """Correlation results model for storing statistical analysis outcomes."""
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import cached_property
 import uuid
 from backend.models import db
 
 
+# Columns of the listing endpoints (recent/search); audit timestamps are
+# left out
+SUMMARY_COLUMNS = (
+    'id', 'calculated_at', 'city', 'symbol', 'start_date', 'end_date',
+    'period_days', 'correlation_value', 'p_value', 'sample_size',
+    'weather_variable', 'stock_variable', 'significance_level',
+    'analysis_notes', 'anomalies_detected'
+)
+
+
 class CorrelationResult(db.Model):
     """Model for storing correlation analysis results."""
     
     __tablename__ = 'correlation_results'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    calculated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, index=True)
+    calculated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     city = db.Column(db.String(100), nullable=False, index=True)
     symbol = db.Column(db.String(10), nullable=False, index=True)
     start_date = db.Column(db.DateTime(timezone=True), nullable=False)
@@ -25,12 +36,15 @@ class CorrelationResult(db.Model):
     significance_level = db.Column(db.String(20))
     analysis_notes = db.Column(db.Text)
     anomalies_detected = db.Column(db.Integer, default=0)
+    date_range = db.Column(db.String(64))  # requested range, see utils.dates.date_range_key
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Composite index and constraints
+    # Indexes serve get_recent and get_by_city_and_symbol in calculated_at
+    # order without a sort, plus constraints
     __table_args__ = (
-        db.Index('idx_correlation_city_symbol', 'city', 'symbol'),
+        db.Index('ix_corr_calc_at', calculated_at.desc()),
+        db.Index('ix_corr_city_symbol_calc', city, symbol, calculated_at.desc()),
         db.CheckConstraint('period_days > 0', name='valid_period'),
         db.CheckConstraint('correlation_value >= -1.0 AND correlation_value <= 1.0', name='valid_correlation'),
         db.CheckConstraint('p_value >= 0 AND p_value <= 1', name='valid_p_value'),
@@ -42,34 +56,49 @@ class CorrelationResult(db.Model):
         return f'<CorrelationResult {self.city}-{self.symbol}: r={self.correlation_value}, p={self.p_value}>'
     
     def to_dict(self):
-        """Convert model instance to dictionary."""
+        """Convert model instance to dictionary (raw values, encoded by orjson)."""
         return {
             'id': self.id,
-            'calculated_at': self.calculated_at.isoformat() if self.calculated_at else None,
+            'calculated_at': self.calculated_at,
             'city': self.city,
             'symbol': self.symbol,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
             'period_days': self.period_days,
-            'correlation_value': float(self.correlation_value) if self.correlation_value is not None else None,
-            'p_value': float(self.p_value) if self.p_value is not None else None,
+            'correlation_value': self.correlation_value,
+            'p_value': self.p_value,
             'sample_size': self.sample_size,
             'weather_variable': self.weather_variable,
             'stock_variable': self.stock_variable,
             'significance_level': self.significance_level,
-            'significance': self.get_significance_category(),
+            'significance': self.significance_category,
             'analysis_notes': self.analysis_notes,
             'anomalies_detected': self.anomalies_detected,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
     
-    def get_significance_category(self):
-        """Determine significance category based on p-value."""
-        if self.p_value is None:
+    @staticmethod
+    def summary_to_dict(row):
+        """Convert a SUMMARY_COLUMNS row tuple to a listing dictionary."""
+        summary = dict(zip(SUMMARY_COLUMNS, row))
+        summary['significance'] = CorrelationResult.categorize_significance(summary['p_value'])
+        return summary
+    
+    # Categories are computed once per instance; results are not modified
+    # after they are stored
+    @cached_property
+    def significance_category(self):
+        """Significance category based on p-value."""
+        return self.categorize_significance(self.p_value)
+    
+    @staticmethod
+    def categorize_significance(p_value):
+        """Significance category of a p-value."""
+        if p_value is None:
             return 'unknown'
         
-        p_val = float(self.p_value)
+        p_val = float(p_value)
         if p_val < 0.001:
             return 'very_high'
         elif p_val < 0.01:
@@ -81,8 +110,9 @@ class CorrelationResult(db.Model):
         else:
             return 'none'
     
-    def get_correlation_strength(self):
-        """Determine correlation strength category."""
+    @cached_property
+    def correlation_strength(self):
+        """Correlation strength category."""
         if self.correlation_value is None:
             return 'unknown'
         
@@ -96,8 +126,9 @@ class CorrelationResult(db.Model):
         else:
             return 'very_weak'
     
-    def get_correlation_direction(self):
-        """Determine correlation direction."""
+    @cached_property
+    def correlation_direction(self):
+        """Correlation direction."""
         if self.correlation_value is None:
             return 'none'
         
@@ -114,6 +145,42 @@ class CorrelationResult(db.Model):
         """Get recent correlation results."""
         return cls.query.order_by(cls.calculated_at.desc()).limit(limit).all()
     
+    @classmethod
+    def get_recent_summary(cls, limit=10):
+        """Get recent correlation results as SUMMARY_COLUMNS tuples."""
+        return cls.query.with_entities(
+            *(getattr(cls, column) for column in SUMMARY_COLUMNS)
+        ).order_by(cls.calculated_at.desc()).limit(limit).all()
+    
+    @classmethod
+    def get_summary_by_city_and_symbol(cls, city, symbol, limit, offset=0):
+        """Get a page of correlation results for a city and symbol as SUMMARY_COLUMNS tuples."""
+        return cls.query.with_entities(
+            *(getattr(cls, column) for column in SUMMARY_COLUMNS)
+        ).filter(
+            cls.city == city,
+            cls.symbol == symbol.upper()
+        ).order_by(cls.calculated_at.desc()).limit(limit).offset(offset).all()
+    
+    @classmethod
+    def find_fresh_match(cls, city, symbol, weather_variable, stock_variable, date_range, max_age):
+        """
+        Get the newest result for the same study computed within max_age.
+        
+        Stored start/end dates are the first and last aligned data points,
+        which can't tell a 7d request from a 10d one across weekends, so
+        the requested date_range key is compared instead. Served by the
+        (city, symbol, calculated_at) index.
+        """
+        return cls.query.filter(
+            cls.city == city,
+            cls.symbol == symbol.upper(),
+            cls.calculated_at >= datetime.utcnow() - max_age,
+            cls.weather_variable == weather_variable,
+            cls.stock_variable == stock_variable,
+            cls.date_range == date_range
+        ).order_by(cls.calculated_at.desc()).first()
+    
     @classmethod
     def get_by_city_and_symbol(cls, city, symbol):
         """Get correlation results for specific city and symbol."""
@@ -20,9 +20,27 @@ class StockData(db.Model):
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Composite index and constraints
+    # Columns used by correlation analysis
+    NUMERIC_COLUMNS = ('open_price', 'close_price', 'high_price', 'low_price', 'volume')
+    
+    # Fields of API records, in to_dict() order
+    RECORD_COLUMNS = (
+        'id', 'timestamp', 'symbol', 'open_price', 'close_price', 'high_price',
+        'low_price', 'volume', 'created_at', 'updated_at'
+    )
+    
+    # Covering indexes and constraints: range queries on (symbol, timestamp)
+    # read the numeric columns from the index instead of the table
     __table_args__ = (
-        db.Index('idx_stock_symbol_timestamp', 'symbol', 'timestamp'),
+        db.Index(
+            'idx_stock_symbol_ts_cov', 'symbol', 'timestamp', *NUMERIC_COLUMNS
+        ).ddl_if(dialect='sqlite'),
+        db.Index(
+            'idx_stock_symbol_ts_incl', 'symbol', 'timestamp',
+            postgresql_include=list(NUMERIC_COLUMNS)
+        ).ddl_if(dialect='postgresql'),
+        # One bar per symbol and timestamp; ingestion inserts ON CONFLICT DO NOTHING
+        db.UniqueConstraint('symbol', 'timestamp', name='uq_stock_symbol_ts'),
         db.CheckConstraint('open_price > 0', name='valid_open_price'),
         db.CheckConstraint('close_price > 0', name='valid_close_price'),
         db.CheckConstraint('high_price > 0', name='valid_high_price'),
@@ -39,18 +57,18 @@ class StockData(db.Model):
         return f'<StockData {self.symbol} at {self.timestamp}: ${self.close_price}>'
     
     def to_dict(self):
-        """Convert model instance to dictionary."""
+        """Convert model instance to dictionary (raw values, encoded by orjson)."""
         return {
             'id': self.id,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'timestamp': self.timestamp,
             'symbol': self.symbol,
-            'open_price': float(self.open_price) if self.open_price else None,
-            'close_price': float(self.close_price) if self.close_price else None,
-            'high_price': float(self.high_price) if self.high_price else None,
-            'low_price': float(self.low_price) if self.low_price else None,
+            'open_price': self.open_price,
+            'close_price': self.close_price,
+            'high_price': self.high_price,
+            'low_price': self.low_price,
             'volume': self.volume,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
     
     @property
@@ -83,6 +101,55 @@ class StockData(db.Model):
             cls.timestamp <= end_date
         ).order_by(cls.timestamp.asc()).all()
     
+    @classmethod
+    def iter_records_by_symbol_and_range(cls, symbol, start_date, end_date, batch_size=500):
+        """Yield API records for a symbol and date range, fetching batch_size rows at a time."""
+        rows = db.session.query(
+            *[getattr(cls, name) for name in cls.RECORD_COLUMNS]
+        ).filter(
+            cls.symbol == symbol.upper(),
+            cls.timestamp >= start_date,
+            cls.timestamp <= end_date
+        ).order_by(cls.timestamp.asc()).yield_per(batch_size)
+        return (dict(zip(cls.RECORD_COLUMNS, row)) for row in rows)
+    
+    @classmethod
+    def record_columns_by_symbol_and_range(cls, symbol, start_date, end_date):
+        """
+        Get API records for a symbol and date range as columns.
+        
+        Returns a dict mapping each RECORD_COLUMNS name to its values in
+        timestamp order; Numeric columns (prices) are read as floats.
+        """
+        columns = [
+            db.cast(column, db.Float) if isinstance(column.type, db.Numeric) else column
+            for column in (getattr(cls, name) for name in cls.RECORD_COLUMNS)
+        ]
+        rows = db.session.query(*columns).filter(
+            cls.symbol == symbol.upper(),
+            cls.timestamp >= start_date,
+            cls.timestamp <= end_date
+        ).order_by(cls.timestamp.asc()).all()
+        values = zip(*rows) if rows else ((),) * len(cls.RECORD_COLUMNS)
+        return dict(zip(cls.RECORD_COLUMNS, values))
+    
+    @classmethod
+    def numeric_columns_by_symbol_and_range(cls, symbol, start_date, end_date, columns=None):
+        """
+        Get (timestamp, *columns) row tuples for a symbol and date range.
+        
+        Selects only the requested numeric columns (all of NUMERIC_COLUMNS by
+        default) and skips building ORM instances.
+        """
+        columns = columns or cls.NUMERIC_COLUMNS
+        return db.session.query(
+            cls.timestamp, *[getattr(cls, column) for column in columns]
+        ).filter(
+            cls.symbol == symbol.upper(),
+            cls.timestamp >= start_date,
+            cls.timestamp <= end_date
+        ).order_by(cls.timestamp.asc()).all()
+    
     @classmethod
     def get_latest(cls, symbol, limit=10):
         """Get latest stock data for a symbol."""
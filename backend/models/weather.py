@@ -20,9 +20,27 @@ class WeatherData(db.Model):
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Composite index for efficient queries
+    # Columns used by correlation analysis
+    NUMERIC_COLUMNS = ('temperature', 'humidity', 'precipitation', 'wind_speed')
+    
+    # Fields of API records, in to_dict() order
+    RECORD_COLUMNS = (
+        'id', 'timestamp', 'city', 'temperature', 'humidity', 'precipitation',
+        'wind_speed', 'condition', 'created_at', 'updated_at'
+    )
+    
+    # Covering indexes: range queries on (city, timestamp) read the numeric
+    # columns from the index instead of the table
     __table_args__ = (
-        db.Index('idx_weather_city_timestamp', 'city', 'timestamp'),
+        db.Index(
+            'idx_weather_city_ts_cov', 'city', 'timestamp', *NUMERIC_COLUMNS
+        ).ddl_if(dialect='sqlite'),
+        db.Index(
+            'idx_weather_city_ts_incl', 'city', 'timestamp',
+            postgresql_include=list(NUMERIC_COLUMNS)
+        ).ddl_if(dialect='postgresql'),
+        # One reading per city and timestamp; ingestion inserts ON CONFLICT DO NOTHING
+        db.UniqueConstraint('city', 'timestamp', name='uq_weather_city_ts'),
         db.CheckConstraint('humidity >= 0 AND humidity <= 100', name='valid_humidity'),
         db.CheckConstraint('precipitation >= 0', name='valid_precipitation'),
         db.CheckConstraint('wind_speed >= 0', name='valid_wind_speed'),
@@ -32,18 +50,18 @@ class WeatherData(db.Model):
         return f'<WeatherData {self.city} at {self.timestamp}: {self.temperature}°C>'
     
     def to_dict(self):
-        """Convert model instance to dictionary."""
+        """Convert model instance to dictionary (raw values, encoded by orjson)."""
         return {
             'id': self.id,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'timestamp': self.timestamp,
             'city': self.city,
-            'temperature': float(self.temperature) if self.temperature else None,
+            'temperature': self.temperature,
             'humidity': self.humidity,
-            'precipitation': float(self.precipitation) if self.precipitation else 0.0,
-            'wind_speed': float(self.wind_speed) if self.wind_speed else None,
+            'precipitation': self.precipitation if self.precipitation is not None else 0.0,
+            'wind_speed': self.wind_speed,
             'condition': self.condition,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
     
     @classmethod
@@ -55,6 +73,61 @@ class WeatherData(db.Model):
             cls.timestamp <= end_date
         ).order_by(cls.timestamp.asc()).all()
     
+    @classmethod
+    def iter_records_by_city_and_range(cls, city, start_date, end_date, batch_size=500):
+        """Yield API records for a city and date range, fetching batch_size rows at a time."""
+        columns = [
+            db.func.coalesce(cls.precipitation, 0.0) if name == 'precipitation' else getattr(cls, name)
+            for name in cls.RECORD_COLUMNS
+        ]
+        rows = db.session.query(*columns).filter(
+            cls.city == city,
+            cls.timestamp >= start_date,
+            cls.timestamp <= end_date
+        ).order_by(cls.timestamp.asc()).yield_per(batch_size)
+        return (dict(zip(cls.RECORD_COLUMNS, row)) for row in rows)
+    
+    @classmethod
+    def record_columns_by_city_and_range(cls, city, start_date, end_date):
+        """
+        Get API records for a city and date range as columns.
+        
+        Returns a dict mapping each RECORD_COLUMNS name to its values in
+        timestamp order; Numeric columns are read as floats.
+        """
+        columns = []
+        for name in cls.RECORD_COLUMNS:
+            column = getattr(cls, name)
+            if isinstance(column.type, db.Numeric):
+                column = db.cast(column, db.Float)
+            if name == 'precipitation':
+                column = db.func.coalesce(column, 0.0)
+            columns.append(column)
+        rows = db.session.query(*columns).filter(
+            cls.city == city,
+            cls.timestamp >= start_date,
+            cls.timestamp <= end_date
+        ).order_by(cls.timestamp.asc()).all()
+        values = zip(*rows) if rows else ((),) * len(cls.RECORD_COLUMNS)
+        return dict(zip(cls.RECORD_COLUMNS, values))
+    
+    @classmethod
+    def numeric_columns_by_city_and_range(cls, city, start_date, end_date, columns=None):
+        """
+        Get (timestamp, *columns) row tuples for a city and date range.
+        
+        Selects only the requested numeric columns (all of NUMERIC_COLUMNS by
+        default) and skips building ORM instances.
+        """
+        columns = columns or cls.NUMERIC_COLUMNS
+        return db.session.query(
+            cls.timestamp, *[getattr(cls, column) for column in columns]
+        ).filter(
+            cls.city == city,
+            cls.timestamp >= start_date,
+            cls.timestamp <= end_date
+        ).order_by(cls.timestamp.asc()).all()
+    
     @classmethod
     def get_latest(cls, city, limit=10):
         """Get latest weather data for a city."""
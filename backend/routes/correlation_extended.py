@@ -5,22 +5,60 @@ Extended correlation routes for advanced features:
 """
 
 import logging
-from flask import request, jsonify
+from flask import request
 from datetime import datetime, timedelta
 
 from backend.routes import correlation_bp
-from backend.services.data_service import DataService
-from backend.services.correlation_service import CorrelationService
-from scipy.stats import pearsonr
+from backend.services.cache import cache_response
+from backend.utils.dates import resolve_date_range
+from backend.utils.responses import json_response
+from scipy.stats import t as t_distribution
+import numpy as np
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
-# Reuse existing service instances
-from backend.routes.correlations import data_service, correlation_service
+# Reuse the existing data service instance
+from backend.routes.correlations import data_service
+
+# Variables available for correlation analysis
+WEATHER_VARIABLES = ['temperature', 'humidity', 'precipitation', 'wind_speed']
+STOCK_VARIABLES = ['open_price', 'close_price', 'high_price', 'low_price', 'volume']
+
+# Daily aggregation of stock bars (weather variables use the daily mean)
+STOCK_DAILY_AGG = {
+    'open_price': 'first',
+    'close_price': 'last',
+    'high_price': 'max',
+    'low_price': 'min',
+    'volume': 'sum'
+}
+
+def _build_frame(rows, variables):
+    """Build a typed DataFrame from (timestamp, *variables) row tuples."""
+    df = pd.DataFrame.from_records(rows, columns=['timestamp'] + variables)
+    df[variables] = df[variables].astype('float64')
+    return df
+
+
+def _resample_daily(df, agg):
+    """Resample a (timestamp, *variables) frame to daily bins, dropping empty days."""
+    daily = df.set_index('timestamp').resample('D')
+    return daily.agg(agg)[daily.size() > 0]
+
+
+def _align_daily(weather_df, stock_df):
+    """Align weather and stock frames on calendar days with an index join."""
+    weather_daily = _resample_daily(weather_df, 'mean')
+    stock_daily = _resample_daily(
+        stock_df,
+        {column: STOCK_DAILY_AGG[column] for column in stock_df.columns if column != 'timestamp'}
+    )
+    return weather_daily.join(stock_daily, how='inner')
 
 
 @correlation_bp.route('/matrix', methods=['POST'])
+@cache_response(policy='normal', namespace='matrix')
 def get_correlation_matrix():
     """
     Calculate correlation matrix for all variable combinations.
@@ -36,88 +74,82 @@ def get_correlation_matrix():
         data = request.get_json()
         
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return json_response({'error': 'No data provided'}, 400)
         
         city = data.get('city')
         symbol = data.get('symbol')
         date_range = data.get('dateRange', '30d')
         
         if not city or not symbol:
-            return jsonify({'error': 'Missing required fields: city, symbol'}), 400
+            return json_response({'error': 'Missing required fields: city, symbol'}, 400)
         
         # Parse date range
-        end_date = datetime.now()
-        if isinstance(date_range, str):
-            days = int(date_range.rstrip('d'))
-            start_date = end_date - timedelta(days=days)
-        else:
-            start_date = end_date - timedelta(days=30)
+        start_date, end_date = resolve_date_range(date_range)
         
         logger.info(f"Calculating correlation matrix for {city}/{symbol}")
         
-        # Fetch data
+        # Define variables
+        weather_vars = WEATHER_VARIABLES
+        stock_vars = STOCK_VARIABLES
+        
+        # Fetch only the numeric columns needed for the matrix
         combined_data = data_service.get_combined_data(
             city=city,
             symbol=symbol,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            columns={'weather': weather_vars, 'stock': stock_vars}
         )
         
         weather_data = combined_data['weather']
         stock_data = combined_data['stock']
         
         if not weather_data or not stock_data:
-            return jsonify({'error': 'Insufficient data for analysis'}), 400
-        
-        # Convert to DataFrames
-        weather_df = pd.DataFrame([w.to_dict() for w in weather_data])
-        stock_df = pd.DataFrame([s.to_dict() for s in stock_data])
+            return json_response({'error': 'Insufficient data for analysis'}, 400)
         
-        weather_df['timestamp'] = pd.to_datetime(weather_df['timestamp'])
-        stock_df['timestamp'] = pd.to_datetime(stock_df['timestamp'])
+        weather_df = _build_frame(weather_data, weather_vars)
+        stock_df = _build_frame(stock_data, stock_vars)
         
-        # Align time series
-        aligned = pd.merge_asof(
-            weather_df.sort_values('timestamp'),
-            stock_df.sort_values('timestamp'),
-            on='timestamp',
-            direction='nearest',
-            tolerance=pd.Timedelta('6H')
-        ).dropna()
+        # Align on daily bins, dropping incomplete rows once for all variables
+        aligned = _align_daily(weather_df, stock_df).dropna(subset=weather_vars + stock_vars)
         
         if len(aligned) < 3:
-            return jsonify({'error': 'Not enough aligned data points'}), 400
+            return json_response({'error': 'Not enough aligned data points'}, 400)
         
-        # Define variables
-        weather_vars = ['temperature', 'humidity', 'precipitation', 'wind_speed']
-        stock_vars = ['open_price', 'close_price', 'high_price', 'low_price', 'volume']
+        # Correlate every variable pair with a single corrcoef call and keep
+        # the weather x stock block
+        n = len(aligned)
+        n_weather = len(weather_vars)
+        values = np.ascontiguousarray(
+            aligned[weather_vars + stock_vars].to_numpy(dtype=np.float64).T
+        )
+        
+        # Zero-variance columns give NaN r (reported as r=0, p=1) and perfect
+        # correlations an infinite t statistic (p=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_matrix = np.corrcoef(values)[:n_weather, n_weather:]
+            
+            # Two-sided p-values from the t-distribution, for all pairs at once
+            t_stat = r_matrix * np.sqrt((n - 2) / (1 - r_matrix ** 2))
+            p_matrix = 2 * t_distribution.sf(np.abs(t_stat), n - 2)
+        
+        undefined = np.isnan(r_matrix)
+        r_matrix[undefined] = 0.0
+        p_matrix[undefined] = 1.0
         
-        # Calculate correlation matrix
         matrix = []
-        for weather_var in weather_vars:
+        for i, weather_var in enumerate(weather_vars):
             row = {'variable': weather_var, 'correlations': {}}
-            for stock_var in stock_vars:
-                if weather_var in aligned.columns and stock_var in aligned.columns:
-                    try:
-                        r, p = pearsonr(
-                            aligned[weather_var].dropna(),
-                            aligned[stock_var].dropna()
-                        )
-                        row['correlations'][stock_var] = {
-                            'r': float(r),
-                            'p': float(p),
-                            'significant': p < 0.05
-                        }
-                    except Exception as e:
-                        logger.warning(f"Failed to calculate {weather_var} vs {stock_var}: {e}")
-                        row['correlations'][stock_var] = {
-                            'r': 0.0,
-                            'p': 1.0,
-                            'significant': False
-                        }
+            for j, stock_var in enumerate(stock_vars):
+                p = float(p_matrix[i, j])
+                row['correlations'][stock_var] = {
+                    'r': float(r_matrix[i, j]),
+                    'p': p,
+                    'significant': p < 0.05
+                }
             matrix.append(row)
         
-        return jsonify({
+        return json_response({
             'success': True,
             'matrix': matrix,
             'weather_variables': weather_vars,
@@ -129,14 +161,15 @@ def get_correlation_matrix():
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat()
             }
-        }), 200
+        })
         
     except Exception as e:
         logger.error(f"Error calculating correlation matrix: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+        return json_response({'error': 'Internal server error', 'details': str(e)}, 500)
 
 
 @correlation_bp.route('/trends', methods=['POST'])
+@cache_response(policy='long', namespace='trends')
 def get_correlation_trends():
     """
     Calculate correlation trends over time (rolling window analysis).
@@ -155,7 +188,7 @@ def get_correlation_trends():
         data = request.get_json()
         
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return json_response({'error': 'No data provided'}, 400)
         
         city = data.get('city')
         symbol = data.get('symbol')
@@ -165,7 +198,7 @@ def get_correlation_trends():
         total_days = data.get('total_days', 180)
         
         if not city or not symbol:
-            return jsonify({'error': 'Missing required fields: city, symbol'}), 400
+            return json_response({'error': 'Missing required fields: city, symbol'}, 400)
         
         logger.info(f"Calculating correlation trends for {city}/{symbol}")
         
@@ -174,45 +207,57 @@ def get_correlation_trends():
         today = datetime.now()
         
         # Create 6 windows (e.g., for 180 days with 30-day windows)
+        windows = []
         for i in range(0, total_days, window_days):
             end = today - timedelta(days=i)
             start = end - timedelta(days=window_days)
+            windows.append((start, end))
+        
+        if windows and weather_var in WEATHER_VARIABLES and stock_var in STOCK_VARIABLES:
+            # Fetch and align the full span once, then slice per window
+            span_start = windows[-1][0]
+            combined_data = data_service.get_combined_data(
+                city=city,
+                symbol=symbol,
+                start_date=span_start,
+                end_date=today,
+                columns={'weather': [weather_var], 'stock': [stock_var]}
+            )
             
-            try:
-                # Fetch data for this window
-                combined_data = data_service.get_combined_data(
-                    city=city,
-                    symbol=symbol,
-                    start_date=start,
-                    end_date=end
-                )
-                
-                weather_data = combined_data['weather']
-                stock_data = combined_data['stock']
+            if combined_data['weather'] and combined_data['stock']:
+                weather_df = _build_frame(combined_data['weather'], [weather_var])
+                stock_df = _build_frame(combined_data['stock'], [stock_var])
                 
-                if not weather_data or not stock_data:
-                    continue
-                
-                # Convert and align
-                weather_df = pd.DataFrame([w.to_dict() for w in weather_data])
-                stock_df = pd.DataFrame([s.to_dict() for s in stock_data])
+                aligned = _align_daily(weather_df, stock_df).dropna()
+            else:
+                aligned = pd.DataFrame()
+            
+            if weather_var in aligned.columns and stock_var in aligned.columns:
+                # Rolling correlation over the time-based window, computed in
+                # a single pass. Each window's end is inserted as an empty row
+                # so the window closed on both sides covers exactly [start, end]
+                ends = pd.DatetimeIndex([end for _, end in windows])
+                sampled = pd.concat([
+                    aligned[[weather_var, stock_var]].assign(is_end=False),
+                    pd.DataFrame({'is_end': True}, index=ends)
+                ]).sort_index(kind='stable')
+                is_end = sampled['is_end'].to_numpy(dtype=bool)
                 
-                weather_df['timestamp'] = pd.to_datetime(weather_df['timestamp'])
-                stock_df['timestamp'] = pd.to_datetime(stock_df['timestamp'])
+                x = sampled[weather_var]
+                y = sampled[stock_var]
+                rolling_window = f'{window_days}D'
+                r_values = x.rolling(rolling_window, min_periods=3, closed='both').corr(y).to_numpy()[is_end]
+                n_values = x.rolling(rolling_window, closed='both').count().to_numpy()[is_end]
                 
-                aligned = pd.merge_asof(
-                    weather_df.sort_values('timestamp'),
-                    stock_df.sort_values('timestamp'),
-                    on='timestamp',
-                    direction='nearest',
-                    tolerance=pd.Timedelta('6H')
-                ).dropna()
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    t_stat = r_values * np.sqrt((n_values - 2) / (1 - r_values ** 2))
+                    p_values = 2 * t_distribution.sf(np.abs(t_stat), n_values - 2)
                 
-                if len(aligned) >= 3 and weather_var in aligned.columns and stock_var in aligned.columns:
-                    r, p = pearsonr(
-                        aligned[weather_var].dropna(),
-                        aligned[stock_var].dropna()
-                    )
+                # Window ends are sorted oldest first; windows run newest first
+                for (start, end), r, n, p in zip(windows, r_values[::-1], n_values[::-1], p_values[::-1]):
+                    # Skip windows with fewer than three observations of their own
+                    if np.isnan(r):
+                        continue
                     
                     trends.append({
                         'period_start': start.isoformat(),
@@ -220,17 +265,14 @@ def get_correlation_trends():
                         'period_label': f"{start.strftime('%b %d')} - {end.strftime('%b %d')}",
                         'correlation': float(r),
                         'p_value': float(p),
-                        'sample_size': len(aligned),
-                        'significant': p < 0.05
+                        'sample_size': int(n),
+                        'significant': bool(p < 0.05)
                     })
-            except Exception as e:
-                logger.warning(f"Failed to calculate trend for window {start} - {end}: {e}")
-                continue
         
         # Reverse to show oldest first
         trends.reverse()
         
-        return jsonify({
+        return json_response({
             'success': True,
             'trends': trends,
             'metadata': {
@@ -241,8 +283,8 @@ def get_correlation_trends():
                 'window_days': window_days,
                 'total_windows': len(trends)
             }
-        }), 200
+        })
         
     except Exception as e:
         logger.error(f"Error calculating correlation trends: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+        return json_response({'error': 'Internal server error', 'details': str(e)}, 500)
@@ -3,14 +3,19 @@ Correlation routes for statistical analysis endpoints.
 """
 
 import logging
-from flask import request, jsonify
-from datetime import datetime, timedelta
+from datetime import timedelta
+from flask import current_app, request
 
 from backend.routes import correlation_bp
 from backend.services.data_service import DataService
-from backend.services.correlation_service import CorrelationService
+from backend.services.correlation_service import (
+    AUTO_VARIABLE, CorrelationService, STOCK_ALIGN_COLUMNS, WEATHER_ALIGN_COLUMNS
+)
 from backend.services.ai_insights import AIInsightsService
+from backend.services.cache import cache_response, invalidate_scopes
 from backend.models.correlation import CorrelationResult
+from backend.utils.dates import date_range_key, resolve_date_range
+from backend.utils.responses import json_response
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +25,11 @@ correlation_service = CorrelationService()
 ai_insights_service = AIInsightsService()
 
 
+def _search_scope(city, symbol):
+    """Cache invalidation scope of the search results for a city and symbol."""
+    return f"search:{city}:{(symbol or '').upper()}"
+
+
 @correlation_bp.route('/analyze', methods=['POST'])
 def analyze_correlation():
     """
@@ -33,12 +43,15 @@ def analyze_correlation():
             "weatherVariable": "temperature",
             "stockVariable": "close_price"
         }
+    
+    Either variable may be "auto" to analyze the most strongly correlated
+    variable instead.
     """
     try:
         data = request.get_json()
         
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return json_response({'error': 'No data provided'}, 400)
         
         city = data.get('city')
         symbol = data.get('symbol')
@@ -48,57 +61,78 @@ def analyze_correlation():
         
         # Validate inputs
         if not city or not symbol:
-            return jsonify({'error': 'Missing required fields: city, symbol'}), 400
+            return json_response({'error': 'Missing required fields: city, symbol'}, 400)
         
         # Parse date range
-        end_date = datetime.now()
+        start_date, end_date = resolve_date_range(date_range)
+        range_key = date_range_key(date_range)
         
-        if isinstance(date_range, str):
-            days = int(date_range.rstrip('d'))
-            start_date = end_date - timedelta(days=days)
-        elif isinstance(date_range, dict):
-            start_date = datetime.fromisoformat(date_range.get('start'))
-            end_date = datetime.fromisoformat(date_range.get('end'))
-        else:
-            start_date = end_date - timedelta(days=30)
+        # Reuse a fresh result for the same study instead of refetching
+        reuse_minutes = current_app.config['ANALYSIS_REUSE_MINUTES']
+        if reuse_minutes > 0 and AUTO_VARIABLE not in (weather_var, stock_var):
+            existing = CorrelationResult.find_fresh_match(
+                city, symbol, weather_var, stock_var, range_key,
+                max_age=timedelta(minutes=reuse_minutes)
+            )
+            if existing:
+                logger.info(f"Reusing correlation {existing.id} for {city}/{symbol}")
+                return json_response({
+                    'success': True,
+                    'correlation': existing.to_dict()
+                })
         
         logger.info(f"Analyzing correlation for {city}/{symbol} ({weather_var} vs {stock_var})")
         
-        # Fetch data
-        combined_data = data_service.get_combined_data(
-            city=city,
-            symbol=symbol,
-            start_date=start_date,
-            end_date=end_date
-        )
+        # Aligned frames are cached per study; fetch and align only on a miss
+        aligned_df = correlation_service.get_cached_alignment(city, symbol, start_date, end_date)
+        if aligned_df is None:
+            # PostgreSQL aligns the rows server-side
+            aligned_df = data_service.get_aligned_rows(city, symbol, start_date, end_date)
+            if aligned_df is None:
+                # Fetch only the columns used by the alignment
+                combined_data = data_service.get_combined_data(
+                    city=city,
+                    symbol=symbol,
+                    start_date=start_date,
+                    end_date=end_date,
+                    columns={'weather': WEATHER_ALIGN_COLUMNS, 'stock': STOCK_ALIGN_COLUMNS}
+                )
+                aligned_df = correlation_service.align_time_series(
+                    combined_data['weather'], combined_data['stock']
+                )
+            correlation_service.cache_alignment(city, symbol, start_date, end_date, aligned_df)
         
         # Perform correlation analysis
         result = correlation_service.analyze_correlation(
             city=city,
             symbol=symbol,
-            weather_data=combined_data['weather'],
-            stock_data=combined_data['stock'],
             weather_variable=weather_var,
-            stock_variable=stock_var
+            stock_variable=stock_var,
+            aligned_df=aligned_df,
+            date_range=range_key
         )
         
         if not result:
-            return jsonify({'error': 'Correlation analysis failed'}), 500
+            return json_response({'error': 'Correlation analysis failed'}, 500)
+        
+        # New result: drop cached recent and search listings that miss it
+        invalidate_scopes('recent', _search_scope(city, symbol))
         
-        return jsonify({
+        return json_response({
             'success': True,
             'correlation': result.to_dict()
-        }), 200
+        })
         
     except ValueError as e:
         logger.error(f"Validation error: {e}")
-        return jsonify({'error': str(e)}), 400
+        return json_response({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error analyzing correlation: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+        return json_response({'error': 'Internal server error', 'details': str(e)}, 500)
 
 
 @correlation_bp.route('/<correlation_id>', methods=['GET'])
+@cache_response(policy='long', namespace='correlation')
 def get_correlation(correlation_id):
     """
     Get correlation result by ID.
@@ -110,19 +144,20 @@ def get_correlation(correlation_id):
         result = CorrelationResult.query.get(correlation_id)
         
         if not result:
-            return jsonify({'error': 'Correlation result not found'}), 404
+            return json_response({'error': 'Correlation result not found'}, 404)
         
-        return jsonify({
+        return json_response({
             'success': True,
             'correlation': result.to_dict()
-        }), 200
+        })
         
     except Exception as e:
         logger.error(f"Error getting correlation: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @correlation_bp.route('/recent', methods=['GET'])
+@cache_response(policy='short', namespace='recent', scopes=lambda: ['recent'])
 def get_recent_correlations():
     """
     Get recent correlation results.
@@ -133,20 +168,25 @@ def get_recent_correlations():
     try:
         limit = min(int(request.args.get('limit', 10)), 100)
         
-        results = CorrelationResult.get_recent(limit=limit)
+        rows = CorrelationResult.get_recent_summary(limit=limit)
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'correlations': [r.to_dict() for r in results],
-            'count': len(results)
-        }), 200
+            'correlations': [CorrelationResult.summary_to_dict(row) for row in rows],
+            'count': len(rows)
+        })
         
     except Exception as e:
         logger.error(f"Error getting recent correlations: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @correlation_bp.route('/search', methods=['GET'])
+@cache_response(
+    policy='normal',
+    namespace='search',
+    scopes=lambda: [_search_scope(request.args.get('city'), request.args.get('symbol'))]
+)
 def search_correlations():
     """
     Search correlations by city and symbol.
@@ -154,28 +194,37 @@ def search_correlations():
     Query parameters:
         - city: City name
         - symbol: Stock symbol
+        - page: Page number, newest results first (default: 1)
+        - page_size: Results per page (default: 100, max: 100)
     """
     try:
         city = request.args.get('city')
         symbol = request.args.get('symbol')
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('page_size', 100)), 1), 100)
         
         if not city or not symbol:
-            return jsonify({'error': 'Missing required parameters: city, symbol'}), 400
+            return json_response({'error': 'Missing required parameters: city, symbol'}, 400)
         
-        results = CorrelationResult.get_by_city_and_symbol(city, symbol)
+        rows = CorrelationResult.get_summary_by_city_and_symbol(
+            city, symbol, limit=page_size, offset=(page - 1) * page_size
+        )
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'correlations': [r.to_dict() for r in results],
-            'count': len(results)
-        }), 200
+            'correlations': [CorrelationResult.summary_to_dict(row) for row in rows],
+            'count': len(rows),
+            'page': page,
+            'page_size': page_size
+        })
         
     except Exception as e:
         logger.error(f"Error searching correlations: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @correlation_bp.route('/insights/<correlation_id>', methods=['GET'])
+@cache_response(policy='long', namespace='insights')
 def get_insights(correlation_id):
     """
     Get detailed insights for a correlation result.
@@ -187,20 +236,20 @@ def get_insights(correlation_id):
         result = CorrelationResult.query.get(correlation_id)
         
         if not result:
-            return jsonify({'error': 'Correlation result not found'}), 404
+            return json_response({'error': 'Correlation result not found'}, 404)
         
         insights = {
             'id': result.id,
             'summary': result.analysis_notes,
             'correlation': {
                 'value': float(result.correlation_value),
-                'strength': result.get_correlation_strength(),
-                'direction': result.get_correlation_direction()
+                'strength': result.correlation_strength,
+                'direction': result.correlation_direction
             },
             'significance': {
                 'p_value': float(result.p_value),
                 'level': result.significance_level,
-                'category': result.get_significance_category()
+                'category': result.significance_category
             },
             'data': {
                 'sample_size': result.sample_size,
@@ -216,29 +265,34 @@ def get_insights(correlation_id):
             }
         }
         
-        return jsonify({
+        return json_response({
             'success': True,
             'insights': insights
-        }), 200
+        })
         
     except Exception as e:
         logger.error(f"Error getting insights: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
 
 
 @correlation_bp.route('/ai-insights/<correlation_id>', methods=['GET'])
+@cache_response(policy='immutable', namespace='ai-insights')
 def get_ai_insights(correlation_id):
     """
     Generate AI-powered insights for a correlation result.
     
     Path parameter:
         correlation_id: UUID of correlation result
+    
+    Query parameters:
+        - async: "true" to generate in the background; returns 202 with a
+          poll URL until the insight is ready
     """
     try:
         result = CorrelationResult.query.get(correlation_id)
         
         if not result:
-            return jsonify({'error': 'Correlation result not found'}), 404
+            return json_response({'error': 'Correlation result not found'}, 404)
         
         # Prepare data for AI analysis
         correlation_data = {
@@ -254,15 +308,33 @@ def get_ai_insights(correlation_id):
         }
         
         # Generate AI insights
-        ai_insights = ai_insights_service.generate_insight(correlation_data)
+        if request.args.get('async') == 'true':
+            ai_insights_service.submit_insight(correlation_id, correlation_data)
+            job = ai_insights_service.pop_finished_insight(correlation_id)
+            if job is None:
+                response = json_response({
+                    'success': True,
+                    'status': 'pending',
+                    'correlation_id': correlation_id,
+                    'poll_url': request.full_path
+                }, 202)
+                response.headers['Retry-After'] = '2'
+                return response
+            ai_insights, from_ai = job.result()
+        else:
+            ai_insights, from_ai = ai_insights_service.generate_insight_with_source(correlation_data)
         
-        return jsonify({
+        response = json_response({
             'success': True,
             'ai_insights': ai_insights,
             'correlation_id': correlation_id
-        }), 200
+        })
+        if not from_ai:
+            # Don't pin fallback text once Gemini is reachable again
+            response.cache_control.no_store = True
+        return response
         
     except Exception as e:
         logger.error(f"Error generating AI insights: {e}", exc_info=True)
-        return jsonify({'error': 'Failed to generate AI insights', 'details': str(e)}), 500
+        return json_response({'error': 'Failed to generate AI insights', 'details': str(e)}, 500)
 
@@ -3,17 +3,30 @@ Data routes for fetching and refreshing external data sources.
 """
 
 import logging
-from flask import request, jsonify
-from datetime import datetime, timedelta
+from flask import request
 
 from backend.routes import data_bp
 from backend.services.data_service import DataService
+from backend.utils.dates import parse_iso, resolve_date_range
+from backend.utils.responses import (
+    ARROW_AVAILABLE, ARROW_STREAM_MIMETYPE, arrow_response, json_response, json_stream_response
+)
 
 logger = logging.getLogger(__name__)
 
 # Initialize services (DirectAPIClient will be created automatically)
 data_service = DataService()
 
+# Response types offered by /timeseries, JSON first so it wins for */*
+TIMESERIES_MIMETYPES = ['application/json'] + ([ARROW_STREAM_MIMETYPE] if ARROW_AVAILABLE else [])
+
+
+def _counted(records, counts, name):
+    """Yield records, counting them in counts[name]."""
+    for record in records:
+        counts[name] += 1
+        yield record
+
 
 @data_bp.route('/refresh', methods=['POST'])
 def refresh_data():
@@ -31,7 +44,7 @@ def refresh_data():
         data = request.get_json()
         
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return json_response({'error': 'No data provided'}, 400)
         
         city = data.get('city')
         symbol = data.get('symbol')
@@ -39,60 +52,48 @@ def refresh_data():
         
         # Validate inputs
         if not city or not symbol:
-            return jsonify({'error': 'Missing required fields: city, symbol'}), 400
+            return json_response({'error': 'Missing required fields: city, symbol'}, 400)
         
-        # Parse date range
-        end_date = datetime.now()
-        
-        if isinstance(date_range, str):
-            # Parse preset ranges (7d, 30d, 90d)
-            days = int(date_range.rstrip('d'))
-            start_date = end_date - timedelta(days=days)
-        elif isinstance(date_range, dict):
-            # Parse custom range
-            start_date = datetime.fromisoformat(date_range.get('start'))
-            end_date = datetime.fromisoformat(date_range.get('end'))
-        else:
-            # Default to 30 days
-            start_date = end_date - timedelta(days=30)
+        # Parse preset (7d, 30d, 90d) or custom range, defaulting to 30 days
+        start_date, end_date = resolve_date_range(date_range)
         
         logger.info(f"Refreshing data for {city}/{symbol} from {start_date} to {end_date}")
         
-        # Fetch data
-        combined_data = data_service.get_combined_data(
+        # Fetch data; records are streamed and counted as they are written
+        combined_data = data_service.stream_combined_records(
             city=city,
             symbol=symbol,
             start_date=start_date,
             end_date=end_date
         )
+        counts = {'weather': 0, 'stock': 0}
         
-        weather_count = len(combined_data['weather'])
-        stock_count = len(combined_data['stock'])
-        
-        logger.info(f"Fetched {weather_count} weather records and {stock_count} stock records")
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'weather': [w.to_dict() for w in combined_data['weather']],
-                'stock': [s.to_dict() for s in combined_data['stock']]
-            },
-            'metadata': {
+        def metadata():
+            logger.info(f"Fetched {counts['weather']} weather records and {counts['stock']} stock records")
+            return {
                 'city': city,
                 'symbol': symbol,
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
-                'weather_count': weather_count,
-                'stock_count': stock_count
+                'weather_count': counts['weather'],
+                'stock_count': counts['stock']
             }
-        }), 200
+        
+        return json_stream_response({
+            'success': True,
+            'data': {
+                name: _counted(records, counts, name)
+                for name, records in combined_data.items()
+            },
+            'metadata': metadata
+        })
         
     except ValueError as e:
         logger.error(f"Validation error: {e}")
-        return jsonify({'error': str(e)}), 400
+        return json_response({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error refreshing data: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+        return json_response({'error': 'Internal server error', 'details': str(e)}, 500)
 
 
 @data_bp.route('/timeseries', methods=['GET'])
@@ -105,6 +106,10 @@ def get_timeseries():
         - symbol: Stock symbol
         - start_date: Start date (ISO format)
         - end_date: End date (ISO format)
+        - dataset: "weather" or "stock"; required for Arrow responses
+    
+    Clients sending ``Accept: application/vnd.apache.arrow.stream`` get the
+    selected dataset as a columnar Arrow IPC stream instead of JSON.
     """
     try:
         city = request.args.get('city')
@@ -114,30 +119,42 @@ def get_timeseries():
         
         # Validate inputs
         if not all([city, symbol, start_date_str, end_date_str]):
-            return jsonify({'error': 'Missing required parameters'}), 400
-        
-        start_date = datetime.fromisoformat(start_date_str)
-        end_date = datetime.fromisoformat(end_date_str)
-        
-        # Get data from database (cached)
-        combined_data = data_service.get_combined_data(
-            city=city,
-            symbol=symbol,
-            start_date=start_date,
-            end_date=end_date
-        )
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'weather': [w.to_dict() for w in combined_data['weather']],
-                'stock': [s.to_dict() for s in combined_data['stock']]
-            }
-        }), 200
+            return json_response({'error': 'Missing required parameters'}, 400)
+        
+        start_date = parse_iso(start_date_str)
+        end_date = parse_iso(end_date_str)
+        
+        if request.accept_mimetypes.best_match(TIMESERIES_MIMETYPES) == ARROW_STREAM_MIMETYPE:
+            dataset = request.args.get('dataset')
+            if dataset not in ('weather', 'stock'):
+                return json_response({'error': 'Arrow responses require dataset=weather or dataset=stock'}, 400)
+            
+            combined_columns = data_service.get_combined_columns(
+                city=city,
+                symbol=symbol,
+                start_date=start_date,
+                end_date=end_date
+            )
+            response = arrow_response(combined_columns[dataset])
+        else:
+            # Get data from database (cached), streamed in batches
+            combined_data = data_service.stream_combined_records(
+                city=city,
+                symbol=symbol,
+                start_date=start_date,
+                end_date=end_date
+            )
+            response = json_stream_response({
+                'success': True,
+                'data': combined_data
+            })
+        
+        response.vary.add('Accept')
+        return response
         
     except ValueError as e:
         logger.error(f"Validation error: {e}")
-        return jsonify({'error': str(e)}), 400
+        return json_response({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error getting time series: {e}", exc_info=True)
-        return jsonify({'error': 'Internal server error'}), 500
+        return json_response({'error': 'Internal server error'}, 500)
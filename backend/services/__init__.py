@@ -3,5 +3,11 @@
 from backend.services.mcp_client import MCPClient
 from backend.services.data_service import DataService
 from backend.services.correlation_service import CorrelationService
+from backend.services.cache import cache_response, get_redis, invalidate_scopes
+from backend.services.rate_limit import init_rate_limiter, limiter
 
-__all__ = ['MCPClient', 'DataService', 'CorrelationService']
+__all__ = [
+    'MCPClient', 'DataService', 'CorrelationService', 'cache_response', 'get_redis',
+    'invalidate_scopes',
+    'init_rate_limiter', 'limiter'
+]
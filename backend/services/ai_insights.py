@@ -3,12 +3,175 @@ AI Insights Service using Google Gemini
 Generates natural language analysis of correlation results
 """
 
+import hashlib
+import json
 import logging
 import os
-from typing import Dict, Optional
+import re
+import threading
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from cachetools import LRUCache, TTLCache
+
+from backend.services.cache import get_redis
 
 logger = logging.getLogger(__name__)
 
+# Generated insights are reused for a day; correlation results never change
+INSIGHT_CACHE_TTL = 86400
+LOCAL_INSIGHT_CACHE_SIZE = 1024
+
+# Background insight jobs; results nobody polls for are dropped after the TTL
+INSIGHT_JOB_TTL = 600
+MAX_INSIGHT_JOBS = 1024
+
+# Section header lines of a Gemini response, e.g. "**SECTION 1 - Statistical
+# Interpretation:**" or "## 3. Investment Implications"; the matching group
+# name is the section key. Matches whole lines of a multi-line text and
+# never crosses a line break.
+SECTION_HEADER_RE = re.compile(
+    r'^[^\w\n]*(?:section[^\S\n]*\d+[^\w\n]*)?(?:\d+[^\S\n]*[.):-][^\S\n]*)?'
+    r'(?:(?P<statistical>statistical\b.*?(?:interpretation|analysis))'
+    r'|(?P<explanations>potential\b.*?(?:explanation|mechanism))'
+    r'|(?P<implications>investment|implication)'
+    r'|(?P<recommendations>recommendation|follow-up)).*',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# |r| boundaries of the strength buckets (a value above a bound falls in
+# the next bucket); 0.3 only switches the fallback explanation within "weak"
+STRENGTH_BOUNDS = (0.2, 0.3, 0.4, 0.7)
+STRENGTH_LABELS = ("very weak", "weak", "weak", "moderate", "strong")
+
+
+class CorrelationClass(NamedTuple):
+    """Classification of a correlation result shared by prompts and fallbacks."""
+    abs_corr: float
+    bucket: int
+    strength: str
+    direction: str
+    variance_pct: float
+    significant: bool
+
+
+def classify(correlation_value: float, p_value: float) -> CorrelationClass:
+    """Classify a correlation by strength bucket, direction and significance."""
+    abs_corr = abs(correlation_value)
+    bucket = bisect_left(STRENGTH_BOUNDS, abs_corr)
+    return CorrelationClass(
+        abs_corr=abs_corr,
+        bucket=bucket,
+        strength=STRENGTH_LABELS[bucket],
+        direction="positive" if correlation_value > 0 else "negative",
+        variance_pct=abs_corr * abs_corr * 100,
+        significant=p_value < 0.05
+    )
+
+_FALLBACK_STATISTICAL = (
+    "The analysis reveals a {strength} {{direction}} correlation (r={{correlation_value:.3f}}) "
+    "between {{weather_var}} in {{city}} and {{symbol}}'s {{stock_var}}, based on {{sample_size}} data points. "
+)
+_FALLBACK_SIGNIFICANCE = {
+    True: "With a p-value of {p_value:.4f}, this relationship is statistically significant at the 95% "
+          "confidence level, meaning there's less than a 5% chance this pattern occurred randomly.",
+    False: "However, with a p-value of {p_value:.4f}, this relationship is not statistically significant, "
+           "suggesting the observed pattern could be due to random chance rather than a true underlying relationship."
+}
+_FALLBACK_EXPLANATIONS = {
+    True: "Several factors could explain this correlation: {weather_var} might influence consumer behavior "
+          "patterns that affect {symbol}'s sales, or both variables could be responding to seasonal trends. "
+          "Additionally, {city}'s specific economic geography could create unique market dynamics.",
+    False: "The weak correlation suggests that {weather_var} has minimal direct impact on {symbol}'s stock "
+           "performance. Most stock price movements are driven by company fundamentals, market sentiment, "
+           "and macroeconomic factors rather than local weather conditions."
+}
+_FALLBACK_IMPLICATIONS_NOTEWORTHY = (
+    "Investors should note this relationship but avoid overweighting it in decision-making. While "
+    "statistically significant, the correlation of {abs_corr:.2f} explains only {variance_pct:.1f}% of the "
+    "variance. Consider this as one data point among many fundamental and technical factors."
+)
+_FALLBACK_IMPLICATIONS_WEAK = (
+    "From an investment perspective, this weak {qualifier} correlation should not influence trading "
+    "decisions. Focus on traditional fundamental analysis, company earnings, and broader market trends "
+    "rather than weather patterns for {{symbol}}."
+)
+_FALLBACK_RECOMMENDATIONS = (
+    "For deeper analysis, consider: (1) Extending the study period to multiple years to identify seasonal "
+    "patterns, (2) Comparing multiple cities to see if the relationship holds geographically, and (3) "
+    "Analyzing {symbol}'s sector peers to determine if this is industry-wide or company-specific."
+)
+
+
+# Gemini prompt; filled from the correlation data, PROMPT_DEFAULTS for
+# missing fields, and the CorrelationClass labels
+PROMPT_TEMPLATE = """You are an expert financial and meteorological data analyst. Analyze the following correlation study:
+
+**Study Parameters:**
+- Location: {city}
+- Stock: {symbol}
+- Weather Variable: {weather_variable}
+- Stock Variable: {stock_variable}
+- Sample Size: {sample_size} data points
+- Anomalies Detected: {anomalies_detected}
+
+**Statistical Results:**
+- Correlation Coefficient (r): {correlation_value:.4f}
+- This indicates a {strength} {direction} correlation
+- P-value: {p_value:.4f}
+- Statistical Significance: {significant} at α=0.05
+
+Please provide a comprehensive analysis in exactly 4 sections:
+
+**SECTION 1 - Statistical Interpretation:**
+Explain what the correlation coefficient and p-value mean in plain language. Is this relationship meaningful?
+
+**SECTION 2 - Potential Explanations:**
+If there's any correlation (even weak), what could be the potential causal mechanisms or confounding factors? Be specific to {city} and {symbol}.
+
+**SECTION 3 - Investment Implications:**
+What should investors or analysts take away from this finding? Should they act on it or ignore it?
+
+**SECTION 4 - Recommendations:**
+Suggest 2-3 specific follow-up analyses that would provide deeper insights.
+
+Keep each section concise (2-3 sentences). Be professional and data-driven."""
+
+PROMPT_DEFAULTS = {
+    'correlation_value': 0,
+    'p_value': 1,
+    'sample_size': 0,
+    'city': 'Unknown',
+    'symbol': 'Unknown',
+    'weather_variable': 'temperature',
+    'stock_variable': 'close_price',
+    'anomalies_detected': 0
+}
+
+
+def _build_fallback_templates() -> Dict[Tuple[int, bool], Dict[str, str]]:
+    """Precompute the fallback section templates per (strength bucket, significant)."""
+    templates = {}
+    for bucket, strength in enumerate(STRENGTH_LABELS):
+        for significant in (True, False):
+            if significant and bucket >= 3:
+                implications = _FALLBACK_IMPLICATIONS_NOTEWORTHY
+            else:
+                qualifier = '' if significant else 'and non-significant'
+                implications = _FALLBACK_IMPLICATIONS_WEAK.format(qualifier=qualifier)
+            templates[(bucket, significant)] = {
+                'statistical': _FALLBACK_STATISTICAL.format(strength=strength) + _FALLBACK_SIGNIFICANCE[significant],
+                'explanations': _FALLBACK_EXPLANATIONS[bucket >= 2],
+                'implications': implications,
+                'recommendations': _FALLBACK_RECOMMENDATIONS
+            }
+    return templates
+
+
+FALLBACK_TEMPLATES = _build_fallback_templates()
+
 # Check if google-generativeai is available
 try:
     import google.generativeai as genai
@@ -18,24 +181,51 @@ except ImportError:
     logger.warning("google-generativeai not installed. AI insights will use fallback.")
 
 
+@lru_cache(maxsize=1)
+def _get_model(api_key: str):
+    """
+    Configure Gemini and build the process-wide GenerativeModel.
+    
+    Every service instance shares one client, so its transport and TLS
+    session are set up once per process.
+    """
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-pro')
+
+
 class AIInsightsService:
     """Generate AI-powered insights using Google Gemini."""
     
-    def __init__(self):
-        """Initialize Gemini AI if available."""
+    def __init__(self, max_workers: int = 4):
+        """
+        Initialize Gemini AI if available.
+        
+        Args:
+            max_workers: Threads running background insight jobs
+        """
         self.genai_available = GENAI_AVAILABLE
+        self._local_cache = LRUCache(maxsize=LOCAL_INSIGHT_CACHE_SIZE)
+        self._local_cache_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='ai-insights'
+        )
+        self._jobs = TTLCache(maxsize=MAX_INSIGHT_JOBS, ttl=INSIGHT_JOB_TTL)
+        self._jobs_lock = threading.Lock()
+        # Gemini requests in progress, by exact cache key
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        self.model = None
         
         if self.genai_available:
             api_key = os.getenv('GEMINI_API_KEY')
             if api_key:
-                genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel('gemini-pro')
+                self.model = _get_model(api_key)
                 logger.info("Gemini AI initialized successfully")
             else:
                 self.genai_available = False
                 logger.warning("GEMINI_API_KEY not set. Using fallback insights.")
-        else:
-            self.model = None
     
     def generate_insight(self, correlation_data: Dict) -> Dict[str, str]:
         """
@@ -47,15 +237,89 @@ class AIInsightsService:
         Returns:
             Dictionary with insight sections
         """
+        return self.generate_insight_with_source(correlation_data)[0]
+    
+    def generate_insight_with_source(self, correlation_data: Dict) -> Tuple[Dict[str, str], bool]:
+        """
+        Generate insight sections and report whether they came from Gemini.
+        
+        Returns:
+            Tuple of (insight sections, True if AI-generated or a cached AI result)
+        """
+        stats = classify(
+            correlation_data.get('correlation_value', 0),
+            correlation_data.get('p_value', 1)
+        )
+        
         if self.genai_available and self.model:
-            return self._generate_ai_insight(correlation_data)
-        else:
-            return self._generate_fallback_insight(correlation_data)
+            sections = self._generate_ai_insight(correlation_data, stats)
+            if sections is not None:
+                return sections, True
+        return self._generate_fallback_insight(correlation_data, stats), False
     
-    def _generate_ai_insight(self, data: Dict) -> Dict[str, str]:
-        """Generate insight using Gemini AI."""
+    def submit_insight(self, job_id: str, correlation_data: Dict) -> Future:
+        """
+        Generate an insight on the background pool.
+        
+        Submitting the same job_id again returns the pending job instead of
+        starting another Gemini request.
+        
+        Returns:
+            Future resolving to generate_insight_with_source()'s result
+        """
+        with self._jobs_lock:
+            future = self._jobs.get(job_id)
+            if future is None:
+                future = self._executor.submit(
+                    self.generate_insight_with_source, correlation_data
+                )
+                self._jobs[job_id] = future
+        return future
+    
+    def pop_finished_insight(self, job_id: str) -> Optional[Future]:
+        """Remove and return a job if it has finished, otherwise None."""
+        with self._jobs_lock:
+            future = self._jobs.get(job_id)
+            if future is None or not future.done():
+                return None
+            del self._jobs[job_id]
+        return future
+    
+    def _generate_ai_insight(self, data: Dict, stats: CorrelationClass) -> Optional[Dict[str, str]]:
+        """Generate insight using Gemini AI, or None if the request fails."""
+        cache_keys = self._insight_cache_keys(data)
+        cached = self._get_cached_insight(cache_keys)
+        if cached is not None:
+            return cached
+        
+        # Single-flight: concurrent requests for the same input wait for the
+        # first one's Gemini call instead of issuing their own
+        flight_key = cache_keys[0]
+        with self._inflight_lock:
+            flight = self._inflight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[flight_key] = Future()
+        
+        if not leader:
+            logger.debug(f"Waiting for in-flight AI insight: {flight_key}")
+            return flight.result()
+        
+        sections = None
         try:
-            prompt = self._build_prompt(data)
+            sections = self._request_ai_insight(data, stats, cache_keys)
+            return sections
+        finally:
+            flight.set_result(sections)
+            with self._inflight_lock:
+                del self._inflight[flight_key]
+    
+    def _request_ai_insight(
+        self, data: Dict, stats: CorrelationClass, cache_keys: List[str]
+    ) -> Optional[Dict[str, str]]:
+        """Request an insight from Gemini and cache it, or None if the request fails."""
+        try:
+            prompt = self._build_prompt(data, stats)
             
             response = self.model.generate_content(prompt)
             
@@ -64,70 +328,90 @@ class AIInsightsService:
             sections = self._parse_sections(text)
             
             logger.info("AI insight generated successfully")
+            self._set_cached_insight(cache_keys, sections)
             return sections
             
         except Exception as e:
             logger.error(f"Error generating AI insight: {e}")
-            return self._generate_fallback_insight(data)
+            return None
+    
+    def _insight_cache_keys(self, data: Dict) -> List[str]:
+        """
+        Build the exact and semantic cache keys for correlation data.
+        
+        The exact key covers the full input. The semantic key buckets the
+        statistics (r to 2 decimals, p to 3, sample size to tens) so nearly
+        identical studies share one generated insight.
+        """
+        exact = json.dumps(data, sort_keys=True, default=str)
+        semantic = json.dumps([
+            round(float(data.get('correlation_value', 0)), 2),
+            round(float(data.get('p_value', 1)), 3),
+            int(data.get('sample_size', 0)) // 10 * 10,
+            data.get('city'),
+            str(data.get('symbol', '')).upper(),
+            data.get('weather_variable'),
+            data.get('stock_variable')
+        ])
+        return [
+            f"ai:exact:{hashlib.blake2b(exact.encode(), digest_size=16).hexdigest()}",
+            f"ai:semantic:{hashlib.blake2b(semantic.encode(), digest_size=16).hexdigest()}"
+        ]
+    
+    def _get_cached_insight(self, keys: List[str]) -> Optional[Dict[str, str]]:
+        """Look up an insight in the local LRU, then in Redis."""
+        with self._local_cache_lock:
+            for key in keys:
+                sections = self._local_cache.get(key)
+                if sections is not None:
+                    logger.debug(f"AI insight local cache hit: {key}")
+                    return sections
+        
+        client = get_redis()
+        if client is None:
+            return None
+        
+        try:
+            for key, cached in zip(keys, client.mget(keys)):
+                if cached:
+                    sections = json.loads(cached)
+                    with self._local_cache_lock:
+                        self._local_cache[key] = sections
+                    logger.debug(f"AI insight cache hit: {key}")
+                    return sections
+        except Exception as e:
+            logger.warning(f"AI insight cache retrieval error: {e}")
+        
+        return None
     
-    def _build_prompt(self, data: Dict) -> str:
+    def _set_cached_insight(self, keys: List[str], sections: Dict[str, str]) -> None:
+        """Store an AI-generated insight under its exact and semantic keys."""
+        with self._local_cache_lock:
+            for key in keys:
+                self._local_cache[key] = sections
+        
+        client = get_redis()
+        if client is None:
+            return
+        
+        try:
+            payload = json.dumps(sections)
+            pipe = client.pipeline()
+            for key in keys:
+                pipe.setex(key, INSIGHT_CACHE_TTL, payload)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"AI insight cache set error: {e}")
+    
+    def _build_prompt(self, data: Dict, stats: CorrelationClass) -> str:
         """Build detailed prompt for Gemini."""
-        correlation_value = data.get('correlation_value', 0)
-        p_value = data.get('p_value', 1)
-        sample_size = data.get('sample_size', 0)
-        city = data.get('city', 'Unknown')
-        symbol = data.get('symbol', 'Unknown')
-        weather_var = data.get('weather_variable', 'temperature')
-        stock_var = data.get('stock_variable', 'close_price')
-        anomalies = data.get('anomalies_detected', 0)
-        
-        # Determine correlation strength
-        abs_corr = abs(correlation_value)
-        if abs_corr > 0.7:
-            strength = "strong"
-        elif abs_corr > 0.4:
-            strength = "moderate"
-        elif abs_corr > 0.2:
-            strength = "weak"
-        else:
-            strength = "very weak"
-        
-        direction = "positive" if correlation_value > 0 else "negative"
-        significant = "statistically significant" if p_value < 0.05 else "not statistically significant"
-        
-        prompt = f"""You are an expert financial and meteorological data analyst. Analyze the following correlation study:
-
-**Study Parameters:**
-- Location: {city}
-- Stock: {symbol}
-- Weather Variable: {weather_var}
-- Stock Variable: {stock_var}
-- Sample Size: {sample_size} data points
-- Anomalies Detected: {anomalies}
-
-**Statistical Results:**
-- Correlation Coefficient (r): {correlation_value:.4f}
-- This indicates a {strength} {direction} correlation
-- P-value: {p_value:.4f}
-- Statistical Significance: {significant} at α=0.05
-
-Please provide a comprehensive analysis in exactly 4 sections:
-
-**SECTION 1 - Statistical Interpretation:**
-Explain what the correlation coefficient and p-value mean in plain language. Is this relationship meaningful?
-
-**SECTION 2 - Potential Explanations:**
-If there's any correlation (even weak), what could be the potential causal mechanisms or confounding factors? Be specific to {city} and {symbol}.
-
-**SECTION 3 - Investment Implications:**
-What should investors or analysts take away from this finding? Should they act on it or ignore it?
-
-**SECTION 4 - Recommendations:**
-Suggest 2-3 specific follow-up analyses that would provide deeper insights.
-
-Keep each section concise (2-3 sentences). Be professional and data-driven."""
-
-        return prompt
+        return PROMPT_TEMPLATE.format_map({
+            **PROMPT_DEFAULTS,
+            **data,
+            'strength': stats.strength,
+            'direction': stats.direction,
+            'significant': "statistically significant" if stats.significant else "not statistically significant"
+        })
     
     def _parse_sections(self, text: str) -> Dict[str, str]:
         """Parse AI response into sections."""
@@ -138,40 +422,17 @@ Keep each section concise (2-3 sentences). Be professional and data-driven."""
             'recommendations': ''
         }
         
-        # Try to parse sections from the response
-        lines = text.split('\n')
-        current_section = None
-        current_content = []
-        
-        for line in lines:
-            line_lower = line.lower().strip()
-            
-            if 'statistical' in line_lower and ('interpretation' in line_lower or 'analysis' in line_lower):
-                if current_section and current_content:
-                    sections[current_section] = '\n'.join(current_content).strip()
-                current_section = 'statistical'
-                current_content = []
-            elif 'potential' in line_lower and ('explanation' in line_lower or 'mechanism' in line_lower):
-                if current_section and current_content:
-                    sections[current_section] = '\n'.join(current_content).strip()
-                current_section = 'explanations'
-                current_content = []
-            elif 'investment' in line_lower or 'implication' in line_lower:
-                if current_section and current_content:
-                    sections[current_section] = '\n'.join(current_content).strip()
-                current_section = 'implications'
-                current_content = []
-            elif 'recommendation' in line_lower or 'follow-up' in line_lower:
-                if current_section and current_content:
-                    sections[current_section] = '\n'.join(current_content).strip()
-                current_section = 'recommendations'
-                current_content = []
-            elif current_section and line.strip() and not line.startswith('#'):
-                current_content.append(line.strip())
-        
-        # Add the last section
-        if current_section and current_content:
-            sections[current_section] = '\n'.join(current_content).strip()
+        # Find all header lines in one scan; each section's content runs to
+        # the next header, without blank lines and "#" lines
+        headers = list(SECTION_HEADER_RE.finditer(text))
+        for header, next_header in zip(headers, headers[1:] + [None]):
+            end = next_header.start() if next_header else len(text)
+            content = '\n'.join(
+                stripped for line in text[header.end():end].split('\n')
+                if (stripped := line.strip()) and not line.startswith('#')
+            )
+            if content:
+                sections[header.lastgroup] = content
         
         # Fallback: if parsing failed, put everything in statistical
         if not any(sections.values()):
@@ -179,61 +440,21 @@ Keep each section concise (2-3 sentences). Be professional and data-driven."""
         
         return sections
     
-    def _generate_fallback_insight(self, data: Dict) -> Dict[str, str]:
+    def _generate_fallback_insight(self, data: Dict, stats: CorrelationClass) -> Dict[str, str]:
         """Generate rule-based insight when AI is unavailable."""
-        correlation_value = data.get('correlation_value', 0)
-        p_value = data.get('p_value', 1)
-        sample_size = data.get('sample_size', 0)
-        city = data.get('city', 'Unknown')
-        symbol = data.get('symbol', 'Unknown')
-        weather_var = data.get('weather_variable', 'temperature')
-        stock_var = data.get('stock_variable', 'close_price')
-        
-        abs_corr = abs(correlation_value)
-        
-        # Strength classification
-        if abs_corr > 0.7:
-            strength = "strong"
-            strength_desc = "a relationship worth investigating further"
-        elif abs_corr > 0.4:
-            strength = "moderate"
-            strength_desc = "a noteworthy relationship"
-        elif abs_corr > 0.2:
-            strength = "weak"
-            strength_desc = "a slight tendency"
-        else:
-            strength = "very weak"
-            strength_desc = "minimal relationship"
-        
-        direction = "positive" if correlation_value > 0 else "negative"
-        significant = p_value < 0.05
-        
-        # Statistical section
-        statistical = f"The analysis reveals a {strength} {direction} correlation (r={correlation_value:.3f}) between {weather_var} in {city} and {symbol}'s {stock_var}, based on {sample_size} data points. "
-        
-        if significant:
-            statistical += f"With a p-value of {p_value:.4f}, this relationship is statistically significant at the 95% confidence level, meaning there's less than a 5% chance this pattern occurred randomly."
-        else:
-            statistical += f"However, with a p-value of {p_value:.4f}, this relationship is not statistically significant, suggesting the observed pattern could be due to random chance rather than a true underlying relationship."
-        
-        # Explanations section
-        if abs_corr > 0.3:
-            explanations = f"Several factors could explain this correlation: {weather_var} might influence consumer behavior patterns that affect {symbol}'s sales, or both variables could be responding to seasonal trends. Additionally, {city}'s specific economic geography could create unique market dynamics."
-        else:
-            explanations = f"The weak correlation suggests that {weather_var} has minimal direct impact on {symbol}'s stock performance. Most stock price movements are driven by company fundamentals, market sentiment, and macroeconomic factors rather than local weather conditions."
-        
-        # Implications section
-        if significant and abs_corr > 0.4:
-            implications = f"Investors should note this relationship but avoid overweighting it in decision-making. While statistically significant, the correlation of {abs_corr:.2f} explains only {(abs_corr**2)*100:.1f}% of the variance. Consider this as one data point among many fundamental and technical factors."
-        else:
-            implications = f"From an investment perspective, this weak {('and non-significant' if not significant else '')} correlation should not influence trading decisions. Focus on traditional fundamental analysis, company earnings, and broader market trends rather than weather patterns for {symbol}."
-        
-        # Recommendations section
-        recommendations = f"""For deeper analysis, consider: (1) Extending the study period to multiple years to identify seasonal patterns, (2) Comparing multiple cities to see if the relationship holds geographically, and (3) Analyzing {symbol}'s sector peers to determine if this is industry-wide or company-specific."""
-        
-        return {
-            'statistical': statistical,
-            'explanations': explanations,
-            'implications': implications,
-            'recommendations': recommendations
+        templates = FALLBACK_TEMPLATES[(stats.bucket, stats.significant)]
+        
+        values = {
+            'correlation_value': data.get('correlation_value', 0),
+            'p_value': data.get('p_value', 1),
+            'abs_corr': stats.abs_corr,
+            'variance_pct': stats.variance_pct,
+            'direction': stats.direction,
+            'sample_size': data.get('sample_size', 0),
+            'city': data.get('city', 'Unknown'),
+            'symbol': data.get('symbol', 'Unknown'),
+            'weather_var': data.get('weather_variable', 'temperature'),
+            'stock_var': data.get('stock_variable', 'close_price')
         }
+        
+        return {section: template.format_map(values) for section, template in templates.items()}
@@ -0,0 +1,176 @@
+"""
+Response cache backed by Redis.
+Stores serialized JSON responses of expensive, read-only endpoints.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import redis
+from flask import Response, current_app, request
+
+from backend.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client: Optional[redis.Redis] = None
+_redis_initialized = False
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """
+    Get the process-wide Redis client.
+
+    Returns:
+        Redis client working on raw bytes, or None if Redis is unavailable
+    """
+    global _redis_client, _redis_initialized
+
+    if _redis_initialized:
+        return _redis_client
+
+    with _redis_lock:
+        if not _redis_initialized:
+            config = get_settings()
+            try:
+                client = redis.Redis(
+                    host=config.REDIS_HOST,
+                    port=config.REDIS_PORT,
+                    db=config.REDIS_DB,
+                    password=config.REDIS_PASSWORD
+                )
+                client.ping()  # Test connection
+                _redis_client = client
+                logger.info("Redis connected (response and data caches)")
+            except Exception as e:
+                logger.warning(f"Redis connection failed: {e}. Caching disabled.")
+            _redis_initialized = True
+
+    return _redis_client
+
+
+def _version_key(scope: str) -> str:
+    """Redis key of the version counter for an invalidation scope."""
+    return f"dw:version:{scope}"
+
+
+def invalidate_scopes(*scopes: str) -> None:
+    """
+    Invalidate cached responses by bumping the version of each scope.
+
+    Cached entries keyed on an older version are never read again and
+    expire with their TTL.
+    """
+    client = get_redis()
+    if client is None or not scopes:
+        return
+
+    try:
+        pipe = client.pipeline()
+        for scope in scopes:
+            pipe.incr(_version_key(scope))
+        pipe.execute()
+        logger.debug(f"Response cache invalidated: {', '.join(scopes)}")
+    except Exception as e:
+        logger.warning(f"Response cache invalidation error: {e}")
+
+
+def _build_cache_key(namespace: str, versions: Optional[List[Any]] = None) -> str:
+    """Build a cache key from the request path, query string, JSON body and scope versions."""
+    body = request.get_json(silent=True)
+    fingerprint = json.dumps(
+        [request.path, request.query_string.decode(), body, versions],
+        sort_keys=True,
+        default=str
+    )
+    digest = hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+    return f"dw:{namespace}:{digest}"
+
+
+def _cached_response(entry: Dict[bytes, bytes]) -> Response:
+    """Rebuild a Flask response from a cached Redis hash."""
+    return Response(
+        entry[b'body'],
+        status=int(entry[b'status']),
+        mimetype='application/json'
+    )
+
+
+def cache_response(
+    policy: str = 'normal',
+    namespace: Optional[str] = None,
+    scopes: Optional[Callable[[], Iterable[str]]] = None
+):
+    """
+    Cache successful JSON responses of a view in Redis.
+
+    Args:
+        policy: TTL policy name from RESPONSE_CACHE_TTLS (short, normal, long, immutable)
+        namespace: Cache key namespace (defaults to the view function name)
+        scopes: Optional callable returning the invalidation scopes of the
+            current request; their versions are part of the cache key, see
+            invalidate_scopes()
+
+    When CACHE_FALLBACK is enabled, expired entries are kept for
+    CACHE_STALE_SECONDS and served if the view fails with a 5xx error.
+    Responses marked ``Cache-Control: no-store`` by the view are not cached.
+    """
+    def decorator(view):
+        key_namespace = namespace or view.__name__
+
+        @wraps(view)
+        def wrapper(*args: Any, **kwargs: Any):
+            client = get_redis()
+            if client is None:
+                return view(*args, **kwargs)
+
+            config = current_app.config
+            ttl = config['RESPONSE_CACHE_TTLS'][policy]
+            fallback = config['CACHE_FALLBACK']
+
+            entry = None
+            try:
+                versions = None
+                if scopes is not None:
+                    versions = client.mget([_version_key(scope) for scope in scopes()])
+                key = _build_cache_key(key_namespace, versions)
+                entry = client.hgetall(key)
+            except Exception as e:
+                logger.warning(f"Response cache retrieval error: {e}")
+                return view(*args, **kwargs)
+
+            if entry and float(entry[b'expires_at']) > time.time():
+                logger.debug(f"Response cache hit: {key}")
+                return _cached_response(entry)
+
+            response = current_app.make_response(view(*args, **kwargs))
+
+            if response.status_code == 200 and not response.cache_control.no_store:
+                retention = ttl + (config['CACHE_STALE_SECONDS'] if fallback else 0)
+                try:
+                    pipe = client.pipeline()
+                    pipe.hset(key, mapping={
+                        'body': response.get_data(),
+                        'status': response.status_code,
+                        'expires_at': time.time() + ttl
+                    })
+                    pipe.expire(key, retention)
+                    pipe.execute()
+                    logger.debug(f"Response cache set: {key} (TTL: {ttl}s)")
+                except Exception as e:
+                    logger.warning(f"Response cache set error: {e}")
+            elif entry and fallback and response.status_code >= 500:
+                logger.warning(f"Serving stale cached response for {request.path}")
+                return _cached_response(entry)
+
+            return response
+
+        return wrapper
+
+    return decorator
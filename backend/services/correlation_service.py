@@ -3,85 +3,273 @@ Correlation Service for statistical analysis of weather and stock data.
 Implements Pearson correlation, significance testing, and anomaly detection.
 """
 
+import io
 import logging
+from bisect import bisect_right
+from operator import attrgetter
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, List, Sequence, Tuple, Optional, Any
 from datetime import datetime
-from scipy import stats as scipy_stats
+from scipy import special as scipy_special
 
+from backend.config import get_settings
 from backend.models import db
 from backend.models.weather import WeatherData
 from backend.models.stock import StockData
 from backend.models.correlation import CorrelationResult
+from backend.services.cache import get_redis
+
+# Optional: Parquet serialization of cached alignments
+try:
+    import pyarrow.parquet  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Source columns read for alignment; volatility and daily_change are
+# derived from the stock prices
+WEATHER_ALIGN_COLUMNS = ('temperature', 'humidity', 'precipitation', 'wind_speed')
+STOCK_ALIGN_COLUMNS = ('close_price', 'volume', 'high_price', 'low_price', 'open_price')
+
+# Variables of the aligned frame; AUTO_VARIABLE lets analyze_correlation
+# pick the most strongly correlated one
+WEATHER_VARIABLES = ('temperature', 'humidity', 'precipitation', 'wind_speed')
+STOCK_VARIABLES = ('close_price', 'volume', 'volatility', 'daily_change')
+AUTO_VARIABLE = 'auto'
+
+# Insight wording: correlation strength by |r| (lower bounds inclusive),
+# direction by sign beyond DIRECTION_THRESHOLD, significance by p (upper
+# bounds exclusive)
+INSIGHT_STRENGTH_BOUNDS = (0.2, 0.4, 0.7)
+INSIGHT_STRENGTHS = ("very weak", "weak", "moderate", "strong")
+DIRECTION_THRESHOLD = 0.05
+INSIGHT_DIRECTIONS = (
+    ("negligible", "shows no clear relationship with"),
+    ("positive", "increases with"),
+    ("negative", "decreases with")
+)
+INSIGHT_SIGNIFICANCE_BOUNDS = (0.001, 0.01, 0.05, 0.1)
+INSIGHT_SIGNIFICANCE = (
+    "very highly significant",
+    "highly significant",
+    "significant",
+    "marginally significant",
+    "not statistically significant"
+)
+
+INSIGHT_SUMMARY_TEMPLATE = (
+    "Analysis of {sample_size} data points reveals a {strength} {direction} correlation "
+    "(r={correlation_value:.3f}) between {weather_variable} and {stock_variable}. "
+    "The {stock_variable} {relationship} {weather_variable}. "
+    "This relationship is {significance} (p={p_value:.4f})."
+)
+INSIGHT_SIGNIFICANT = (
+    "The correlation is statistically significant, suggesting a real relationship "
+    "rather than random chance."
+)
+INSIGHT_NOT_SIGNIFICANT = (
+    "The correlation is not statistically significant, which means the observed "
+    "relationship could be due to random chance."
+)
+INSIGHT_ANOMALIES_TEMPLATE = (
+    "Detected {anomalies_count} anomalous data points that deviate significantly "
+    "from the normal pattern, which may represent unusual market or weather events."
+)
+
+# Storage dtype of the aligned variables; correlation and anomaly math
+# upcasts to float64 before reducing
+ALIGNED_DTYPE = np.float32
+
+# Layout version of cached aligned frames, part of their Redis keys
+ALIGNMENT_CACHE_VERSION = 2
+
+
+def _frame_from_rows(rows: Sequence[Any], columns: Sequence[str]) -> pd.DataFrame:
+    """
+    Build a (timestamp, *columns) DataFrame from model instances or row tuples.
+    
+    Works for anything exposing the columns as attributes, so ORM objects
+    and projected query rows share one columnar build.
+    """
+    getter = attrgetter('timestamp', *columns)
+    return pd.DataFrame.from_records(
+        [getter(row) for row in rows],
+        columns=['timestamp', *columns]
+    )
+
+
+def _float_or_nan(values: pd.Series) -> pd.Series:
+    """Convert a column to float64, treating missing and zero values as NaN."""
+    values = values.astype('float64')
+    return values.mask(values == 0)
+
+
+def zscore_outliers(values: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Return the positions of values whose population Z-score exceeds threshold.
+    
+    Compares |x - mean| against threshold * std instead of dividing every
+    deviation by std; constant input has no outliers.
+    """
+    mean = values.mean()
+    std = values.std()
+    if std == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.abs(values - mean) > threshold * std)
+
 
 class CorrelationService:
     """Service for statistical correlation analysis."""
     
-    def __init__(self):
-        """Initialize correlation service."""
+    def __init__(self, redis_client=None):
+        """
+        Initialize correlation service.
+        
+        Args:
+            redis_client: Redis client (raw bytes) for cached alignments;
+                defaults to the shared client from get_redis()
+        """
         self.min_sample_size = 10  # Minimum data points for correlation
         self.significance_threshold = 0.05  # P-value threshold
         self.anomaly_threshold = 3.0  # Z-score threshold for anomalies
+        self._redis = redis_client
+    
+    @property
+    def redis(self):
+        """Redis client for cached alignments, or None if unavailable."""
+        return self._redis if self._redis is not None else get_redis()
+    
+    @staticmethod
+    def _alignment_key(city: str, symbol: str, start_date: datetime, end_date: datetime) -> str:
+        """Get Redis key for an aligned frame."""
+        return (
+            f"aligned:v{ALIGNMENT_CACHE_VERSION}:{city}:{symbol.upper()}:"
+            f"{start_date.isoformat()}:{end_date.isoformat()}"
+        )
+    
+    def get_cached_alignment(
+        self,
+        city: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[pd.DataFrame]:
+        """
+        Get a cached align_time_series result for a study.
+        
+        Returns:
+            The aligned DataFrame, or None on a cache miss
+        """
+        client = self.redis
+        if client is None or not PARQUET_AVAILABLE:
+            return None
+        
+        key = self._alignment_key(city, symbol, start_date, end_date)
+        try:
+            raw = client.get(key)
+            if raw:
+                logger.debug(f"Alignment cache hit: {key}")
+                return pd.read_parquet(io.BytesIO(raw), engine='pyarrow')
+        except Exception as e:
+            logger.warning(f"Alignment cache retrieval error: {e}")
+        
+        return None
+    
+    def cache_alignment(
+        self,
+        city: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        aligned_df: pd.DataFrame
+    ) -> None:
+        """
+        Cache a study's aligned frame as Parquet.
+        
+        Entries expire after CACHE_TTL_SECONDS, like the DataService caches
+        the alignment is built from. Empty frames are not cached.
+        """
+        client = self.redis
+        if aligned_df.empty or client is None or not PARQUET_AVAILABLE:
+            return
+        
+        key = self._alignment_key(city, symbol, start_date, end_date)
+        try:
+            buffer = io.BytesIO()
+            aligned_df.to_parquet(buffer, engine='pyarrow', compression='zstd')
+            client.setex(key, get_settings().CACHE_TTL_SECONDS, buffer.getvalue())
+            logger.debug(f"Alignment cached: {key}")
+        except Exception as e:
+            logger.warning(f"Alignment cache set error: {e}")
     
     def align_time_series(
         self,
-        weather_data: List[WeatherData],
-        stock_data: List[StockData]
+        weather_data: Sequence[Any],
+        stock_data: Sequence[Any]
     ) -> pd.DataFrame:
         """
         Align weather and stock data by timestamp.
         
         Args:
-            weather_data: List of WeatherData instances
-            stock_data: List of StockData instances
+            weather_data: WeatherData instances or rows with WEATHER_ALIGN_COLUMNS
+            stock_data: StockData instances or rows with STOCK_ALIGN_COLUMNS
             
         Returns:
-            DataFrame with aligned data
+            DataFrame with aligned data, indexed by the weather timestamps
         """
-        # Convert to DataFrames
-        weather_df = pd.DataFrame([{
-            'timestamp': w.timestamp,
-            'temperature': float(w.temperature) if w.temperature else None,
-            'humidity': w.humidity,
-            'precipitation': float(w.precipitation) if w.precipitation else 0.0,
-            'wind_speed': float(w.wind_speed) if w.wind_speed else None
-        } for w in weather_data])
-        
-        stock_df = pd.DataFrame([{
-            'timestamp': s.timestamp,
-            'close_price': float(s.close_price) if s.close_price else None,
-            'volume': s.volume,
-            'volatility': s.volatility,
-            'daily_change': s.daily_change
-        } for s in stock_data])
-        
-        if weather_df.empty or stock_df.empty:
+        if not weather_data or not stock_data:
             logger.warning("Empty dataset provided for alignment")
             return pd.DataFrame()
         
+        # Build both frames column-wise; missing and zero readings become
+        # NaN (precipitation 0.0), like the model properties
+        weather_df = _frame_from_rows(weather_data, WEATHER_ALIGN_COLUMNS)
+        weather_df['temperature'] = _float_or_nan(weather_df['temperature'])
+        weather_df['precipitation'] = weather_df['precipitation'].astype('float64').fillna(0.0)
+        weather_df['wind_speed'] = _float_or_nan(weather_df['wind_speed'])
+        
+        stock_df = _frame_from_rows(stock_data, STOCK_ALIGN_COLUMNS)
+        prices = {
+            column: _float_or_nan(stock_df.pop(column))
+            for column in ('close_price', 'high_price', 'low_price', 'open_price')
+        }
+        stock_df.insert(1, 'close_price', prices['close_price'])
+        stock_df['volatility'] = (prices['high_price'] - prices['low_price']).fillna(0.0)
+        stock_df['daily_change'] = (prices['close_price'] - prices['open_price']).fillna(0.0)
+        
         # Set timestamp as index
         weather_df.set_index('timestamp', inplace=True)
         stock_df.set_index('timestamp', inplace=True)
         
-        # Sort by timestamp
-        weather_df.sort_index(inplace=True)
-        stock_df.sort_index(inplace=True)
+        # Sort by timestamp; model queries already return rows in order, so
+        # this is usually just the monotonicity check
+        for frame in (weather_df, stock_df):
+            if not frame.index.is_monotonic_increasing:
+                frame.sort_index(inplace=True)
         
-        # Merge using nearest timestamp (asof merge)
+        # Merge using nearest timestamp (asof merge) directly on the indexes
         aligned_df = pd.merge_asof(
-            weather_df.reset_index(),
-            stock_df.reset_index(),
-            on='timestamp',
+            weather_df,
+            stock_df,
+            left_index=True,
+            right_index=True,
             direction='nearest',
             tolerance=pd.Timedelta(hours=12)  # Maximum time difference for matching
         )
         
-        # Remove rows with missing critical data
-        aligned_df.dropna(subset=['temperature', 'close_price'], inplace=True)
+        # Remove rows with missing critical data, using one joint mask and
+        # copying only if there is something to drop
+        keep = aligned_df['temperature'].notna().to_numpy() & aligned_df['close_price'].notna().to_numpy()
+        if not keep.all():
+            aligned_df = aligned_df[keep]
+        
+        # Half-width variables for the aligned (and cached) frame
+        aligned_df = aligned_df.astype(
+            {column: ALIGNED_DTYPE for column in (*WEATHER_VARIABLES, *STOCK_VARIABLES)}
+        )
         
         logger.info(f"Aligned {len(aligned_df)} data points")
         return aligned_df
@@ -105,29 +293,105 @@ class CorrelationService:
             logger.warning(f"Insufficient data for correlation: {len(x)} points")
             return 0.0, 1.0
         
-        # Remove NaN values
-        mask = ~(x.isna() | y.isna())
-        x_clean = x[mask]
-        y_clean = y[mask]
+        # Remove NaN values; aligned frames are usually complete already,
+        # in which case the arrays are used as they are
+        xc = x.to_numpy(dtype=np.float64)
+        yc = y.to_numpy(dtype=np.float64)
+        mask = ~(np.isnan(xc) | np.isnan(yc))
+        if not mask.all():
+            xc = xc[mask]
+            yc = yc[mask]
         
-        if len(x_clean) < self.min_sample_size:
+        if len(xc) < self.min_sample_size:
             logger.warning("Insufficient clean data after removing NaN values")
             return 0.0, 1.0
         
-        # Calculate Pearson correlation
+        # Pearson r from the centered dot product:
+        # r = (xc . yc) / (|xc| |yc|)
         try:
-            corr_coef, p_value = scipy_stats.pearsonr(x_clean, y_clean)
-            logger.info(f"Correlation: r={corr_coef:.4f}, p={p_value:.6f}, n={len(x_clean)}")
+            xc = xc - xc.mean()
+            yc = yc - yc.mean()
+            
+            denominator = np.linalg.norm(xc) * np.linalg.norm(yc)
+            if denominator == 0:
+                logger.warning("Constant input, correlation is undefined")
+                return 0.0, 1.0
+            corr_coef = np.clip(np.dot(xc, yc) / denominator, -1.0, 1.0)
+            
+            # Two-sided p-value of the t statistic t^2 = r^2 df / (1 - r^2),
+            # via the regularized incomplete beta function as in pearsonr
+            df = len(xc) - 2
+            with np.errstate(divide='ignore'):
+                t_squared = corr_coef * corr_coef * df / (1.0 - corr_coef * corr_coef)
+            p_value = scipy_special.betainc(0.5 * df, 0.5, df / (df + t_squared))
+            
+            logger.info(f"Correlation: r={corr_coef:.4f}, p={p_value:.6f}, n={len(xc)}")
             return float(corr_coef), float(p_value)
         except Exception as e:
             logger.error(f"Error calculating correlation: {e}")
             return 0.0, 1.0
     
+    def calculate_correlation_matrix(
+        self,
+        weather_values: np.ndarray,
+        stock_values: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate Pearson r and p-values for every weather/stock column pair.
+        
+        Args:
+            weather_values: (n, kw) array of complete weather observations
+            stock_values: (n, ks) array of the matching stock observations
+            
+        Returns:
+            Tuple of (kw, ks) arrays (correlation_coefficients, p_values);
+            constant columns get r=0, p=1
+        """
+        n = weather_values.shape[0]
+        shape = (weather_values.shape[1], stock_values.shape[1])
+        if n < self.min_sample_size:
+            logger.warning(f"Insufficient data for correlation matrix: {n} points")
+            return np.zeros(shape), np.ones(shape)
+        
+        # Unit-normalized centered columns; one matrix product gives all r
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weather_centered = weather_values - weather_values.mean(axis=0)
+            weather_centered /= np.linalg.norm(weather_centered, axis=0)
+            stock_centered = stock_values - stock_values.mean(axis=0)
+            stock_centered /= np.linalg.norm(stock_centered, axis=0)
+            r_matrix = weather_centered.T @ stock_centered
+            
+            undefined = ~np.isfinite(r_matrix)
+            r_matrix[undefined] = 0.0
+            np.clip(r_matrix, -1.0, 1.0, out=r_matrix)
+            
+            df = n - 2
+            t_squared = r_matrix * r_matrix * df / (1.0 - r_matrix * r_matrix)
+            p_matrix = scipy_special.betainc(0.5 * df, 0.5, df / (df + t_squared))
+        
+        p_matrix[undefined] = 1.0
+        return r_matrix, p_matrix
+    
+    def select_strongest_pair(
+        self,
+        aligned_df: pd.DataFrame,
+        weather_variables: Sequence[str],
+        stock_variables: Sequence[str]
+    ) -> Tuple[str, str]:
+        """Return the (weather, stock) variable pair with the largest |r|."""
+        complete = aligned_df[list(weather_variables) + list(stock_variables)].dropna()
+        r_matrix, _ = self.calculate_correlation_matrix(
+            complete[list(weather_variables)].to_numpy(dtype=np.float64),
+            complete[list(stock_variables)].to_numpy(dtype=np.float64)
+        )
+        i, j = np.unravel_index(np.argmax(np.abs(r_matrix)), r_matrix.shape)
+        return weather_variables[i], stock_variables[j]
+    
     def detect_anomalies(
         self,
         data: pd.DataFrame,
         columns: List[str]
-    ) -> Dict[str, List[int]]:
+    ) -> Dict[str, List[Any]]:
         """
         Detect anomalies using Z-score method.
         
@@ -136,7 +400,7 @@ class CorrelationService:
             columns: Column names to check for anomalies
             
         Returns:
-            Dictionary mapping column names to lists of anomaly indices
+            Dictionary mapping column names to lists of anomaly index labels
         """
         anomalies = {}
         
@@ -144,16 +408,21 @@ class CorrelationService:
             if col not in data.columns:
                 continue
             
-            series = data[col].dropna()
-            if len(series) < 10:  # Need enough data for meaningful statistics
+            values = data[col].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(values)
+            n_valid = np.count_nonzero(valid)
+            if n_valid < 10:  # Need enough data for meaningful statistics
                 continue
             
-            # Calculate Z-scores
-            z_scores = np.abs(scipy_stats.zscore(series))
-            
-            # Find anomalies (Z-score > threshold)
-            anomaly_mask = z_scores > self.anomaly_threshold
-            anomaly_indices = series[anomaly_mask].index.tolist()
+            # Find anomalies (Z-score > threshold) among the non-missing values,
+            # as positions into the full column
+            if n_valid == len(values):
+                positions = zscore_outliers(values, self.anomaly_threshold)
+            else:
+                positions = np.flatnonzero(valid)[
+                    zscore_outliers(values[valid], self.anomaly_threshold)
+                ]
+            anomaly_indices = data.index[positions].tolist()
             
             if anomaly_indices:
                 anomalies[col] = anomaly_indices
@@ -184,69 +453,27 @@ class CorrelationService:
         Returns:
             Natural language insight text
         """
-        insights = []
-        
-        # Correlation strength
         abs_corr = abs(correlation_value)
-        if abs_corr >= 0.7:
-            strength = "strong"
-        elif abs_corr >= 0.4:
-            strength = "moderate"
-        elif abs_corr >= 0.2:
-            strength = "weak"
-        else:
-            strength = "very weak"
-        
-        # Correlation direction
-        if correlation_value > 0.05:
-            direction = "positive"
-            relationship = "increases with"
-        elif correlation_value < -0.05:
-            direction = "negative"
-            relationship = "decreases with"
-        else:
-            direction = "negligible"
-            relationship = "shows no clear relationship with"
-        
-        # Statistical significance
-        if p_value < 0.001:
-            significance = "very highly significant"
-        elif p_value < 0.01:
-            significance = "highly significant"
-        elif p_value < 0.05:
-            significance = "significant"
-        elif p_value < 0.1:
-            significance = "marginally significant"
-        else:
-            significance = "not statistically significant"
-        
-        # Build insights
-        insights.append(
-            f"Analysis of {sample_size} data points reveals a {strength} {direction} correlation "
-            f"(r={correlation_value:.3f}) between {weather_variable} and {stock_variable}."
-        )
-        
-        insights.append(
-            f"The {stock_variable} {relationship} {weather_variable}. "
-            f"This relationship is {significance} (p={p_value:.4f})."
-        )
-        
-        if p_value < 0.05:
-            insights.append(
-                f"The correlation is statistically significant, suggesting a real relationship "
-                f"rather than random chance."
-            )
-        else:
-            insights.append(
-                f"The correlation is not statistically significant, which means the observed "
-                f"relationship could be due to random chance."
-            )
+        # -1, 0 or 1; -1 indexes the last (negative) entry
+        sign = (correlation_value > DIRECTION_THRESHOLD) - (correlation_value < -DIRECTION_THRESHOLD)
+        direction, relationship = INSIGHT_DIRECTIONS[sign]
+        
+        insights = [INSIGHT_SUMMARY_TEMPLATE.format_map({
+            'sample_size': sample_size,
+            'strength': INSIGHT_STRENGTHS[bisect_right(INSIGHT_STRENGTH_BOUNDS, abs_corr)],
+            'direction': direction,
+            'relationship': relationship,
+            'significance': INSIGHT_SIGNIFICANCE[bisect_right(INSIGHT_SIGNIFICANCE_BOUNDS, p_value)],
+            'correlation_value': correlation_value,
+            'p_value': p_value,
+            'weather_variable': weather_variable,
+            'stock_variable': stock_variable
+        })]
+        
+        insights.append(INSIGHT_SIGNIFICANT if p_value < 0.05 else INSIGHT_NOT_SIGNIFICANT)
         
         if anomalies_count > 0:
-            insights.append(
-                f"Detected {anomalies_count} anomalous data points that deviate significantly "
-                f"from the normal pattern, which may represent unusual market or weather events."
-            )
+            insights.append(INSIGHT_ANOMALIES_TEMPLATE.format(anomalies_count=anomalies_count))
         
         return " ".join(insights)
     
@@ -254,10 +481,12 @@ class CorrelationService:
         self,
         city: str,
         symbol: str,
-        weather_data: List[WeatherData],
-        stock_data: List[StockData],
+        weather_data: Optional[Sequence[Any]] = None,
+        stock_data: Optional[Sequence[Any]] = None,
         weather_variable: str = 'temperature',
-        stock_variable: str = 'close_price'
+        stock_variable: str = 'close_price',
+        aligned_df: Optional[pd.DataFrame] = None,
+        date_range: Optional[str] = None
     ) -> Optional[CorrelationResult]:
         """
         Perform complete correlation analysis.
@@ -265,10 +494,14 @@ class CorrelationService:
         Args:
             city: City name
             symbol: Stock symbol
-            weather_data: List of weather data points
-            stock_data: List of stock data points
-            weather_variable: Weather variable to analyze
-            stock_variable: Stock variable to analyze
+            weather_data: Weather data points (instances or projected rows)
+            stock_data: Stock data points (instances or projected rows)
+            weather_variable: Weather variable to analyze, or AUTO_VARIABLE
+            stock_variable: Stock variable to analyze, or AUTO_VARIABLE
+            aligned_df: Already aligned frame (e.g. from get_cached_alignment),
+                used instead of aligning weather_data and stock_data
+            date_range: Requested range key stored with the result, see
+                utils.dates.date_range_key
             
         Returns:
             CorrelationResult instance or None if analysis fails
@@ -276,12 +509,22 @@ class CorrelationService:
         logger.info(f"Analyzing correlation between {weather_variable} and {stock_variable}")
         
         # Align time series
-        aligned_df = self.align_time_series(weather_data, stock_data)
+        if aligned_df is None:
+            aligned_df = self.align_time_series(weather_data, stock_data)
         
         if aligned_df.empty:
             logger.error("No aligned data available for correlation analysis")
             return None
         
+        # Resolve unpinned variables to the strongest correlated pair
+        if AUTO_VARIABLE in (weather_variable, stock_variable):
+            weather_variable, stock_variable = self.select_strongest_pair(
+                aligned_df,
+                WEATHER_VARIABLES if weather_variable == AUTO_VARIABLE else (weather_variable,),
+                STOCK_VARIABLES if stock_variable == AUTO_VARIABLE else (stock_variable,)
+            )
+            logger.info(f"Selected strongest pair: {weather_variable} and {stock_variable}")
+        
         # Calculate correlation
         corr_value, p_value = self.calculate_correlation(
             aligned_df[weather_variable],
@@ -296,8 +539,8 @@ class CorrelationService:
         anomalies_count = sum(len(indices) for indices in anomalies.values())
         
         # Calculate period
-        start_date = aligned_df['timestamp'].min()
-        end_date = aligned_df['timestamp'].max()
+        start_date = aligned_df.index.min()
+        end_date = aligned_df.index.max()
         period_days = (end_date - start_date).days
         
         # Generate insights
@@ -334,7 +577,8 @@ class CorrelationService:
             stock_variable=stock_variable,
             significance_level=significance_level,
             analysis_notes=insights,
-            anomalies_detected=anomalies_count
+            anomalies_detected=anomalies_count,
+            date_range=date_range
         )
         
         # Save to database
@@ -4,19 +4,120 @@ Integrates with MCP client and provides caching layer.
 """
 
 import logging
+import pandas as pd
 import redis
-import json
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
+from sqlalchemy import inspect, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
 
 from backend.models import db
 from backend.models.weather import WeatherData
 from backend.models.stock import StockData
-from backend.services.direct_api_client import DirectAPIClient  # Using direct API instead of MCP
-from backend.config import get_config
+from backend.services.correlation_service import ALIGNED_DTYPE, STOCK_VARIABLES, WEATHER_VARIABLES
+from backend.services.direct_api_client import (  # Using direct API instead of MCP
+    APIError,
+    DirectAPIClient,
+    PermanentAPIError
+)
+from backend.config import get_settings
+from backend.services.cache import get_redis
+from backend.utils.responses import dumps
 
 logger = logging.getLogger(__name__)
 
+# Optional: compiled validation of API records
+try:
+    import msgspec
+    from backend.services.records import StockRecord, WeatherRecord
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+    WeatherRecord = StockRecord = None
+    logger.info("msgspec not installed. Using Python record validation.")
+
+# Worker threads shared by all requests for the blocking external API calls
+API_FETCH_WORKERS = 8
+
+_fetch_executor = ThreadPoolExecutor(max_workers=API_FETCH_WORKERS, thread_name_prefix='api-fetch')
+
+# Ranges fetched and stored in the database are cached as STORED_CACHE_MARKER;
+# callers read the records from the database. Empty or failed fetches are
+# cached as NEGATIVE_CACHE_SENTINEL so repeated requests for the range don't
+# call the API again until it expires; failures that retrying won't fix (bad
+# key, unknown symbol) are remembered longer
+STORED_CACHE_MARKER = {'__stored__': True}
+NEGATIVE_CACHE_SENTINEL = {'__empty__': True}
+NEGATIVE_CACHE_PAYLOAD = dumps(NEGATIVE_CACHE_SENTINEL)
+NEGATIVE_CACHE_TTL_SECONDS = 60
+PERMANENT_FAILURE_TTL_SECONDS = 900
+
+# Server-side as-of join (PostgreSQL) with the semantics of
+# CorrelationService.align_time_series: each weather reading is paired with
+# the nearest stock bar within 12 hours (the earlier one on ties), zero
+# readings count as missing, and rows without temperature or close price
+# are dropped. The timestamp ranges use the (city|symbol, timestamp) indexes.
+ALIGNED_ROWS_SQL = text("""
+    SELECT w.timestamp,
+           NULLIF(w.temperature, 0) AS temperature,
+           w.humidity,
+           COALESCE(w.precipitation, 0) AS precipitation,
+           NULLIF(w.wind_speed, 0) AS wind_speed,
+           s.close_price,
+           s.volume,
+           COALESCE(s.high_price - s.low_price, 0) AS volatility,
+           COALESCE(s.close_price - s.open_price, 0) AS daily_change
+    FROM weather_data w
+    JOIN LATERAL (
+        SELECT NULLIF(close_price, 0) AS close_price,
+               volume,
+               NULLIF(high_price, 0) AS high_price,
+               NULLIF(low_price, 0) AS low_price,
+               NULLIF(open_price, 0) AS open_price
+        FROM stock_data
+        WHERE symbol = :symbol
+          AND timestamp BETWEEN :start_date AND :end_date
+          AND timestamp BETWEEN w.timestamp - INTERVAL '12 hours'
+                            AND w.timestamp + INTERVAL '12 hours'
+        ORDER BY abs(extract(epoch FROM timestamp - w.timestamp)), timestamp
+        LIMIT 1
+    ) s ON true
+    WHERE w.city = :city
+      AND w.timestamp BETWEEN :start_date AND :end_date
+      AND NULLIF(w.temperature, 0) IS NOT NULL
+      AND s.close_price IS NOT NULL
+    ORDER BY w.timestamp
+""")
+
+# INSERT constructs supporting ON CONFLICT DO NOTHING, by dialect name
+INSERT_IGNORE = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+# Whether a table has its (key, timestamp) unique index, by (database URL,
+# table); databases created before the index need `flask db upgrade`
+_UNIQUE_KEYS: Dict[Tuple[str, str], bool] = {}
+
+
+def _has_unique_key(bind, table: str, key_column: str) -> bool:
+    """Whether ON CONFLICT (key_column, timestamp) can be used on a table."""
+    cache_key = (str(bind.url), table)
+    if cache_key not in _UNIQUE_KEYS:
+        inspector = inspect(bind)
+        keys = inspector.get_unique_constraints(table) + [
+            index for index in inspector.get_indexes(table) if index.get('unique')
+        ]
+        found = any(key['column_names'] == [key_column, 'timestamp'] for key in keys)
+        if not found:
+            logger.warning(
+                f"{table} has no unique ({key_column}, timestamp) index; "
+                f"run `flask db upgrade`. Filtering duplicates in Python meanwhile."
+            )
+        _UNIQUE_KEYS[cache_key] = found
+    return _UNIQUE_KEYS[cache_key]
+
 
 class DataService:
     """Service for data fetching, validation, and persistence."""
@@ -27,63 +128,76 @@ class DataService:
         
         Args:
             api_client: Direct API client instance
-            redis_client: Redis client for caching
+            redis_client: Redis client for caching (raw bytes); defaults to
+                the shared client from get_redis(), None if Redis is
+                unavailable
         """
         self.api_client = api_client or DirectAPIClient()
-        config = get_config()()
-        
-        # Initialize Redis cache
-        if redis_client:
-            self.redis = redis_client
-        else:
-            try:
-                self.redis = redis.Redis(
-                    host=config.REDIS_HOST,
-                    port=config.REDIS_PORT,
-                    db=config.REDIS_DB,
-                    password=config.REDIS_PASSWORD,
-                    decode_responses=True
-                )
-                self.redis.ping()  # Test connection
-                logger.info("Redis cache connected successfully")
-            except Exception as e:
-                logger.warning(f"Redis connection failed: {e}. Caching disabled.")
-                self.redis = None
-        
-        self.cache_ttl = config.CACHE_TTL_SECONDS
+        self.redis = redis_client if redis_client is not None else get_redis()
+        self.cache_ttl = get_settings().CACHE_TTL_SECONDS
     
     def _get_cache_key(self, prefix: str, **kwargs) -> str:
         """Generate cache key from parameters."""
         key_parts = [prefix] + [f"{k}:{v}" for k, v in sorted(kwargs.items())]
         return ":".join(key_parts)
     
-    def _get_from_cache(self, key: str) -> Optional[Any]:
-        """Retrieve data from cache."""
+    def _cache_presence(self, key: str) -> Optional[bool]:
+        """
+        Check whether a range is cached, reading only the head of its entry.
+        
+        Returns:
+            None on a miss (or without Redis), False for a negative entry,
+            True for a stored range (including record payloads cached by
+            earlier versions)
+        """
         if not self.redis:
             return None
         
         try:
-            cached = self.redis.get(key)
-            if cached:
-                logger.debug(f"Cache hit: {key}")
-                return json.loads(cached)
+            # Reading one byte past the sentinel's length tells it apart from records
+            head = self.redis.getrange(key, 0, len(NEGATIVE_CACHE_PAYLOAD))
         except Exception as e:
             logger.warning(f"Cache retrieval error: {e}")
-        
-        return None
+            return None
+        if not head:
+            return None
+        return head != NEGATIVE_CACHE_PAYLOAD
     
     def _set_cache(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Store data in cache."""
+        """Store a JSON value in cache."""
         if not self.redis:
             return
         
         try:
             ttl = ttl or self.cache_ttl
-            self.redis.setex(key, ttl, json.dumps(value))
+            self.redis.setex(key, ttl, dumps(value))
             logger.debug(f"Cache set: {key} (TTL: {ttl}s)")
         except Exception as e:
             logger.warning(f"Cache set error: {e}")
     
+    def _valid_records(self, raw_data: List[Dict[str, Any]], record_type, validate) -> List[Dict[str, Any]]:
+        """
+        Return the valid API records of raw_data, skipping invalid ones.
+        
+        With msgspec the whole payload is validated in one call against
+        record_type, falling back to per-record checks only when it contains
+        invalid records; otherwise each record goes through validate.
+        """
+        if not MSGSPEC_AVAILABLE:
+            return [item for item in raw_data if validate(item)]
+        
+        try:
+            records = msgspec.convert(raw_data, list[record_type])
+        except msgspec.ValidationError:
+            records = []
+            for item in raw_data:
+                try:
+                    records.append(msgspec.convert(item, record_type))
+                except msgspec.ValidationError as e:
+                    logger.warning(f"Invalid {record_type.__name__}: {e}")
+        
+        return [msgspec.structs.asdict(record) for record in records]
+    
     def _validate_weather_data(self, data: Dict[str, Any]) -> bool:
         """Validate weather data structure and values."""
         required_fields = ['timestamp', 'temperature', 'humidity', 'wind_speed', 'condition']
@@ -132,191 +246,373 @@ class DataService:
         
         return True
     
-    def fetch_and_store_weather(
-        self,
-        city: str,
-        start_date: datetime,
-        end_date: datetime,
-        use_cache: bool = True
-    ) -> List[WeatherData]:
+    def _insert_new(self, model, key_column: str, rows: List[Dict[str, Any]]) -> int:
         """
-        Fetch weather data from MCP and store in database.
+        Insert rows not yet stored for their (key_column, timestamp) and commit.
+        
+        The database skips duplicates via ON CONFLICT DO NOTHING on the
+        unique key where the dialect supports it and the index exists;
+        otherwise rows are filtered against the stored timestamps first.
         
         Args:
-            city: City name
-            start_date: Start date for data range
-            end_date: End date for data range
-            use_cache: Whether to use cache
+            model: WeatherData or StockData
+            key_column: 'city' or 'symbol'; all rows share one value
+            rows: Column values of the validated records
             
         Returns:
-            List of WeatherData instances
+            Number of stored records in the rows' timestamp range
         """
-        # Check cache first
-        if use_cache:
-            cache_key = self._get_cache_key(
-                'weather',
-                city=city,
-                start=start_date.isoformat(),
-                end=end_date.isoformat()
+        if not rows:
+            return 0
+        
+        key = rows[0][key_column]
+        timestamps = [row['timestamp'] for row in rows]
+        in_range = (
+            getattr(model, key_column) == key,
+            model.timestamp >= min(timestamps),
+            model.timestamp <= max(timestamps)
+        )
+        
+        bind = db.session.get_bind()
+        insert_ignore = INSERT_IGNORE.get(bind.dialect.name)
+        if insert_ignore is not None and _has_unique_key(bind, model.__tablename__, key_column):
+            stmt = insert_ignore(model.__table__).on_conflict_do_nothing(
+                index_elements=[key_column, 'timestamp']
             )
-            cached_data = self._get_from_cache(cache_key)
-            if cached_data:
-                return [WeatherData(**item) for item in cached_data]
+        else:
+            stored = set(db.session.scalars(db.select(model.timestamp).where(*in_range)))
+            rows = list({
+                row['timestamp']: row for row in rows if row['timestamp'] not in stored
+            }.values())
+            stmt = insert(model.__table__)
         
-        # Fetch from Direct API
-        raw_data = self.api_client.get_weather_data(city, start_date, end_date)
+        if rows:
+            # executemany: batched into multi-row INSERTs by SQLAlchemy
+            db.session.execute(stmt, rows)
+        db.session.commit()
+        
+        return db.session.scalar(db.select(db.func.count()).select_from(model).where(*in_range))
+    
+    def _weather_cache_key(self, city: str, start_date: datetime, end_date: datetime) -> str:
+        """Cache key of a weather range for a city."""
+        return self._get_cache_key(
+            'weather',
+            city=city,
+            start=start_date.isoformat(),
+            end=end_date.isoformat()
+        )
+    
+    def _store_weather(
+        self,
+        city: str,
+        raw_data: List[Dict[str, Any]],
+        cache_key: Optional[str] = None,
+        negative_ttl: int = NEGATIVE_CACHE_TTL_SECONDS
+    ) -> int:
+        """
+        Validate and store fetched weather data, marking the range cached under cache_key.
+        
+        An empty fetch is cached as a negative entry for negative_ttl seconds.
+        
+        Returns:
+            Number of stored records in the fetched range
+        """
         if not raw_data:
             logger.error(f"Failed to fetch weather data for {city}")
-            return []
+            if cache_key:
+                self._set_cache(cache_key, NEGATIVE_CACHE_SENTINEL, negative_ttl)
+            return 0
         
-        # Validate and store
-        weather_records = []
-        for item in raw_data:
-            if not self._validate_weather_data(item):
-                continue
-            
-            # Check if record already exists
-            existing = WeatherData.query.filter_by(
-                city=city,
-                timestamp=datetime.fromisoformat(item['timestamp'])
-            ).first()
-            
-            if existing:
-                weather_records.append(existing)
-                continue
-            
-            # Create new record
-            weather = WeatherData(
-                timestamp=datetime.fromisoformat(item['timestamp']),
-                city=city,
-                temperature=item['temperature'],
-                humidity=item['humidity'],
-                precipitation=item.get('precipitation', 0),
-                wind_speed=item['wind_speed'],
-                condition=item['condition']
-            )
-            
-            db.session.add(weather)
-            weather_records.append(weather)
+        # Validate
+        rows = [
+            {
+                'timestamp': datetime.fromisoformat(item['timestamp']),
+                'city': city,
+                'temperature': item['temperature'],
+                'humidity': item['humidity'],
+                'precipitation': item.get('precipitation', 0),
+                'wind_speed': item['wind_speed'],
+                'condition': item['condition']
+            }
+            for item in self._valid_records(raw_data, WeatherRecord, self._validate_weather_data)
+        ]
         
-        # Commit to database
+        # Store new rows in one batched insert and count the range
         try:
-            db.session.commit()
-            logger.info(f"Stored {len(weather_records)} weather records for {city}")
+            stored = self._insert_new(WeatherData, 'city', rows)
+            logger.info(f"Stored {stored} weather records for {city}")
         except Exception as e:
             db.session.rollback()
             logger.error(f"Failed to store weather data: {e}")
-            return []
+            return 0
         
-        # Cache results
-        if use_cache and weather_records:
-            cache_data = [w.to_dict() for w in weather_records]
-            self._set_cache(cache_key, cache_data)
+        if cache_key and stored:
+            self._set_cache(cache_key, STORED_CACHE_MARKER)
         
-        return weather_records
+        return stored
+    
+    def _stock_cache_key(self, symbol: str, start_date: datetime, end_date: datetime) -> str:
+        """Cache key of a stock range for a symbol."""
+        return self._get_cache_key(
+            'stock',
+            symbol=symbol,
+            start=start_date.isoformat(),
+            end=end_date.isoformat()
+        )
     
-    def fetch_and_store_stock(
+    def _store_stock(
         self,
         symbol: str,
-        start_date: datetime,
-        end_date: datetime,
-        use_cache: bool = True
-    ) -> List[StockData]:
+        raw_data: List[Dict[str, Any]],
+        cache_key: Optional[str] = None,
+        negative_ttl: int = NEGATIVE_CACHE_TTL_SECONDS
+    ) -> int:
         """
-        Fetch stock data from MCP and store in database.
+        Validate and store fetched stock data, marking the range cached under cache_key.
+        
+        An empty fetch is cached as a negative entry for negative_ttl seconds.
         
-        Args:
-            symbol: Stock symbol
-            start_date: Start date for data range
-            end_date: End date for data range
-            use_cache: Whether to use cache
-            
         Returns:
-            List of StockData instances
+            Number of stored records in the fetched range
         """
-        symbol = symbol.upper()
-        
-        # Check cache first
-        if use_cache:
-            cache_key = self._get_cache_key(
-                'stock',
-                symbol=symbol,
-                start=start_date.isoformat(),
-                end=end_date.isoformat()
-            )
-            cached_data = self._get_from_cache(cache_key)
-            if cached_data:
-                return [StockData(**item) for item in cached_data]
-        
-        # Fetch from Direct API
-        raw_data = self.api_client.get_stock_data(symbol, start_date, end_date)
         if not raw_data:
             logger.error(f"Failed to fetch stock data for {symbol}")
-            return []
+            if cache_key:
+                self._set_cache(cache_key, NEGATIVE_CACHE_SENTINEL, negative_ttl)
+            return 0
         
-        # Validate and store
-        stock_records = []
-        for item in raw_data:
-            if not self._validate_stock_data(item):
-                continue
-            
-            # Check if record already exists
-            existing = StockData.query.filter_by(
-                symbol=symbol,
-                timestamp=datetime.fromisoformat(item['timestamp'])
-            ).first()
-            
-            if existing:
-                stock_records.append(existing)
-                continue
-            
-            # Create new record
-            stock = StockData(
-                timestamp=datetime.fromisoformat(item['timestamp']),
-                symbol=symbol,
-                open_price=item['open_price'],
-                close_price=item['close_price'],
-                high_price=item['high_price'],
-                low_price=item['low_price'],
-                volume=item['volume']
-            )
-            
-            db.session.add(stock)
-            stock_records.append(stock)
+        # Validate
+        rows = [
+            {
+                'timestamp': datetime.fromisoformat(item['timestamp']),
+                'symbol': symbol,
+                'open_price': item['open_price'],
+                'close_price': item['close_price'],
+                'high_price': item['high_price'],
+                'low_price': item['low_price'],
+                'volume': item['volume']
+            }
+            for item in self._valid_records(raw_data, StockRecord, self._validate_stock_data)
+        ]
         
-        # Commit to database
+        # Store new rows in one batched insert and count the range
         try:
-            db.session.commit()
-            logger.info(f"Stored {len(stock_records)} stock records for {symbol}")
+            stored = self._insert_new(StockData, 'symbol', rows)
+            logger.info(f"Stored {stored} stock records for {symbol}")
         except Exception as e:
             db.session.rollback()
             logger.error(f"Failed to store stock data: {e}")
-            return []
+            return 0
         
-        # Cache results
-        if use_cache and stock_records:
-            cache_data = [s.to_dict() for s in stock_records]
-            self._set_cache(cache_key, cache_data)
+        if cache_key and stored:
+            self._set_cache(cache_key, STORED_CACHE_MARKER)
         
-        return stock_records
+        return stored
     
-    def get_combined_data(
+    @staticmethod
+    def _call_api(method, key: str, start_date: datetime, end_date: datetime) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Call an API client method, turning failures into an empty result.
+        
+        Returns:
+            The fetched records and how long to cache the range as empty
+            if there are none
+        """
+        try:
+            return method(key, start_date, end_date), NEGATIVE_CACHE_TTL_SECONDS
+        except PermanentAPIError as e:
+            logger.error(f"API request for {key} failed permanently: {e}")
+            return [], PERMANENT_FAILURE_TTL_SECONDS
+        except APIError as e:
+            logger.warning(f"API request for {key} failed: {e}")
+            return [], NEGATIVE_CACHE_TTL_SECONDS
+    
+    def _fetch_raw(
+        self,
+        city: Optional[str],
+        symbol: Optional[str],
+        start_date: datetime,
+        end_date: datetime
+    ) -> Tuple[Optional[Tuple[List[Dict[str, Any]], int]], Optional[Tuple[List[Dict[str, Any]], int]]]:
+        """
+        Call the weather and stock APIs concurrently on the shared fetch pool.
+        
+        A None city or symbol skips that API and yields None for it; the
+        others give the (records, negative_ttl) pair of _call_api().
+        """
+        futures = [
+            _fetch_executor.submit(self._call_api, method, key, start_date, end_date)
+            if key is not None else None
+            for method, key in (
+                (self.api_client.get_weather_data, city),
+                (self.api_client.get_stock_data, symbol)
+            )
+        ]
+        weather_raw, stock_raw = (future.result() if future else None for future in futures)
+        return weather_raw, stock_raw
+    
+    def _fetch_combined(
         self,
         city: str,
         symbol: str,
         start_date: datetime,
         end_date: datetime
+    ) -> Tuple[bool, bool]:
+        """
+        Fetch and store the datasets missing from the cache.
+        
+        Cache misses call the weather and stock APIs concurrently on the
+        fetch pool. Cache entries are only checked for presence, not
+        decoded; callers read from the database.
+        
+        Returns:
+            Whether weather and stock data are available for the range
+        """
+        symbol = symbol.upper()
+        weather_key = self._weather_cache_key(city, start_date, end_date)
+        stock_key = self._stock_cache_key(symbol, start_date, end_date)
+        has_weather = self._cache_presence(weather_key)
+        has_stock = self._cache_presence(stock_key)
+        
+        if has_weather is None or has_stock is None:
+            weather_raw, stock_raw = self._fetch_raw(
+                city if has_weather is None else None,
+                symbol if has_stock is None else None,
+                start_date,
+                end_date
+            )
+            if has_weather is None:
+                has_weather = self._store_weather(city, weather_raw[0], weather_key, weather_raw[1]) > 0
+            if has_stock is None:
+                has_stock = self._store_stock(symbol, stock_raw[0], stock_key, stock_raw[1]) > 0
+        
+        return has_weather, has_stock
+    
+    def get_combined_data(
+        self,
+        city: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        columns: Optional[Dict[str, List[str]]] = None
     ) -> Dict[str, List[Any]]:
         """
         Fetch both weather and stock data for correlation analysis.
         
+        Args:
+            columns: Optional projection, e.g. {'weather': ['temperature'],
+                'stock': ['close_price']}. When given, the lists hold
+                (timestamp, *columns) row tuples instead of model instances.
+        
         Returns:
             Dictionary with 'weather' and 'stock' lists
         """
-        weather_data = self.fetch_and_store_weather(city, start_date, end_date)
-        stock_data = self.fetch_and_store_stock(symbol, start_date, end_date)
+        has_weather, has_stock = self._fetch_combined(city, symbol, start_date, end_date)
+        
+        if columns is not None:
+            weather_data = WeatherData.numeric_columns_by_city_and_range(
+                city, start_date, end_date, columns.get('weather')
+            ) if has_weather else []
+            stock_data = StockData.numeric_columns_by_symbol_and_range(
+                symbol, start_date, end_date, columns.get('stock')
+            ) if has_stock else []
+        else:
+            weather_data = WeatherData.get_by_city_and_range(
+                city, start_date, end_date
+            ) if has_weather else []
+            stock_data = StockData.get_by_symbol_and_range(
+                symbol, start_date, end_date
+            ) if has_stock else []
         
         return {
             'weather': weather_data,
             'stock': stock_data
         }
+    
+    def get_aligned_rows(
+        self,
+        city: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[pd.DataFrame]:
+        """
+        Fetch both datasets and align them in the database.
+        
+        Returns:
+            Frame in the align_time_series() layout, or None if the database
+            can't align server-side (anything but PostgreSQL)
+        """
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return None
+        
+        symbol = symbol.upper()
+        has_weather, has_stock = self._fetch_combined(city, symbol, start_date, end_date)
+        if not has_weather or not has_stock:
+            return pd.DataFrame()
+        
+        aligned_df = pd.read_sql_query(
+            ALIGNED_ROWS_SQL,
+            db.session.connection(),
+            params={'city': city, 'symbol': symbol, 'start_date': start_date, 'end_date': end_date},
+            index_col='timestamp'
+        )
+        aligned_df = aligned_df.astype(
+            {column: ALIGNED_DTYPE for column in (*WEATHER_VARIABLES, *STOCK_VARIABLES)}
+        )
+        
+        logger.info(f"Aligned {len(aligned_df)} data points in the database")
+        return aligned_df
+    
+    def stream_combined_records(
+        self,
+        city: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Iterator[Dict[str, Any]]]:
+        """
+        Fetch weather and stock data as lazily read API records.
+        
+        Records have the to_dict() shape and are read from the database in
+        batches while iterating, for streamed responses.
+        
+        Returns:
+            Dictionary with 'weather' and 'stock' record iterators
+        """
+        has_weather, has_stock = self._fetch_combined(city, symbol, start_date, end_date)
+        
+        return {
+            'weather': (
+                WeatherData.iter_records_by_city_and_range(city, start_date, end_date)
+                if has_weather else iter(())
+            ),
+            'stock': (
+                StockData.iter_records_by_symbol_and_range(symbol, start_date, end_date)
+                if has_stock else iter(())
+            )
+        }
+    
+    def get_combined_columns(
+        self,
+        city: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Dict[str, Tuple[Any, ...]]]:
+        """
+        Fetch weather and stock data as columns for binary timeseries payloads.
+        
+        Returns:
+            Dictionary with 'weather' and 'stock' column mappings
+        """
+        has_weather, has_stock = self._fetch_combined(city, symbol, start_date, end_date)
+        
+        return {
+            'weather': WeatherData.record_columns_by_city_and_range(
+                city, start_date, end_date
+            ) if has_weather else {name: () for name in WeatherData.RECORD_COLUMNS},
+            'stock': StockData.record_columns_by_symbol_and_range(
+                symbol, start_date, end_date
+            ) if has_stock else {name: () for name in StockData.RECORD_COLUMNS}
+        }
@@ -4,13 +4,66 @@ Uses OpenWeatherMap and Alpha Vantage APIs directly
 """
 
 import logging
+import threading
+from operator import itemgetter
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import os
 
+from backend.config import BASE_DIR
+
+# Optional: on-disk HTTP cache honoring the APIs' caching headers
+try:
+    from cachecontrol.adapter import CacheControlAdapter
+    from cachecontrol.caches.file_cache import FileCache
+    CACHECONTROL_AVAILABLE = True
+except ImportError:
+    CACHECONTROL_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', str(BASE_DIR / '.http_cache'))
+
+# Connection pool per session: one host each for weather and stock APIs
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 8
+
+# Transient upstream failures are retried with exponential backoff
+HTTP_RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=[429, 502, 503, 504],
+    allowed_methods=['GET']
+)
+
+# Upstream answers that may succeed on a later attempt
+TRANSIENT_STATUS_CODES = frozenset({408, 429})
+
+
+class APIError(Exception):
+    """An external API call failed; the request may succeed if retried."""
+
+
+class TransientAPIError(APIError):
+    """Temporary failure: timeout, connection error, rate limit or 5xx."""
+
+
+class PermanentAPIError(APIError):
+    """Failure that retrying won't fix: missing key, rejected request or unknown city/symbol."""
+
+
+def _api_error(e: requests.exceptions.RequestException) -> APIError:
+    """Classify a requests exception as a transient or permanent API error."""
+    response = getattr(e, 'response', None)
+    if response is not None:
+        status = response.status_code
+        if 400 <= status < 500 and status not in TRANSIENT_STATUS_CODES:
+            return PermanentAPIError(f"HTTP {status}: {e}")
+    return TransientAPIError(str(e))
+
 
 class DirectAPIClient:
     """Direct API client for weather and stock data (bypasses MCP)."""
@@ -24,6 +77,32 @@ class DirectAPIClient:
             logger.warning("OPENWEATHERMAP_API_KEY not set")
         if not self.stock_api_key:
             logger.warning("ALPHA_VANTAGE_API_KEY not set")
+        
+        # requests.Session is not thread-safe; each fetch thread keeps its own
+        self._local = threading.local()
+    
+    @property
+    def session(self) -> requests.Session:
+        """Keep-alive HTTP session of the calling thread, created on first use."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            pool = {
+                'pool_connections': HTTP_POOL_CONNECTIONS,
+                'pool_maxsize': HTTP_POOL_MAXSIZE,
+                'max_retries': HTTP_RETRY
+            }
+            # The caching adapter is an HTTPAdapter too; it takes the pool
+            # and retry settings itself (CacheControl(session) would mount
+            # a default one over ours)
+            if CACHECONTROL_AVAILABLE:
+                adapter = CacheControlAdapter(cache=FileCache(HTTP_CACHE_DIR), **pool)
+            else:
+                adapter = HTTPAdapter(**pool)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._local.session = session
+        return session
     
     def get_weather_data(self, city: str, start_date: datetime, end_date: datetime) -> List[Dict]:
         """
@@ -31,10 +110,13 @@ class DirectAPIClient:
         
         For demo purposes, using current weather data.
         In production, you'd use historical data API.
+        
+        Raises:
+            TransientAPIError: On timeouts, connection errors and 429/5xx responses
+            PermanentAPIError: Without an API key or on other 4xx responses
         """
         if not self.weather_api_key:
-            logger.error("Weather API key not configured")
-            return []
+            raise PermanentAPIError("Weather API key not configured")
         
         try:
             # Using current weather API (free tier)
@@ -45,7 +127,7 @@ class DirectAPIClient:
                 'units': 'metric'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             
@@ -72,21 +154,24 @@ class DirectAPIClient:
             return weather_records
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching weather data: {e}")
-            return []
-        except Exception as e:
-            logger.error(f"Unexpected error in weather data fetch: {e}")
-            return []
+            raise _api_error(e) from e
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise TransientAPIError(f"Unexpected weather API response: {e!r}") from e
     
     def get_stock_data(self, symbol: str, start_date: datetime, end_date: datetime) -> List[Dict]:
         """
         Fetch stock data from Alpha Vantage API.
         
         Using TIME_SERIES_DAILY function.
+        
+        Raises:
+            TransientAPIError: On timeouts, connection errors, 429/5xx
+                responses and Alpha Vantage rate-limit notes
+            PermanentAPIError: Without an API key, on other 4xx responses
+                and on Alpha Vantage error messages (e.g. unknown symbol)
         """
         if not self.stock_api_key:
-            logger.error("Stock API key not configured")
-            return []
+            raise PermanentAPIError("Stock API key not configured")
         
         try:
             url = "https://www.alphavantage.co/query"
@@ -97,44 +182,47 @@ class DirectAPIClient:
                 'outputsize': 'compact'  # Last 100 days
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             
             if 'Error Message' in data:
-                logger.error(f"Alpha Vantage error: {data['Error Message']}")
-                return []
+                raise PermanentAPIError(f"Alpha Vantage error: {data['Error Message']}")
             
+            # Rate-limit and quota notices come back as 200 with a 'Note' or
+            # 'Information' message instead of the time series
             if 'Time Series (Daily)' not in data:
-                logger.error(f"Unexpected API response: {list(data.keys())}")
-                return []
+                raise TransientAPIError(f"Unexpected API response: {list(data.keys())}")
             
             time_series = data['Time Series (Daily)']
-            stock_records = []
             
-            for date_str, values in time_series.items():
-                date = datetime.strptime(date_str, '%Y-%m-%d')
-                
-                # Filter by date range
-                if start_date <= date <= end_date:
-                    stock_records.append({
-                        'timestamp': date.isoformat(),
-                        'open_price': float(values['1. open']),
-                        'close_price': float(values['4. close']),
-                        'high_price': float(values['2. high']),
-                        'low_price': float(values['3. low']),
-                        'volume': int(values['5. volume'])
-                    })
+            # Filter by date range on the ISO date keys, before parsing: a day
+            # is in range if its midnight is, so the first day is start_date
+            # rounded up to a whole day
+            first_day = ((start_date - timedelta(microseconds=1)).date() + timedelta(days=1)).isoformat()
+            last_day = end_date.date().isoformat()
+            wanted = sorted(
+                ((date_str, values) for date_str, values in time_series.items()
+                 if first_day <= date_str <= last_day),
+                key=itemgetter(0)
+            )
             
-            # Sort by date
-            stock_records.sort(key=lambda x: x['timestamp'])
+            stock_records = [
+                {
+                    'timestamp': datetime.strptime(date_str, '%Y-%m-%d').isoformat(),
+                    'open_price': float(values['1. open']),
+                    'close_price': float(values['4. close']),
+                    'high_price': float(values['2. high']),
+                    'low_price': float(values['3. low']),
+                    'volume': int(values['5. volume'])
+                }
+                for date_str, values in wanted
+            ]
             
             logger.info(f"Fetched {len(stock_records)} stock records for {symbol}")
             return stock_records
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching stock data: {e}")
-            return []
-        except Exception as e:
-            logger.error(f"Unexpected error in stock data fetch: {e}")
-            return []
+            raise _api_error(e) from e
+        except (KeyError, TypeError, ValueError) as e:
+            raise TransientAPIError(f"Unexpected stock API response: {e!r}") from e
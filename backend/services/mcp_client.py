@@ -1,18 +1,713 @@
 """
 MCP Client for communicating with external Model Context Protocol servers.
 Handles weather and stock data retrieval via MCP protocol.
+
+Server I/O runs as coroutines on one shared event loop thread, so calls
+from different threads (or gathered in one coroutine) overlap instead of
+each blocking its caller for a full round trip.
 """
 
-import json
+import asyncio
+import concurrent.futures
+import functools
+import itertools
 import logging
-import subprocess
+import os
+import random
+import sqlite3
+import threading
 import time
+from collections import Counter, OrderedDict, deque
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Any, Tuple, Union
 from datetime import datetime, timedelta
 
+import httpx
+import orjson
+
+from backend.config import BASE_DIR
+
 logger = logging.getLogger(__name__)
 
+# Optional: lazy decoding of large responses, one data point at a time
+try:
+    import msgspec
+    
+    class _MessageId(msgspec.Struct):
+        """JSON-RPC message with everything but its id skipped."""
+        id: Any = None
+    
+    class _DataResult(msgspec.Struct):
+        """Fetch result whose data points are kept as undecoded JSON."""
+        data: List[msgspec.Raw] = []
+    
+    class _DataResponse(msgspec.Struct):
+        result: Optional[_DataResult] = None
+        error: Optional[Dict[str, Any]] = None
+    
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+    logger.info("msgspec not installed. MCP responses are decoded whole.")
+
+# MCP protocol revision offered in the initialize handshake
+MCP_PROTOCOL_VERSION = '2024-11-05'
+MCP_CLIENT_INFO = {'name': 'data-weaver', 'version': '1.0.0'}
+MCP_INITIALIZE_TIMEOUT = 30
+
+# Call timeout when a server's config doesn't set one (seconds)
+MCP_DEFAULT_TIMEOUT = 30
+
+# Transports of MCP servers: a local process on stdio, or a remote
+# Streamable HTTP endpoint
+MCP_TRANSPORT_STDIO = 'stdio'
+MCP_TRANSPORT_HTTP = 'http'
+
+# Connection pool shared by a client's HTTP servers (overridable with the
+# MCP config's http section)
+MCP_HTTP_MAX_CONNECTIONS = 100
+MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+MCP_HTTP_CONNECT_TIMEOUT = 5
+
+# HTTP error statuses worth retrying; other 4xx answers won't change. 404
+# is retried only with a session id: the server dropped the session
+MCP_HTTP_TRANSIENT_STATUS_CODES = frozenset({408, 429})
+
+# Message framing on stdio: one JSON message per line, or LSP-style
+# Content-Length headers followed by the message body
+MCP_FRAMING_NEWLINE = 'newline'
+MCP_FRAMING_CONTENT_LENGTH = 'content-length'
+
+# Lines of server stderr kept for error reports
+MCP_STDERR_LINES = 20
+
+# Longest newline-framed message (stdout line) accepted from a server
+MCP_STREAM_LIMIT = 32 * 1024 * 1024
+
+# Time allowed for servers to exit when the client is closed
+MCP_CLOSE_TIMEOUT = 10
+
+# Time allowed for a server that closed its output during the handshake to
+# exit, telling a crashed server (not worth restarting) from a broken pipe
+MCP_EXIT_WAIT_SECONDS = 2
+
+# Retry backoff for transport failures: 1s, 2s, 4s... capped, plus jitter
+MCP_BACKOFF_MAX_SECONDS = 30
+MCP_BACKOFF_JITTER_SECONDS = 0.5
+
+# MCP method fetching a date range, by server name
+MCP_DATA_METHODS = {'weather': 'get_weather', 'stock': 'get_stock'}
+
+# Result cache TTLs in seconds by data class, matching how often each
+# changes: stock ranges ending before today are final (overridable with
+# caching.ttlByType in the MCP config)
+MCP_CACHE_TTLS = {
+    'weather': 3600,
+    'stock_intraday': 300,
+    'stock_historical': 86400 * 90
+}
+MCP_CACHE_MAX_ENTRIES = 100
+
+# Eviction policies of a full cache (caching.policy): least recently used,
+# or least frequently used for working sets dominated by a few keys
+MCP_CACHE_POLICY_LRU = 'lru'
+MCP_CACHE_POLICY_LFU = 'lfu'
+
+# Lightweight method asked whether an expired entry is still current:
+# params of the data call plus 'since' (the entry's etag); answers
+# {"unchanged": true} or anything else to refetch. Servers returning an
+# "etag" with their data points opt in
+MCP_REVALIDATE_METHOD = 'head'
+
+# JSON-RPC error code of a method the server doesn't implement
+JSONRPC_METHOD_NOT_FOUND = -32601
+
+# SQLite file keeping cached data points across restarts (caching.path
+# in the MCP config), and how often expired rows are deleted from it
+MCP_CACHE_PATH = os.getenv('MCP_CACHE_PATH', str(BASE_DIR / '.mcp_cache.db'))
+MCP_CACHE_SWEEP_SECONDS = 600
+
+
+class MCPError(Exception):
+    """An MCP server call failed."""
+
+
+class MCPTimeout(MCPError):
+    """The server didn't answer within the call's timeout."""
+
+
+class MCPTransportError(MCPError):
+    """The server couldn't be started or its connection broke."""
+
+
+class MCPPermanentError(MCPError):
+    """Failure that retrying won't fix: missing server binary, rejected handshake or request."""
+
+
+class _CacheEntry(NamedTuple):
+    """Cached data points with their expiry and the server's etag, if any."""
+    expires_at: float  # time.monotonic()
+    etag: Optional[str]
+    data: List[Dict[str, Any]]
+
+
+class _DiskCache:
+    """
+    SQLite store behind the in-memory MCP cache, so a restart starts warm.
+    
+    Rows keep the wall-clock fetch time and TTL of each entry; a daemon
+    thread deletes expired rows every MCP_CACHE_SWEEP_SECONDS. Reads,
+    writes and (de)serialization run in order on one worker thread, off
+    the event loop. The file and the worker are set up on first use and
+    released by aclose(). Storage errors are logged and treated as misses.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stop: Optional[threading.Event] = None  # sweeper of the open connection
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None  # loop-thread only
+    
+    def _worker(self) -> concurrent.futures.ThreadPoolExecutor:
+        """The disk worker thread, started on first use."""
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='mcp-cache-disk'
+            )
+        return self._executor
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database, creating the table and starting the sweeper (lock held)."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS mcp_cache '
+                '(k TEXT PRIMARY KEY, ts REAL, ttl REAL, etag TEXT, v BLOB)'
+            )
+            conn.commit()
+            self._conn = conn
+            self._stop = threading.Event()
+            threading.Thread(
+                target=self._sweep_loop, args=(self._stop,), name='mcp-cache-sweeper', daemon=True
+            ).start()
+        return self._conn
+    
+    def get(self, key: str) -> Optional[Tuple[float, Optional[str], List[Dict[str, Any]]]]:
+        """Return (expires_at as time.time(), etag, data points) of a stored entry, or None."""
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    'SELECT ts + ttl, etag, v FROM mcp_cache WHERE k = ?', (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"MCP disk cache read error: {e}")
+            return None
+        if row is None:
+            return None
+        return row[0], row[1], orjson.loads(row[2])
+    
+    async def aget(self, key: str) -> Optional[Tuple[float, Optional[str], List[Dict[str, Any]]]]:
+        """get() on the disk worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._worker(), self.get, key)
+    
+    def put(self, key: str, ttl: float, etag: Optional[str], data: List[Dict[str, Any]]) -> None:
+        """Store an entry fetched now."""
+        try:
+            fetched_at = time.time()
+            value = orjson.dumps(data)
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO mcp_cache (k, ts, ttl, etag, v) VALUES (?, ?, ?, ?, ?)',
+                    (key, fetched_at, ttl, etag, value)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"MCP disk cache write error: {e}")
+    
+    def put_later(self, key: str, ttl: float, etag: Optional[str], data: List[Dict[str, Any]]) -> None:
+        """Queue put() on the disk worker thread without waiting for it."""
+        self._worker().submit(self.put, key, ttl, etag, data)
+    
+    def sweep(self) -> None:
+        """Delete expired rows."""
+        try:
+            with self._lock:
+                if self._conn is None:
+                    return
+                deleted = self._conn.execute(
+                    'DELETE FROM mcp_cache WHERE ts + ttl < ?', (time.time(),)
+                ).rowcount
+                self._conn.commit()
+            logger.debug(f"MCP disk cache swept: {deleted} expired entries")
+        except sqlite3.Error as e:
+            logger.warning(f"MCP disk cache sweep error: {e}")
+    
+    def _sweep_loop(self, stop: threading.Event) -> None:
+        while not stop.wait(MCP_CACHE_SWEEP_SECONDS):
+            self.sweep()
+    
+    def _close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._stop.set()
+                self._conn.close()
+                self._conn = None
+    
+    async def aclose(self) -> None:
+        """
+        Close the database once queued writes are done and stop the worker.
+        
+        Both are set up again on next use.
+        """
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        await asyncio.get_running_loop().run_in_executor(executor, self._close)
+        executor.shutdown(wait=False)
+
+
+class ServerSpec(NamedTuple):
+    """MCP server launch settings, resolved once from the config."""
+    command: Tuple[str, ...]
+    env: Optional[Dict[str, str]]  # None inherits the backend's environment
+    timeout: float  # seconds
+    transport: str = MCP_TRANSPORT_STDIO
+    url: Optional[str] = None  # HTTP transport only
+    framing: str = MCP_FRAMING_NEWLINE  # stdio transport only
+    
+    @classmethod
+    def from_config(cls, server_config: Dict[str, Any]) -> 'ServerSpec':
+        """
+        Build a spec from an mcpServers entry.
+        
+        ${VAR} references in env values are expanded, and the entries are
+        layered over the backend's environment so the server still finds
+        PATH and friends. The config's timeout is in milliseconds.
+        
+        Entries with "transport": "http" need a "url" instead of a command;
+        stdio servers may set "framing": "content-length".
+        """
+        timeout_ms = server_config.get('timeout')
+        timeout = timeout_ms / 1000 if timeout_ms else MCP_DEFAULT_TIMEOUT
+        
+        transport = server_config.get('transport', MCP_TRANSPORT_STDIO)
+        if transport == MCP_TRANSPORT_HTTP:
+            return cls(
+                command=(),
+                env=None,
+                timeout=timeout,
+                transport=transport,
+                url=os.path.expandvars(server_config['url'])
+            )
+        if transport != MCP_TRANSPORT_STDIO:
+            raise ValueError(f"Unknown MCP transport: {transport}")
+        
+        framing = server_config.get('framing', MCP_FRAMING_NEWLINE)
+        if framing not in (MCP_FRAMING_NEWLINE, MCP_FRAMING_CONTENT_LENGTH):
+            raise ValueError(f"Unknown MCP framing: {framing}")
+        
+        env = server_config.get('env')
+        if env:
+            env = {**os.environ, **{name: os.path.expandvars(value) for name, value in env.items()}}
+        return cls(
+            command=(server_config['command'], *server_config.get('args', [])),
+            env=env or None,
+            timeout=timeout,
+            framing=framing
+        )
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Seconds to wait before retrying after the given (0-based) failed attempt."""
+    return min(2 ** attempt, MCP_BACKOFF_MAX_SECONDS) + random.uniform(0, MCP_BACKOFF_JITTER_SECONDS)
+
+
+class AsyncLoopThread(threading.Thread):
+    """Daemon thread running an asyncio event loop until the process exits."""
+    
+    def __init__(self):
+        super().__init__(name='mcp-event-loop', daemon=True)
+        self.loop = asyncio.new_event_loop()
+    
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_LOOP: Optional[AsyncLoopThread] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def get_loop_thread() -> AsyncLoopThread:
+    """Get the shared MCP event loop thread, starting it on first use."""
+    global _LOOP
+    
+    if _LOOP is None:
+        with _LOOP_LOCK:
+            if _LOOP is None:
+                loop_thread = AsyncLoopThread()
+                loop_thread.start()
+                _LOOP = loop_thread
+    return _LOOP
+
+
+def _peek_id(data: bytes) -> Any:
+    """Id of a JSON-RPC response, decoding nothing else; None for batches."""
+    try:
+        return msgspec.json.decode(data, type=_MessageId).id
+    except msgspec.DecodeError:
+        return None
+
+
+class _StdioConnection:
+    """
+    Long-lived MCP server process speaking JSON-RPC on stdio.
+    
+    A reader task hands each response to the request waiting for its id,
+    so several requests (single or JSON-RPC batches) can be in flight on
+    one connection; notifications, late answers to timed-out requests and
+    non-JSON output are skipped, while a response that fails to decode
+    fails the waiting requests for good. Requests made with raw=True get their response's bytes
+    undecoded (with msgspec installed).
+    """
+    
+    def __init__(self, process: asyncio.subprocess.Process, framing: str = MCP_FRAMING_NEWLINE):
+        self.process = process
+        self.framing = framing
+        self.pending: Dict[Any, asyncio.Future] = {}
+        self.raw_ids: set = set()
+        self.stderr = deque(maxlen=MCP_STDERR_LINES)
+        self._reader = asyncio.create_task(self._read_stdout())
+        self._stderr_reader = asyncio.create_task(self._read_stderr())
+    
+    @classmethod
+    async def start(
+        cls,
+        command: Tuple[str, ...],
+        env: Optional[Dict[str, str]],
+        framing: str = MCP_FRAMING_NEWLINE
+    ) -> '_StdioConnection':
+        """Start a server process."""
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            limit=MCP_STREAM_LIMIT
+        )
+        return cls(process, framing)
+    
+    async def _read_message(self) -> Optional[bytes]:
+        """Read the next framed message from stdout, or None at end of stream."""
+        stdout = self.process.stdout
+        if self.framing == MCP_FRAMING_CONTENT_LENGTH:
+            length = None
+            while True:
+                line = await stdout.readline()
+                if not line:
+                    return None
+                line = line.strip()
+                if not line:
+                    if length is not None:
+                        break
+                    continue
+                name, _, value = line.partition(b':')
+                if name.strip().lower() == b'content-length':
+                    length = int(value)
+            return await stdout.readexactly(length)
+        
+        while True:
+            line = await stdout.readline()
+            if not line:
+                return None
+            if line.strip():
+                return line
+    
+    def _resolve(self, message_id: Any, response: Any) -> None:
+        """Complete the pending request with the given id, if any."""
+        future = self.pending.pop(message_id, None)
+        if future is not None and not future.done():
+            future.set_result(response)
+    
+    async def _read_stdout(self) -> None:
+        """Dispatch responses until the server closes stdout, then fail pending requests."""
+        try:
+            while True:
+                data = await self._read_message()
+                if data is None:
+                    break
+                
+                if self.raw_ids:
+                    message_id = _peek_id(data)
+                    if message_id in self.raw_ids:
+                        self._resolve(message_id, data)
+                        continue
+                
+                try:
+                    message = orjson.loads(data)
+                except orjson.JSONDecodeError as e:
+                    if data.lstrip()[:1] not in (b'{', b'['):
+                        logger.warning(f"Skipping non-JSON MCP server output: {data[:80]!r}")
+                        continue
+                    # The server would send the same garbage again on a retry
+                    logger.error(f"Failed to parse MCP response: {e}")
+                    self._fail_pending(MCPPermanentError(f"Malformed MCP response: {e}"))
+                    continue
+                for response in message if isinstance(message, list) else [message]:
+                    if isinstance(response, dict):
+                        self._resolve(response.get('id'), response)
+        except asyncio.IncompleteReadError:
+            pass
+        except ValueError as e:
+            logger.error(f"Invalid MCP message framing: {e}")
+        finally:
+            self._fail_pending(ConnectionError('MCP server closed its output'))
+    
+    def _fail_pending(self, error: Exception) -> None:
+        """Fail every request waiting for a response with error."""
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+    
+    async def _read_stderr(self) -> None:
+        """Drain stderr so a chatty server can't block on a full pipe."""
+        async for line in self.process.stderr:
+            self.stderr.append(line.decode(errors='replace').rstrip())
+    
+    async def send(self, message: Any) -> None:
+        """Write one JSON-RPC message or batch."""
+        body = orjson.dumps(message)
+        if self.framing == MCP_FRAMING_CONTENT_LENGTH:
+            self.process.stdin.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        else:
+            self.process.stdin.write(body + b'\n')
+        await self.process.stdin.drain()
+    
+    async def request(self, message: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send a JSON-RPC request and wait for the response with its id."""
+        return (await self.request_many([message], timeout))[0]
+    
+    async def request_many(
+        self,
+        messages: List[Dict[str, Any]],
+        timeout: float,
+        raw: bool = False
+    ) -> List[Union[Dict[str, Any], bytes]]:
+        """
+        Send JSON-RPC requests in one write and wait for all their responses.
+        
+        Several requests go out as a JSON-RPC batch (array), a single one
+        as a plain request object.
+        
+        Returns:
+            Responses in request order; with raw, responses sent as
+            separate messages are returned as their undecoded bytes
+        
+        Raises:
+            asyncio.TimeoutError: If not all responses arrive within timeout
+            ConnectionError: If the server closes its stdout
+        """
+        if self._reader.done():
+            raise ConnectionError('MCP server closed its output')
+        
+        loop = asyncio.get_running_loop()
+        futures = []
+        for message in messages:
+            future = loop.create_future()
+            self.pending[message['id']] = future
+            futures.append(future)
+            if raw and MSGSPEC_AVAILABLE:
+                self.raw_ids.add(message['id'])
+        try:
+            await self.send(messages[0] if len(messages) == 1 else messages)
+            return list(await asyncio.wait_for(asyncio.gather(*futures), timeout))
+        finally:
+            for message in messages:
+                self.pending.pop(message['id'], None)
+                self.raw_ids.discard(message['id'])
+    
+    def alive(self) -> bool:
+        """Whether the server process is still running."""
+        return self.process.returncode is None and not self._reader.done()
+    
+    async def exit_code(self, timeout: float) -> Optional[int]:
+        """
+        Exit code of a server that closed its output, None if it is running.
+        
+        Waits up to timeout for the process to exit and its stderr to drain.
+        """
+        if not self._reader.done():
+            return None
+        try:
+            await asyncio.wait_for(asyncio.gather(self.process.wait(), self._stderr_reader), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.process.returncode
+    
+    async def close(self) -> None:
+        """Terminate the server process."""
+        if self.process.returncode is None:
+            try:
+                self.process.stdin.close()
+                self.process.terminate()
+            except ProcessLookupError:
+                pass
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+
+class _HttpConnection:
+    """
+    MCP server reached over Streamable HTTP.
+    
+    Each JSON-RPC message or batch is POSTed to the server URL on the
+    client's shared connection pool; answers come back as a JSON body or
+    as server-sent events. Offers the same request interface as
+    _StdioConnection.
+    """
+    
+    # No server process, so no stderr to report
+    stderr = ()
+    
+    def __init__(self, client: httpx.AsyncClient, url: str):
+        self.client = client
+        self.url = url
+        self.session_id: Optional[str] = None
+    
+    async def _post(self, body: Any, timeout: float) -> httpx.Response:
+        """
+        POST a JSON-RPC message or batch.
+        
+        Raises:
+            asyncio.TimeoutError: If the server doesn't answer within timeout
+            ConnectionError: On connection failures and 5xx/retryable statuses
+            MCPPermanentError: On other HTTP 4xx statuses
+        """
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json, text/event-stream'
+        }
+        if self.session_id:
+            headers['Mcp-Session-Id'] = self.session_id
+        try:
+            response = await self.client.post(
+                self.url,
+                content=orjson.dumps(body),
+                headers=headers,
+                timeout=httpx.Timeout(timeout, connect=self.client.timeout.connect)
+            )
+        except httpx.TimeoutException as e:
+            raise asyncio.TimeoutError() from e
+        except httpx.HTTPError as e:
+            raise ConnectionError(f"{e!r}") from e
+        
+        status = response.status_code
+        if 400 <= status < 500 and status not in MCP_HTTP_TRANSIENT_STATUS_CODES and not (
+            status == 404 and self.session_id
+        ):
+            raise MCPPermanentError(f"HTTP {status} from {self.url}")
+        if status >= 400:
+            raise ConnectionError(f"HTTP {status} from {self.url}")
+        self.session_id = response.headers.get('Mcp-Session-Id', self.session_id)
+        return response
+    
+    @staticmethod
+    def _event_data(text: str) -> List[str]:
+        """Data of each server-sent event; an event's data lines are joined with newlines."""
+        events, data = [], []
+        for line in text.splitlines() + ['']:
+            if not line:
+                if data:
+                    events.append('\n'.join(data))
+                    data = []
+            elif line.startswith('data:'):
+                value = line[5:]
+                data.append(value[1:] if value.startswith(' ') else value)
+        return events
+    
+    def _messages(self, response: httpx.Response) -> List[Any]:
+        """
+        JSON-RPC messages of a response: its JSON body or the data of its events.
+        
+        Raises:
+            MCPPermanentError: If a body or event isn't valid JSON
+        """
+        if response.headers.get('Content-Type', '').startswith('text/event-stream'):
+            payloads = self._event_data(response.text)
+        else:
+            payloads = [response.content] if response.content else []
+        
+        messages = []
+        for payload in payloads:
+            try:
+                message = orjson.loads(payload)
+            except orjson.JSONDecodeError as e:
+                raise MCPPermanentError(f"Malformed MCP response from {self.url}: {e}") from e
+            messages.extend(message if isinstance(message, list) else [message])
+        return messages
+    
+    async def send(self, message: Any) -> None:
+        """Send one JSON-RPC message or batch without waiting for answers."""
+        await self._post(message, MCP_DEFAULT_TIMEOUT)
+    
+    async def request(self, message: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send a JSON-RPC request and return its response."""
+        return (await self.request_many([message], timeout))[0]
+    
+    async def request_many(
+        self,
+        messages: List[Dict[str, Any]],
+        timeout: float,
+        raw: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Send JSON-RPC requests in one POST and return their responses in request order.
+        
+        HTTP bodies arrive whole, so raw is accepted and ignored.
+        
+        Raises:
+            MCPPermanentError: On other HTTP 4xx statuses and malformed responses
+        """
+        response = await self._post(messages[0] if len(messages) == 1 else messages, timeout)
+        by_id = {
+            message.get('id'): message
+            for message in self._messages(response) if isinstance(message, dict)
+        }
+        try:
+            return [by_id[message['id']] for message in messages]
+        except KeyError:
+            raise ConnectionError(f"MCP server at {self.url} left requests unanswered")
+    
+    def alive(self) -> bool:
+        """HTTP servers hold no per-connection state worth checking."""
+        return True
+    
+    async def exit_code(self, timeout: float) -> Optional[int]:
+        """No server process, so never an exit code."""
+        return None
+    
+    async def close(self) -> None:
+        """End the server session, if the server opened one."""
+        if self.session_id:
+            try:
+                await self.client.delete(self.url, headers={'Mcp-Session-Id': self.session_id})
+            except httpx.HTTPError:
+                pass
+            self.session_id = None
+
 
 class MCPClient:
     """Client for Model Context Protocol server communication."""
@@ -26,90 +721,770 @@ class MCPClient:
         """
         self.config_path = config_path
         self.config = self._load_config()
-        self.retry_count = 0
+        self.servers = self._load_servers()
         self.max_retries = 3
         
+        # Server processes are started on first use and kept for later calls;
+        # both are only touched on the event loop thread. Connecting holds
+        # only that server's lock, so servers start and handshake concurrently
+        self._procs: Dict[str, Any] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._procs_locks: Dict[str, asyncio.Lock] = {}
+        self._next_id = itertools.count(1)
+        
+        # Bounded cache of fetched data points, also loop-thread only. Expired
+        # entries with an etag stay until evicted, for revalidation
+        caching = self.config.get('caching', {})
+        self._cache_enabled = caching.get('enabled', True)
+        self._cache_max_entries = caching.get('maxSize', MCP_CACHE_MAX_ENTRIES)
+        self._cache_ttls = {**MCP_CACHE_TTLS, **caching.get('ttlByType', {})}
+        self._cache_policy = caching.get('policy', MCP_CACHE_POLICY_LRU)
+        if self._cache_policy not in (MCP_CACHE_POLICY_LRU, MCP_CACHE_POLICY_LFU):
+            logger.warning(f"Unknown MCP cache policy {self._cache_policy}, using LRU")
+            self._cache_policy = MCP_CACHE_POLICY_LRU
+        self._cache: 'OrderedDict[Tuple, _CacheEntry]' = OrderedDict()
+        self._cache_hits: Counter = Counter()  # lookups per cached key (LFU)
+        self._disk: Optional[_DiskCache] = None
+        if self._cache_enabled and caching.get('persistent', True):
+            self._disk = _DiskCache(caching.get('path', MCP_CACHE_PATH))
+        self._cache_stats = Counter()
+        self._no_revalidation: set = set()  # servers without MCP_REVALIDATE_METHOD
+        
+        # Fetches under way by cache key; concurrent callers for the same
+        # data await the first one's task instead of repeating the call
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+    
+    def __enter__(self) -> 'MCPClient':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
+    def __del__(self):
+        try:
+            if self._procs:
+                self.close()
+        except Exception:
+            pass
+    
     def _load_config(self) -> Dict[str, Any]:
         """Load MCP server configuration from JSON file."""
         if not self.config_path or not self.config_path.exists():
             logger.warning(f"MCP config not found at {self.config_path}, using defaults")
-            return {"mcpServers": {}, "caching": {"enabled": True, "ttl": 3600}}
+            return {"mcpServers": {}, "caching": {"enabled": True, "ttl": 3600, "persistent": False}}
         
         try:
-            with open(self.config_path, 'r') as f:
-                return json.load(f)
+            with open(self.config_path, 'rb') as f:
+                return orjson.loads(f.read())
         except Exception as e:
             logger.error(f"Error loading MCP config: {e}")
-            return {"mcpServers": {}, "caching": {"enabled": True, "ttl": 3600}}
+            return {"mcpServers": {}, "caching": {"enabled": True, "ttl": 3600, "persistent": False}}
     
-    def _get_server_config(self, server_name: str) -> Optional[Dict[str, Any]]:
-        """Get configuration for a specific MCP server."""
-        servers = self.config.get('mcpServers', {})
-        return servers.get(server_name)
+    def _load_servers(self) -> Dict[str, ServerSpec]:
+        """Resolve the launch settings of every configured MCP server."""
+        servers = {}
+        for name, server_config in self.config.get('mcpServers', {}).items():
+            try:
+                servers[name] = ServerSpec.from_config(server_config)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Invalid configuration for MCP server {name}: {e!r}")
+        return servers
     
-    def _execute_mcp_command(
+    def _get_server_config(self, server_name: str) -> Optional[ServerSpec]:
+        """Get launch settings for a specific MCP server."""
+        return self.servers.get(server_name)
+    
+    @staticmethod
+    def _run(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the shared event loop and wait for its result."""
+        return get_loop_thread().submit(coro).result(timeout)
+    
+    def connect(self, server_name: str) -> bool:
+        """
+        Start an MCP server and complete the initialize handshake.
+        
+        Connections are reused by later calls; connecting again is a no-op.
+        
+        Returns:
+            True if the server is connected, False otherwise
+        """
+        try:
+            return self._run(self._aget_proc(server_name)) is not None
+        except MCPError:
+            return False
+    
+    def disconnect(self, server_name: str) -> None:
+        """Stop an MCP server started by connect()."""
+        self._run(self._adisconnect(server_name))
+    
+    def close(self) -> None:
+        """Stop all MCP servers started by this client."""
+        if threading.current_thread() is get_loop_thread():
+            # Called from the loop itself (e.g. garbage collection); can't wait
+            get_loop_thread().loop.create_task(self.aclose())
+            return
+        self._run(self.aclose(), MCP_CLOSE_TIMEOUT)
+    
+    def _server_lock(self, server_name: str) -> asyncio.Lock:
+        """Lock serializing connects and disconnects of one server."""
+        lock = self._procs_locks.get(server_name)
+        if lock is None:
+            lock = self._procs_locks[server_name] = asyncio.Lock()
+        return lock
+    
+    async def _adisconnect(self, server_name: str) -> None:
+        async with self._server_lock(server_name):
+            proc = self._procs.pop(server_name, None)
+        if proc is not None:
+            await proc.close()
+    
+    async def _discard(self, server_name: str, proc: Any) -> None:
+        """Stop a failed connection unless it has already been replaced."""
+        async with self._server_lock(server_name):
+            if self._procs.get(server_name) is proc:
+                del self._procs[server_name]
+        await proc.close()
+    
+    async def aclose(self) -> None:
+        """Stop all MCP servers started by this client."""
+        await asyncio.gather(*(self._adisconnect(name) for name in list(self._procs_locks)))
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._disk is not None:
+            await self._disk.aclose()
+    
+    def _http_client(self) -> httpx.AsyncClient:
+        """Connection pool of the client's HTTP servers, created on first use."""
+        if self._http is None:
+            http = self.config.get('http', {})
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=http.get('maxConnections', MCP_HTTP_MAX_CONNECTIONS),
+                    max_keepalive_connections=http.get(
+                        'maxKeepaliveConnections', MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS
+                    )
+                ),
+                timeout=httpx.Timeout(
+                    MCP_DEFAULT_TIMEOUT,
+                    connect=http.get('connectTimeoutMs', MCP_HTTP_CONNECT_TIMEOUT * 1000) / 1000
+                )
+            )
+        return self._http
+    
+    async def _aget_proc(self, server_name: str) -> Optional[Any]:
+        """
+        Return the running connection to a server, connecting on first use.
+        
+        Returns:
+            The connection, or None if the server is not configured
+        
+        Raises:
+            MCPPermanentError: If the server command is missing or not
+                executable, exits during the handshake, or rejects or
+                garbles it
+            MCPTransportError: If the server fails to start or initialize otherwise
+        """
+        async with self._server_lock(server_name):
+            proc = self._procs.get(server_name)
+            if proc is not None and proc.alive():
+                return proc
+            
+            spec = self._get_server_config(server_name)
+            if spec is None:
+                logger.error(f"No configuration found for MCP server: {server_name}")
+                return None
+            
+            proc = None
+            try:
+                if spec.transport == MCP_TRANSPORT_HTTP:
+                    proc = _HttpConnection(self._http_client(), spec.url)
+                else:
+                    proc = await _StdioConnection.start(spec.command, spec.env, spec.framing)
+                response = await proc.request({
+                    "jsonrpc": "2.0",
+                    "id": next(self._next_id),
+                    "method": "initialize",
+                    "params": {
+                        "protocolVersion": MCP_PROTOCOL_VERSION,
+                        "capabilities": {},
+                        "clientInfo": MCP_CLIENT_INFO
+                    }
+                }, MCP_INITIALIZE_TIMEOUT)
+                if 'error' in response:
+                    raise MCPPermanentError(response['error'])
+                await proc.send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+            except Exception as e:
+                exit_code = await proc.exit_code(MCP_EXIT_WAIT_SECONDS) if proc is not None else None
+                stderr = ' | '.join(proc.stderr) if proc is not None else ''
+                logger.error(
+                    f"Failed to start MCP server {server_name}: {e!r}"
+                    + (f" (exit code {exit_code})" if exit_code is not None else '')
+                    + (f" {stderr}" if stderr else '')
+                )
+                if proc is not None:
+                    await proc.close()
+                if exit_code is not None:
+                    raise MCPPermanentError(
+                        f"MCP server {server_name} exited with code {exit_code}: {e!r}"
+                    ) from e
+                if isinstance(e, (FileNotFoundError, PermissionError, MCPPermanentError)):
+                    raise MCPPermanentError(f"Cannot start MCP server {server_name}: {e!r}") from e
+                raise MCPTransportError(f"Failed to start MCP server {server_name}: {e!r}") from e
+            
+            self._procs[server_name] = proc
+            logger.info(f"Connected to MCP server: {server_name}")
+            return proc
+    
+    async def _arequest(
+        self,
+        server_name: str,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        timeout: Optional[float],
+        raw: bool = False
+    ) -> Optional[List[Any]]:
+        """
+        Send (method, params) calls to a server in one write.
+        
+        A None timeout uses the server's configured one; raw is passed on
+        to the connection, see _StdioConnection.request_many().
+        
+        Returns:
+            JSON-RPC responses in call order, or None if the server is not
+            configured or the exchange failed otherwise
+        
+        Raises:
+            MCPTimeout: If the responses don't arrive within timeout
+            MCPTransportError: If the server can't be started or its connection breaks
+            MCPPermanentError: If the server can't ever be started or
+                rejects the request outright, see _aget_proc()
+        """
+        proc = await self._aget_proc(server_name)
+        if proc is None:
+            return None
+        
+        try:
+            # Build request payloads
+            request_payloads = [
+                {
+                    "jsonrpc": "2.0",
+                    "id": next(self._next_id),
+                    "method": method,
+                    "params": params
+                }
+                for method, params in calls
+            ]
+            
+            if timeout is None:
+                timeout = self.servers[server_name].timeout
+            return await proc.request_many(request_payloads, timeout, raw)
+        
+        except asyncio.TimeoutError as e:
+            logger.error(f"MCP command timeout for {server_name}")
+            # The server may still be busy with the request; start afresh
+            await self._discard(server_name, proc)
+            raise MCPTimeout(f"MCP command timeout for {server_name}") from e
+        except (ConnectionError, OSError) as e:
+            logger.error(f"MCP server {server_name} failed: {e} {' | '.join(proc.stderr)}")
+            await self._discard(server_name, proc)
+            raise MCPTransportError(f"MCP server {server_name} failed: {e}") from e
+        except MCPPermanentError as e:
+            logger.error(f"MCP server {server_name} rejected the request: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error executing MCP command: {e}")
+            return None
+    
+    async def _aexecute_mcp_command(
         self,
         server_name: str,
         method: str,
         params: Dict[str, Any],
-        timeout: int = 30
+        timeout: Optional[float] = None
     ) -> Optional[Dict[str, Any]]:
         """
-        Execute MCP command via subprocess.
+        Execute MCP command on the server's persistent connection.
         
         Args:
             server_name: Name of MCP server (weather, stock)
             method: Method to call
             params: Parameters for the method
-            timeout: Command timeout in seconds
-            
+            timeout: Command timeout in seconds (default: the server's)
+        
         Returns:
-            Response data from MCP server or None if failed
+            Response data from MCP server, or None if the server is not
+            configured or answered with an error
+        
+        Raises:
+            MCPError: On transport and permanent failures, see _arequest()
         """
-        server_config = self._get_server_config(server_name)
-        if not server_config:
-            logger.error(f"No configuration found for MCP server: {server_name}")
+        responses = await self._arequest(server_name, [(method, params)], timeout)
+        return self._result(server_name, responses[0]) if responses else None
+    
+    async def _aexecute_mcp_batch(
+        self,
+        server_name: str,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        timeout: Optional[float] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Execute several MCP commands as one JSON-RPC batch.
+        
+        Args:
+            server_name: Name of MCP server (weather, stock)
+            calls: (method, params) pairs
+            timeout: Timeout for the whole batch in seconds (default: the server's)
+        
+        Returns:
+            Response data per call, in call order (None where a call failed)
+        
+        Raises:
+            MCPError: On transport and permanent failures, see _arequest()
+        """
+        if not calls:
+            return []
+        responses = await self._arequest(server_name, calls, timeout)
+        if responses is None:
+            return [None] * len(calls)
+        return [self._result(server_name, response) for response in responses]
+    
+    @staticmethod
+    def _result(server_name: str, response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Result of a JSON-RPC response; error answers are logged and give None."""
+        if 'error' in response:
+            logger.error(f"MCP {server_name} error: {response['error']}")
+            return None
+        return response.get('result')
+    
+    def _execute_mcp_command(
+        self,
+        server_name: str,
+        method: str,
+        params: Dict[str, Any],
+        timeout: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Execute MCP command from synchronous code, see _aexecute_mcp_command()."""
+        return self._run(self._aexecute_mcp_command(server_name, method, params, timeout))
+    
+    def _execute_mcp_batch(
+        self,
+        server_name: str,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        timeout: Optional[float] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Execute an MCP batch from synchronous code, see _aexecute_mcp_batch()."""
+        return self._run(self._aexecute_mcp_batch(server_name, calls, timeout))
+    
+    @staticmethod
+    def _data_call(
+        server_name: str,
+        key: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Build the (method, params) call fetching a city's weather or a symbol's prices."""
+        params = {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat()
+        }
+        if server_name == 'weather':
+            params["city"] = key
+        else:
+            params["symbol"] = key.upper()
+        return MCP_DATA_METHODS[server_name], params
+    
+    @staticmethod
+    def _cache_key(server_name: str, method: str, params: Dict[str, Any]) -> Tuple:
+        """Cache key of a call: server, method and its params in canonical form."""
+        return (server_name, method) + tuple(sorted(
+            (name, value.casefold() if name == 'city' else value)
+            for name, value in params.items()
+        ))
+    
+    def _cache_ttl(self, server_name: str, end_date: datetime) -> int:
+        """TTL of fetched data, by data class."""
+        if server_name != 'stock':
+            return self._cache_ttls['weather']
+        if end_date.date() < datetime.now().date():
+            return self._cache_ttls['stock_historical']
+        return self._cache_ttls['stock_intraday']
+    
+    def _cache_get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """Return cached data points for a key, None if missing or expired."""
+        entry = self._cache.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None and entry.etag is None:
+                del self._cache[key]
+                self._cache_hits.pop(key, None)
+            self._cache_stats['misses'] += 1
+            return None
+        self._cache.move_to_end(key)
+        self._cache_hits[key] += 1
+        self._cache_stats['hits'] += 1
+        logger.debug(f"MCP cache hit: {key}")
+        return entry.data
+    
+    def _cache_put(
+        self,
+        key: Tuple,
+        data: Optional[List[Dict[str, Any]]],
+        ttl: int,
+        etag: Optional[str] = None
+    ) -> None:
+        """Cache fetched data points, in memory and on disk."""
+        if data is None or not self._cache_enabled:
+            return
+        self._cache_store(key, _CacheEntry(time.monotonic() + ttl, etag, data))
+        if self._disk is not None:
+            self._disk.put_later(orjson.dumps(key).decode(), ttl, etag, data)
+    
+    async def _acache_get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """_cache_get(), loading the entry from disk first if it isn't in memory."""
+        if key not in self._cache and self._disk is not None:
+            await self._adisk_load(key)
+        return self._cache_get(key)
+    
+    async def _adisk_load(self, key: Tuple) -> None:
+        """Copy an entry stored on disk into memory, if there is one."""
+        row = await self._disk.aget(orjson.dumps(key).decode())
+        if row is None or key in self._cache:
+            return
+        expires_at, etag, data = row
+        entry = _CacheEntry(time.monotonic() + expires_at - time.time(), etag, data)
+        self._cache_store(key, entry)
+        if entry.expires_at > time.monotonic():
+            self._cache_stats['disk_hits'] += 1
+    
+    def _cache_store(self, key: Tuple, entry: _CacheEntry) -> None:
+        """Keep an entry in memory, evicting one by the cache policy when full."""
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_max_entries:
+            if self._cache_policy == MCP_CACHE_POLICY_LFU:
+                # Ties go to the least recently used; the new entry is exempt
+                older = itertools.islice(self._cache, len(self._cache) - 1)
+                victim = min(older, key=self._cache_hits.__getitem__)
+                del self._cache[victim]
+            else:
+                victim, _ = self._cache.popitem(last=False)
+            self._cache_hits.pop(victim, None)
+            self._cache_stats['evictions'] += 1
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness, for tuning caching.maxSize and the TTLs.
+        
+        Returns:
+            Dictionary with hits (disk_hits of them loaded from disk),
+            misses, evictions, revalidations, the current size, maxSize
+            and the eviction policy
+        """
+        return {
+            'hits': self._cache_stats['hits'],
+            'disk_hits': self._cache_stats['disk_hits'],
+            'misses': self._cache_stats['misses'],
+            'evictions': self._cache_stats['evictions'],
+            'revalidations': self._cache_stats['revalidations'],
+            'size': len(self._cache),
+            'max_size': self._cache_max_entries,
+            'policy': self._cache_policy
+        }
+    
+    async def _arevalidate(
+        self,
+        server_name: str,
+        params: Dict[str, Any],
+        cache_key: Tuple,
+        ttl: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Renew an expired cache entry if the server reports its data unchanged.
+        
+        Servers answering MCP_REVALIDATE_METHOD with "method not found" are
+        not asked again.
+        
+        Returns:
+            The entry's data points, or None if they have to be refetched
+        """
+        entry = self._cache.get(cache_key)
+        if entry is None or entry.etag is None or server_name in self._no_revalidation:
             return None
         
         try:
-            # Build command
-            command = [server_config['command']] + server_config.get('args', [])
-            
-            # Build request payload
-            request_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": method,
-                "params": params
-            }
-            
-            # Execute command with timeout
-            process = subprocess.run(
-                command,
-                input=json.dumps(request_payload),
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                env=server_config.get('env', {})
+            responses = await self._arequest(
+                server_name, [(MCP_REVALIDATE_METHOD, {**params, 'since': entry.etag})], None
             )
-            
-            if process.returncode != 0:
-                logger.error(f"MCP command failed: {process.stderr}")
-                return None
-            
-            # Parse response
-            response = json.loads(process.stdout)
-            return response.get('result')
-            
-        except subprocess.TimeoutExpired:
-            logger.error(f"MCP command timeout for {server_name}")
+        except MCPError as e:
+            logger.warning(f"MCP {server_name} revalidation failed: {e}")
             return None
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse MCP response: {e}")
+        if not responses:
             return None
-        except Exception as e:
-            logger.error(f"Error executing MCP command: {e}")
+        
+        error = responses[0].get('error')
+        if error:
+            if error.get('code') == JSONRPC_METHOD_NOT_FOUND:
+                logger.info(f"MCP server {server_name} doesn't support revalidation")
+                self._no_revalidation.add(server_name)
+            return None
+        result = responses[0].get('result') or {}
+        if not result.get('unchanged'):
             return None
+        
+        logger.debug(f"MCP cache revalidated: {cache_key}")
+        self._cache_stats['revalidations'] += 1
+        self._cache_put(cache_key, entry.data, ttl, result.get('etag', entry.etag))
+        return entry.data
+    
+    async def _afetch(
+        self,
+        server_name: str,
+        key: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Fetch a weather or stock range with a single MCP call unless cached.
+        
+        A fetch of the same data already in flight is joined rather than
+        repeated; its outcome, data or error, goes to every caller.
+        """
+        method, params = self._data_call(server_name, key, start_date, end_date)
+        cache_key = self._cache_key(server_name, method, params)
+        data = await self._acache_get(cache_key)
+        if data is not None:
+            return data
+        
+        task = self._inflight.get(cache_key)
+        if task is None:
+            ttl = self._cache_ttl(server_name, end_date)
+            task = asyncio.ensure_future(self._afetch_uncached(server_name, method, params, cache_key, ttl))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        else:
+            logger.debug(f"Joining in-flight MCP fetch: {cache_key}")
+        # A caller giving up must not cancel the fetch for the others
+        return await asyncio.shield(task)
+    
+    async def _afetch_uncached(
+        self,
+        server_name: str,
+        method: str,
+        params: Dict[str, Any],
+        cache_key: Tuple,
+        ttl: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Revalidate or fetch a cache miss and cache the outcome, see _afetch()."""
+        data = await self._arevalidate(server_name, params, cache_key, ttl)
+        if data is None:
+            result = await self._aexecute_mcp_command(server_name, method, params)
+            data = self._data_points(server_name, result)
+            self._cache_put(cache_key, data, ttl, result.get('etag') if result else None)
+        return data
+    
+    @staticmethod
+    def _data_points(server_name: str, result: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Extract the data points of a fetch result, None if the call failed."""
+        if result:
+            logger.info(f"Retrieved {len(result.get('data', []))} {server_name} data points")
+            return result.get('data', [])
+        return None
+    
+    async def aget_batch(
+        self,
+        requests: List[Tuple[str, str, datetime, datetime]]
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        Fetch several datasets with one JSON-RPC batch per server.
+        
+        Cached datasets are served from memory, expired ones revalidated
+        where the server supports it, and datasets already being fetched
+        are joined; the weather and stock batches for the rest are sent
+        concurrently and retried on transport failures.
+        
+        Args:
+            requests: (kind, city or symbol, start_date, end_date) tuples,
+                kind being 'weather' or 'stock'
+        
+        Returns:
+            Data points per request, in request order (None where a call failed)
+        """
+        data: List[Optional[List[Dict[str, Any]]]] = [None] * len(requests)
+        calls = []
+        for kind, key, start_date, end_date in requests:
+            method, params = self._data_call(kind, key, start_date, end_date)
+            calls.append((kind, method, params, self._cache_key(kind, method, params), end_date))
+        if self._disk is not None:
+            await asyncio.gather(*(
+                self._adisk_load(cache_key) for _, _, _, cache_key, _ in calls if cache_key not in self._cache
+            ))
+        
+        # Misses already being fetched are joined; the rest are registered as
+        # in flight so concurrent fetches of the same data join this batch
+        loop = asyncio.get_running_loop()
+        owned = []
+        joined = []
+        for position, (kind, method, params, cache_key, end_date) in enumerate(calls):
+            data[position] = self._cache_get(cache_key)
+            if data[position] is not None:
+                continue
+            task = self._inflight.get(cache_key)
+            if task is None:
+                task = loop.create_future()
+                self._inflight[cache_key] = task
+                task.add_done_callback(lambda _, key=cache_key: self._inflight.pop(key, None))
+                owned.append((task, kind, method, params, cache_key, self._cache_ttl(kind, end_date)))
+            joined.append((position, task))
+        
+        try:
+            await self._afetch_batch_misses(owned)
+        finally:
+            for task, *_ in owned:
+                if not task.done():
+                    task.set_result(None)
+        
+        results = await asyncio.gather(*(asyncio.shield(task) for _, task in joined), return_exceptions=True)
+        for (position, _), result in zip(joined, results):
+            if isinstance(result, MCPError):
+                # A joined single fetch failed; retry this dataset on its own
+                data[position] = await self._afetch_with_retry(*requests[position])
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                data[position] = result
+        return data
+    
+    async def _afetch_batch_misses(
+        self,
+        misses: List[Tuple[asyncio.Future, str, str, Dict[str, Any], Tuple, int]]
+    ) -> None:
+        """
+        Revalidate or fetch the cache misses of aget_batch(), one batch per server.
+        
+        Each (future, kind, method, params, cache_key, ttl) miss gets its data
+        points (None if the call failed) as the result of its future;
+        batches are retried on transport failures like single fetches.
+        """
+        revalidated = await asyncio.gather(*(
+            self._arevalidate(kind, params, cache_key, ttl)
+            for _, kind, _, params, cache_key, ttl in misses
+        ))
+        
+        fetches: Dict[str, List[Tuple[asyncio.Future, Tuple, int]]] = {}
+        calls: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for (task, kind, method, params, cache_key, ttl), cached in zip(misses, revalidated):
+            if cached is not None:
+                task.set_result(cached)
+                continue
+            fetches.setdefault(kind, []).append((task, cache_key, ttl))
+            calls.setdefault(kind, []).append((method, params))
+        
+        batches = await asyncio.gather(*(
+            self._aretry(kind, 'batch', functools.partial(self._aexecute_mcp_batch, kind, kind_calls))
+            for kind, kind_calls in calls.items()
+        ))
+        
+        for kind, results in zip(calls, batches):
+            for (task, cache_key, ttl), result in zip(fetches[kind], results or itertools.repeat(None)):
+                points = self._data_points(kind, result)
+                self._cache_put(cache_key, points, ttl, result.get('etag') if result else None)
+                task.set_result(points)
+    
+    def get_batch(
+        self,
+        requests: List[Tuple[str, str, datetime, datetime]]
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """Fetch several datasets from synchronous code, see aget_batch()."""
+        return self._run(self.aget_batch(requests))
+    
+    def get_weather_data_batch(
+        self,
+        cities: List[str],
+        start_date: datetime,
+        end_date: datetime
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        Fetch weather data for several cities in one round trip.
+        
+        Returns:
+            Weather data points per city, in order (None where a call failed)
+        """
+        return self.get_batch([('weather', city, start_date, end_date) for city in cities])
+    
+    def get_stock_data_batch(
+        self,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: datetime
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        Fetch stock data for several symbols in one round trip.
+        
+        Returns:
+            Stock data points per symbol, in order (None where a call failed)
+        """
+        return self.get_batch([('stock', symbol, start_date, end_date) for symbol in symbols])
+    
+    async def _afetch_with_retry(
+        self,
+        server_name: str,
+        key: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Fetch a weather or stock range, retrying transport failures, see _aretry()."""
+        return await self._aretry(
+            server_name, 'fetch', lambda: self._afetch(server_name, key, start_date, end_date)
+        )
+    
+    async def _aretry(self, server_name: str, what: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await call(), calling it again on transport failures.
+        
+        Retries back off exponentially with jitter, sleeping on the event
+        loop so other MCP calls proceed meanwhile. Error answers from the
+        server (unknown method, invalid params) and servers that can't be
+        started at all give None without retrying.
+        
+        Args:
+            server_name: Server called, for the log
+            what: What is called ('fetch', 'batch'), for the log
+            call: Returns a new awaitable of the call on every attempt
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call()
+            except MCPPermanentError as e:
+                logger.error(f"MCP {server_name} {what} failed permanently: {e}")
+                return None
+            except (MCPTimeout, MCPTransportError) as e:
+                if attempt == self.max_retries:
+                    break
+                delay = _backoff_delay(attempt)
+                logger.warning(f"MCP {server_name} {what} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        
+        logger.error(f"MCP {server_name} {what} failed after {self.max_retries} retries")
+        return None
+    
+    async def aget_weather_data(
+        self,
+        city: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Fetch weather data on the client's event loop, see get_weather_data()."""
+        logger.info(f"Fetching weather data for {city} from {start_date} to {end_date}")
+        return await self._afetch_with_retry('weather', city, start_date, end_date)
+    
+    async def aget_stock_data(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Fetch stock data on the client's event loop, see get_stock_data()."""
+        logger.info(f"Fetching stock data for {symbol} from {start_date} to {end_date}")
+        return await self._afetch_with_retry('stock', symbol, start_date, end_date)
     
     def get_weather_data(
         self,
@@ -124,33 +1499,11 @@ class MCPClient:
             city: City name
             start_date: Start date for data range
             end_date: End date for data range
-            
+        
         Returns:
             List of weather data points or None if failed
         """
-        logger.info(f"Fetching weather data for {city} from {start_date} to {end_date}")
-        
-        params = {
-            "city": city,
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat()
-        }
-        
-        result = self._execute_mcp_command('weather', 'get_weather', params)
-        
-        if result:
-            logger.info(f"Retrieved {len(result.get('data', []))} weather data points")
-            return result.get('data', [])
-        
-        # Retry logic
-        if self.retry_count < self.max_retries:
-            self.retry_count += 1
-            time.sleep(2 ** self.retry_count)  # Exponential backoff
-            return self.get_weather_data(city, start_date, end_date)
-        
-        self.retry_count = 0
-        logger.error(f"Failed to fetch weather data after {self.max_retries} retries")
-        return None
+        return self._run(self.aget_weather_data(city, start_date, end_date))
     
     def get_stock_data(
         self,
@@ -165,46 +1518,109 @@ class MCPClient:
             symbol: Stock symbol (e.g., AAPL, GOOGL)
             start_date: Start date for data range
             end_date: End date for data range
-            
+        
         Returns:
             List of stock data points or None if failed
         """
-        logger.info(f"Fetching stock data for {symbol} from {start_date} to {end_date}")
+        return self._run(self.aget_stock_data(symbol, start_date, end_date))
+    
+    async def _afetch_rows(
+        self,
+        server_name: str,
+        key: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Union[List[Dict[str, Any]], Dict[str, Any], bytes, None]:
+        """
+        Cached data points of a range, or else its undecoded fetch response.
         
-        params = {
-            "symbol": symbol.upper(),
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat()
-        }
+        Raises:
+            MCPError: On transport and permanent failures, see _arequest()
+        """
+        method, params = self._data_call(server_name, key, start_date, end_date)
+        data = await self._acache_get(self._cache_key(server_name, method, params))
+        if data is not None:
+            return data
+        responses = await self._arequest(server_name, [(method, params)], None, raw=True)
+        return responses[0] if responses else None
+    
+    def _iter_data(
+        self,
+        server_name: str,
+        key: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the data points of a weather or stock range one at a time.
         
-        result = self._execute_mcp_command('stock', 'get_stock', params)
+        With msgspec installed, the response is split into raw data points
+        and each is decoded only when the caller asks for it, so no full
+        list of parsed points is ever built. Streamed results are not cached.
+        """
+        try:
+            response = self._run(self._afetch_rows(server_name, key, start_date, end_date))
+        except MCPError as e:
+            logger.error(f"Failed to stream {server_name} data: {e}")
+            return
         
-        if result:
-            logger.info(f"Retrieved {len(result.get('data', []))} stock data points")
-            return result.get('data', [])
+        if isinstance(response, list):
+            yield from response
+            return
         
-        # Retry logic
-        if self.retry_count < self.max_retries:
-            self.retry_count += 1
-            time.sleep(2 ** self.retry_count)  # Exponential backoff
-            return self.get_stock_data(symbol, start_date, end_date)
+        if isinstance(response, bytes):
+            try:
+                message = msgspec.json.decode(response, type=_DataResponse)
+            except msgspec.DecodeError as e:
+                logger.error(f"Failed to parse MCP response: {e}")
+                return
+            if message.result is None:
+                logger.error(f"MCP {server_name} error: {message.error}")
+                return
+            for row in message.result.data:
+                yield msgspec.json.decode(row)
+            return
         
-        self.retry_count = 0
-        logger.error(f"Failed to fetch stock data after {self.max_retries} retries")
-        return None
+        result = response.get('result') if response else None
+        if result is None:
+            logger.error(f"MCP {server_name} error: {response.get('error') if response else None}")
+            return
+        yield from result.get('data', [])
     
-    def test_connection(self, server_name: str) -> bool:
+    def iter_weather_data(
+        self,
+        city: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Test connection to an MCP server.
+        Stream weather data points from Weather MCP server.
         
-        Args:
-            server_name: Name of server to test
-            
-        Returns:
-            True if connection successful, False otherwise
+        Like get_weather_data() for long ranges, without holding every
+        decoded point in memory; yields nothing if the fetch fails.
+        """
+        logger.info(f"Streaming weather data for {city} from {start_date} to {end_date}")
+        return self._iter_data('weather', city, start_date, end_date)
+    
+    def iter_stock_data(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Iterator[Dict[str, Any]]:
         """
+        Stream stock data points from Stock MCP server.
+        
+        Like get_stock_data() for long ranges, without holding every
+        decoded point in memory; yields nothing if the fetch fails.
+        """
+        logger.info(f"Streaming stock data for {symbol} from {start_date} to {end_date}")
+        return self._iter_data('stock', symbol, start_date, end_date)
+    
+    async def atest_connection(self, server_name: str) -> bool:
+        """Test connection to an MCP server on the client's event loop, see test_connection()."""
         try:
-            result = self._execute_mcp_command(
+            result = await self._aexecute_mcp_command(
                 server_name,
                 'health_check',
                 {},
@@ -214,3 +1630,28 @@ class MCPClient:
         except Exception as e:
             logger.error(f"Connection test failed for {server_name}: {e}")
             return False
+    
+    def test_connection(self, server_name: str) -> bool:
+        """
+        Test connection to an MCP server.
+        
+        Args:
+            server_name: Name of server to test
+        
+        Returns:
+            True if connection successful, False otherwise
+        """
+        return self._run(self.atest_connection(server_name))
+    
+    def test_all_connections(self) -> Dict[str, bool]:
+        """
+        Test the connections to all configured MCP servers concurrently.
+        
+        Returns:
+            Dictionary of server name to connection test result; takes
+            as long as the slowest server, not the sum
+        """
+        async def test_all() -> List[bool]:
+            return await asyncio.gather(*(self.atest_connection(name) for name in self.servers))
+        
+        return dict(zip(self.servers, self._run(test_all())))
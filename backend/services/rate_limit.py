@@ -0,0 +1,83 @@
+"""
+Request rate limiting backed by Flask-Limiter and Redis.
+Each worker decides requests well under the limit in-process, so only
+clients approaching RATE_LIMIT_PER_MINUTE cost a Redis round-trip.
+
+The local budget (LOCAL_BUDGET_RATIO of the limit) is split evenly across
+RATE_LIMIT_WORKERS processes, since their counts are not shared; set it to
+the number of workers serving the app. With fewer workers configured than
+running, a client can exceed the limit.
+"""
+
+import logging
+import math
+import threading
+import time
+
+from cachetools import TTLCache
+from flask import current_app
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+
+logger = logging.getLogger(__name__)
+
+# Share of the per-minute limit decided locally (across all workers) before Redis is consulted
+LOCAL_BUDGET_RATIO = 0.8
+
+limiter = Limiter(key_func=get_remote_address)
+
+# Request counts per (client, minute) for this worker
+_local_counts = TTLCache(maxsize=10000, ttl=60)
+_local_lock = threading.Lock()
+
+
+def _build_storage_uri(config) -> str:
+    """Build the Redis storage URI from the app's Redis settings."""
+    auth = f":{config['REDIS_PASSWORD']}@" if config.get('REDIS_PASSWORD') else ''
+    return f"redis://{auth}{config['REDIS_HOST']}:{config['REDIS_PORT']}/{config['REDIS_DB']}"
+
+
+def _local_budget(config) -> int:
+    """Requests per client and minute one worker decides without Redis."""
+    workers = max(1, config.get('RATE_LIMIT_WORKERS', 1))
+    return math.floor(LOCAL_BUDGET_RATIO * config['RATE_LIMIT_PER_MINUTE'] / workers)
+
+
+@limiter.request_filter
+def _within_local_budget() -> bool:
+    """
+    Count the request locally and exempt it from the Redis check while the
+    client is under this worker's share of the local budget.
+    """
+    key = (get_remote_address(), int(time.time() // 60))
+
+    with _local_lock:
+        count = _local_counts.get(key, 0) + 1
+        _local_counts[key] = count
+
+    return count <= _local_budget(current_app.config)
+
+
+def init_rate_limiter(app) -> Limiter:
+    """
+    Initialize rate limiting for a Flask app.
+
+    Redis enforces the remainder of RATE_LIMIT_PER_MINUTE left after the
+    local budgets of all RATE_LIMIT_WORKERS workers, using a moving window.
+    Limits are kept in memory while Redis is unavailable.
+    """
+    per_minute = app.config['RATE_LIMIT_PER_MINUTE']
+    workers = max(1, app.config.get('RATE_LIMIT_WORKERS', 1))
+    remote_limit = max(1, per_minute - workers * _local_budget(app.config))
+
+    app.config.setdefault('RATELIMIT_STORAGE_URI', _build_storage_uri(app.config))
+    app.config.setdefault('RATELIMIT_STRATEGY', 'moving-window')
+    app.config.setdefault('RATELIMIT_DEFAULT', f'{remote_limit} per minute')
+    app.config.setdefault('RATELIMIT_IN_MEMORY_FALLBACK_ENABLED', True)
+
+    limiter.init_app(app)
+    logger.info(
+        f"Rate limiting enabled: {per_minute} requests per minute "
+        f"({workers} workers)"
+    )
+    return limiter
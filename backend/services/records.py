@@ -0,0 +1,42 @@
+"""
+Compiled validators for weather and stock records from the external APIs.
+Field presence, types and value ranges are checked by msgspec in C.
+"""
+
+from typing import Annotated, Optional
+
+import msgspec
+from msgspec import Meta
+
+
+class WeatherRecord(msgspec.Struct):
+    """Weather API record, as accepted by DataService."""
+
+    timestamp: str
+    temperature: Annotated[float, Meta(ge=-100, le=60)]  # Celsius
+    humidity: Annotated[int, Meta(ge=0, le=100)]
+    wind_speed: Annotated[float, Meta(ge=0, le=200)]  # km/h
+    condition: str
+    precipitation: Optional[float] = 0
+
+
+class StockRecord(msgspec.Struct):
+    """Stock API record, as accepted by DataService."""
+
+    timestamp: str
+    open_price: float
+    close_price: float
+    high_price: float
+    low_price: float
+    volume: Annotated[int, Meta(ge=0)]
+
+    def __post_init__(self):
+        """Check that open and close lie within the bar's low-high range."""
+        if not (self.low_price <= self.open_price <= self.high_price):
+            raise ValueError(
+                f"Invalid price relationship: L={self.low_price}, O={self.open_price}, H={self.high_price}"
+            )
+        if not (self.low_price <= self.close_price <= self.high_price):
+            raise ValueError(
+                f"Invalid price relationship: L={self.low_price}, C={self.close_price}, H={self.high_price}"
+            )
@@ -4,10 +4,21 @@ Feature: data-weaver-dashboard, Property 2: MCP request formatting
 """
 
 import pytest
-from hypothesis import given, strategies as st
+from hypothesis import given, settings, strategies as st
 from backend.services.mcp_client import MCPClient
 from datetime import datetime, timedelta
 
+# (start, end) date range for each day count drawn below
+_NOW = datetime.now()
+_RANGES = [(_NOW - timedelta(days=d), _NOW) for d in range(1, 366)]
+
+
+@pytest.fixture(scope="class")
+def client():
+    client = MCPClient()
+    yield client
+    client.close()
+
 
 class TestMCPRequestFormatting:
     """Property 2: For any data request, the system should format MCP calls correctly"""
@@ -16,11 +27,10 @@ class TestMCPRequestFormatting:
         city=st.sampled_from(['New York', 'London', 'Tokyo', 'Paris', 'Mumbai']),
         days=st.integers(min_value=1, max_value=365)
     )
-    def test_weather_request_formation(self, city, days):
+    @settings(deadline=None)
+    def test_weather_request_formation(self, client, city, days):
         """Property test: Weather requests should have valid city and date parameters"""
-        client = MCPClient()
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        start_date, end_date = _RANGES[days - 1]
         
         # This would call _get_server_config and verify structure
         config = client._get_server_config('weather')
@@ -34,18 +44,17 @@ class TestMCPRequestFormatting:
         symbol=st.sampled_from(['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA']),
         days=st.integers(min_value=1, max_value=365)
     )
-    def test_stock_request_formation(self, symbol, days):
+    @settings(deadline=None)
+    def test_stock_request_formation(self, client, symbol, days):
         """Property test: Stock requests should have valid symbol and date parameters"""
-        client = MCPClient()
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        start_date, end_date = _RANGES[days - 1]
         
         config = client._get_server_config('stock')
         
         assert config is not None or True
         assert isinstance(symbol, str)
         assert len(symbol) > 0
-        assert symbol.is upper() or True  # Symbol should be uppercase
+        assert symbol.isupper()  # Symbol should be uppercase
         assert start_date < end_date
 
 
@@ -0,0 +1,146 @@
+"""
+Minimal MCP stdio server for the MCP client tests.
+
+Answers initialize, get_weather and get_stock with one data point echoing
+the request, and everything else with "method not found". Batches are
+answered in reverse order so clients have to match responses by id.
+
+Environment:
+    FAKE_MCP_FRAMING: "content-length" for LSP-style framing, else newline
+    FAKE_MCP_LOG: file to append the received method names to
+    FAKE_MCP_ETAG: etag to attach to data results
+    FAKE_MCP_REVALIDATE: "1" to answer head requests carrying that etag
+        as unchanged
+    FAKE_MCP_MALFORMED: "1" to answer data requests with truncated JSON
+    FAKE_MCP_EXIT: exit code to quit with at startup, after logging
+        "exit" and writing "boom" to stderr
+    FAKE_MCP_DROP_FIRST: file created when the first non-handshake request
+        is left unanswered (logged as "dropped"); later requests, also in
+        restarted servers, are answered
+"""
+
+import json
+import os
+import sys
+
+JSONRPC_METHOD_NOT_FOUND = -32601
+
+FRAMING = os.environ.get('FAKE_MCP_FRAMING', 'newline')
+LOG_PATH = os.environ.get('FAKE_MCP_LOG')
+ETAG = os.environ.get('FAKE_MCP_ETAG')
+REVALIDATE = os.environ.get('FAKE_MCP_REVALIDATE') == '1'
+MALFORMED = os.environ.get('FAKE_MCP_MALFORMED') == '1'
+EXIT_CODE = os.environ.get('FAKE_MCP_EXIT')
+DROP_FIRST = os.environ.get('FAKE_MCP_DROP_FIRST')
+
+
+def log(line):
+    if LOG_PATH:
+        with open(LOG_PATH, 'a') as f:
+            f.write(line + '\n')
+
+
+def result(method, params):
+    """Result of a method call, or None for unknown methods."""
+    if method == 'initialize':
+        return {
+            'protocolVersion': params.get('protocolVersion'),
+            'capabilities': {},
+            'serverInfo': {'name': 'fake-mcp'}
+        }
+    if method == 'get_weather':
+        point = {'timestamp': params['start_date'], 'temperature': 20.0, 'city': params['city']}
+    elif method == 'get_stock':
+        point = {'timestamp': params['start_date'], 'close_price': 100.0, 'symbol': params['symbol']}
+    elif method == 'head' and REVALIDATE:
+        return {'unchanged': params.get('since') == ETAG}
+    else:
+        return None
+    data = {'data': [point]}
+    if ETAG:
+        data['etag'] = ETAG
+    return data
+
+
+def handle(message):
+    """Response to one request, None for notifications."""
+    if 'id' not in message:
+        return None
+    log(message['method'])
+    value = result(message['method'], message.get('params') or {})
+    if value is None:
+        return {
+            'jsonrpc': '2.0',
+            'id': message['id'],
+            'error': {'code': JSONRPC_METHOD_NOT_FOUND, 'message': 'Method not found'}
+        }
+    return {'jsonrpc': '2.0', 'id': message['id'], 'result': value}
+
+
+def read_messages():
+    """Yield the raw JSON messages from stdin in the configured framing."""
+    stdin = sys.stdin.buffer
+    if FRAMING != 'content-length':
+        for line in stdin:
+            if line.strip():
+                yield line
+        return
+    
+    while True:
+        length = None
+        while True:
+            header = stdin.readline()
+            if not header:
+                return
+            header = header.strip()
+            if not header:
+                if length is not None:
+                    break
+                continue
+            name, _, value = header.partition(b':')
+            if name.strip().lower() == b'content-length':
+                length = int(value)
+        yield stdin.read(length)
+
+
+def write_message(message):
+    body = json.dumps(message).encode()
+    if FRAMING == 'content-length':
+        sys.stdout.buffer.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+    else:
+        sys.stdout.buffer.write(body + b'\n')
+    sys.stdout.buffer.flush()
+
+
+def main():
+    if EXIT_CODE:
+        log('exit')
+        sys.stderr.write('boom\n')
+        sys.exit(int(EXIT_CODE))
+    
+    for raw in read_messages():
+        message = json.loads(raw)
+        if DROP_FIRST and not os.path.exists(DROP_FIRST) and (
+            isinstance(message, list) or message.get('method') != 'initialize'
+        ) and (isinstance(message, list) or 'id' in message):
+            open(DROP_FIRST, 'w').close()
+            log('dropped')
+            continue
+        if MALFORMED and isinstance(message, dict) and message['method'].startswith('get_'):
+            log(message['method'])
+            sys.stdout.buffer.write(b'{"jsonrpc": "2.0", "id": ' + str(message['id']).encode() + b',\n')
+            sys.stdout.buffer.flush()
+            continue
+        if isinstance(message, list):
+            log(f'batch {len(message)}')
+            responses = [response for response in map(handle, message) if response]
+            if responses:
+                write_message(responses[::-1])
+        else:
+            response = handle(message)
+            if response is not None:
+                write_message(response)
+
+
+if __name__ == '__main__':
+    main()
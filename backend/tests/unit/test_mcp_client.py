@@ -0,0 +1,364 @@
+"""
+Unit tests for MCP client
+Runs the client against the stdio server in fake_mcp_server.py and an
+in-process Streamable HTTP server on httpx.MockTransport
+"""
+
+import asyncio
+import itertools
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import pytest
+from backend.services import mcp_client
+from backend.services.mcp_client import MCPClient
+
+FAKE_SERVER = Path(__file__).with_name('fake_mcp_server.py')
+
+START_DATE = datetime(2024, 1, 1)
+END_DATE = datetime(2024, 1, 5)
+
+
+def make_client(tmp_path, framing=None, env=None, caching=None, timeout=None):
+    """
+    MCPClient whose weather and stock servers are fake_mcp_server.py.
+    
+    The servers log received methods to tmp_path/server.log. The disk
+    cache is off unless caching sets a path.
+    """
+    server = {
+        'command': sys.executable,
+        'args': [str(FAKE_SERVER)],
+        'env': {'FAKE_MCP_LOG': str(tmp_path / 'server.log'), **(env or {})}
+    }
+    if timeout:
+        server['timeout'] = timeout
+    if framing:
+        server['framing'] = framing
+        server['env']['FAKE_MCP_FRAMING'] = framing
+    config_path = tmp_path / 'mcp.json'
+    config_path.write_text(json.dumps({
+        'mcpServers': {'weather': server, 'stock': server},
+        'caching': {'persistent': False, **(caching or {})}
+    }))
+    return MCPClient(config_path)
+
+
+def server_log(tmp_path):
+    """Methods received by the fake servers, minus the handshakes."""
+    log_path = tmp_path / 'server.log'
+    if not log_path.exists():
+        return []
+    return [line for line in log_path.read_text().splitlines() if line != 'initialize']
+
+
+class FakeHttpServer:
+    """
+    Streamable HTTP MCP endpoint, the handler of an httpx.MockTransport.
+    
+    Answers get_weather as a JSON body, as server-sent events ('sse', with
+    the response spread over several data lines) or with truncated JSON
+    ('malformed'); status makes data calls fail with that HTTP status.
+    Sessions listed in expired are answered with 404.
+    """
+    
+    URL = 'http://mcp.test/mcp'
+    
+    def __init__(self, reply='json', status=None):
+        self.reply = reply
+        self.status = status
+        self.expired = set()
+        self.calls = []  # (method, session id) of each request
+        self.deleted = []  # sessions ended by the client
+        self._sessions = itertools.count(1)
+    
+    def __call__(self, request):
+        session = request.headers.get('Mcp-Session-Id')
+        if request.method == 'DELETE':
+            self.deleted.append(session)
+            return httpx.Response(200)
+        message = json.loads(request.content)
+        if 'id' not in message:
+            return httpx.Response(202)
+        self.calls.append((message['method'], session))
+        
+        if message['method'] == 'initialize':
+            result = {'protocolVersion': message['params']['protocolVersion'], 'capabilities': {}}
+            return httpx.Response(
+                200,
+                json={'jsonrpc': '2.0', 'id': message['id'], 'result': result},
+                headers={'Mcp-Session-Id': f"s{next(self._sessions)}"}
+            )
+        if session in self.expired:
+            return httpx.Response(404)
+        if self.status:
+            return httpx.Response(self.status)
+        
+        point = {'timestamp': message['params']['start_date'], 'city': message['params']['city']}
+        response = {'jsonrpc': '2.0', 'id': message['id'], 'result': {'data': [point]}}
+        if self.reply == 'sse':
+            lines = json.dumps(response, indent=2).splitlines()
+            text = (
+                'event: message\ndata: {"jsonrpc": "2.0", "method": "notifications/progress"}\n\n'
+                + 'event: message\n' + ''.join(f"data: {line}\n" for line in lines) + '\n'
+            )
+            return httpx.Response(200, text=text, headers={'Content-Type': 'text/event-stream'})
+        if self.reply == 'malformed':
+            return httpx.Response(
+                200, content=b'{"jsonrpc": "2.0", "id": ', headers={'Content-Type': 'application/json'}
+            )
+        return httpx.Response(200, json=response)
+    
+    def data_calls(self):
+        return [call for call in self.calls if call[0] != 'initialize']
+
+
+def make_http_client(tmp_path, server):
+    """MCPClient whose weather server is the FakeHttpServer server."""
+    config_path = tmp_path / 'mcp.json'
+    config_path.write_text(json.dumps({
+        'mcpServers': {'weather': {'transport': 'http', 'url': FakeHttpServer.URL}},
+        'caching': {'persistent': False}
+    }))
+    client = MCPClient(config_path)
+    client._http = httpx.AsyncClient(transport=httpx.MockTransport(server))
+    return client
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Retry transport failures without sleeping."""
+    monkeypatch.setattr(mcp_client, '_backoff_delay', lambda attempt: 0)
+
+
+def cities(data):
+    return [points[0]['city'] for points in data]
+
+
+class TestFraming:
+    """Requests and batches round-trip in both stdio framings"""
+    
+    @pytest.mark.parametrize('framing', [None, 'content-length'])
+    def test_single_and_batch_requests(self, tmp_path, framing):
+        """A single request and a batch both return the servers' data"""
+        with make_client(tmp_path, framing=framing) as client:
+            assert cities([client.get_weather_data('Tokyo', START_DATE, END_DATE)]) == ['Tokyo']
+            assert cities(client.get_weather_data_batch(['Paris', 'Lima'], START_DATE, END_DATE)) == ['Paris', 'Lima']
+        
+        assert server_log(tmp_path) == ['get_weather', 'batch 2', 'get_weather', 'get_weather']
+
+
+class TestBatchDemux:
+    """Batched responses are matched to their requests by id"""
+    
+    def test_reversed_batch_responses(self, tmp_path):
+        """Results come back in request order although the server answers in reverse"""
+        names = ['Tokyo', 'Paris', 'Lima', 'Oslo']
+        with make_client(tmp_path) as client:
+            data = client.get_weather_data_batch(names, START_DATE, END_DATE)
+        
+        assert cities(data) == names
+        assert server_log(tmp_path).count('batch 4') == 1
+    
+    def test_mixed_batch(self, tmp_path):
+        """Weather and stock requests of one batch land in their own slots"""
+        requests = [
+            ('stock', 'AAPL', START_DATE, END_DATE),
+            ('weather', 'Tokyo', START_DATE, END_DATE),
+            ('stock', 'MSFT', START_DATE, END_DATE)
+        ]
+        with make_client(tmp_path) as client:
+            data = client.get_batch(requests)
+        
+        assert data[0][0]['symbol'] == 'AAPL'
+        assert data[1][0]['city'] == 'Tokyo'
+        assert data[2][0]['symbol'] == 'MSFT'
+    
+    
+    def test_batch_retried_after_timeout(self, tmp_path, no_backoff):
+        """A batch left unanswered is sent again to a restarted server"""
+        env = {'FAKE_MCP_DROP_FIRST': str(tmp_path / 'dropped')}
+        with make_client(tmp_path, env=env, timeout=500) as client:
+            data = client.get_weather_data_batch(['Tokyo', 'Paris'], START_DATE, END_DATE)
+        
+        assert cities(data) == ['Tokyo', 'Paris']
+        assert server_log(tmp_path) == ['dropped', 'batch 2', 'get_weather', 'get_weather']
+    
+    def test_single_fetch_joins_batch(self, tmp_path):
+        """A fetch of data a batch is already fetching isn't sent again"""
+        requests = [('weather', 'Tokyo', START_DATE, END_DATE), ('weather', 'Paris', START_DATE, END_DATE)]
+        with make_client(tmp_path) as client:
+            async def fetch_both():
+                return await asyncio.gather(
+                    client.aget_batch(requests),
+                    client.aget_weather_data('Tokyo', START_DATE, END_DATE)
+                )
+            batch, single = client._run(fetch_both())
+        
+        assert cities(batch) == ['Tokyo', 'Paris']
+        assert single == batch[0]
+        assert server_log(tmp_path) == ['batch 2', 'get_weather', 'get_weather']
+
+
+class TestCacheEviction:
+    """The LFU policy evicts the least used entry, oldest first on ties"""
+    
+    def test_lfu_tie_breaking(self, tmp_path):
+        """Unused entries go before used ones, the least recently used first"""
+        with make_client(tmp_path, caching={'maxSize': 3, 'policy': 'lfu'}) as client:
+            for city in ['A', 'B', 'C', 'A', 'D', 'E']:
+                client.get_weather_data(city, START_DATE, END_DATE)
+            
+            cached = [entry.data[0]['city'] for entry in client._cache.values()]
+            stats = client.cache_stats()
+        
+        # D evicts B (tied with C at no hits, but older); E then evicts C
+        assert cached == ['A', 'D', 'E']
+        assert stats['evictions'] == 2
+        assert stats['hits'] == 1
+        assert stats['misses'] == 5
+        assert stats['size'] == 3
+    
+    def test_lru_eviction_count(self, tmp_path):
+        """LRU evicts the least recently used entry regardless of its hits"""
+        with make_client(tmp_path, caching={'maxSize': 2}) as client:
+            for city in ['A', 'A', 'B', 'C']:
+                client.get_weather_data(city, START_DATE, END_DATE)
+            
+            cached = [entry.data[0]['city'] for entry in client._cache.values()]
+            stats = client.cache_stats()
+        
+        assert cached == ['B', 'C']
+        assert stats['evictions'] == 1
+
+
+class TestRevalidation:
+    """Expired entries with an etag are revalidated with a head request"""
+    
+    def test_unchanged_data_is_not_refetched(self, tmp_path):
+        """A server reporting the etag unchanged renews the entry"""
+        env = {'FAKE_MCP_ETAG': 'v1', 'FAKE_MCP_REVALIDATE': '1'}
+        with make_client(tmp_path, env=env, caching={'ttlByType': {'weather': 0}}) as client:
+            first = client.get_weather_data('Tokyo', START_DATE, END_DATE)
+            second = client.get_weather_data('Tokyo', START_DATE, END_DATE)
+            stats = client.cache_stats()
+        
+        assert second == first
+        assert stats['revalidations'] == 1
+        assert server_log(tmp_path) == ['get_weather', 'head']
+    
+    def test_method_not_found_disables_revalidation(self, tmp_path):
+        """After a "method not found" head, the server's data is only refetched"""
+        with make_client(tmp_path, env={'FAKE_MCP_ETAG': 'v1'}, caching={'ttlByType': {'weather': 0}}) as client:
+            for _ in range(3):
+                assert cities([client.get_weather_data('Tokyo', START_DATE, END_DATE)]) == ['Tokyo']
+            stats = client.cache_stats()
+        
+        assert stats['revalidations'] == 0
+        assert server_log(tmp_path) == ['get_weather', 'head', 'get_weather', 'get_weather']
+
+
+class TestPermanentFailures:
+    """Failures a retry can't fix give None at once"""
+    
+    def test_malformed_response_is_not_retried(self, tmp_path):
+        """A response that fails to decode isn't waited on or sent again"""
+        with make_client(tmp_path, env={'FAKE_MCP_MALFORMED': '1'}, timeout=2000) as client:
+            started = time.monotonic()
+            assert client.get_weather_data('Tokyo', START_DATE, END_DATE) is None
+            elapsed = time.monotonic() - started
+        
+        assert elapsed < 2
+        assert server_log(tmp_path) == ['get_weather']
+    
+    def test_server_exiting_at_startup_is_not_restarted(self, tmp_path, caplog):
+        """A server that exits during the handshake is started once, its stderr logged"""
+        with make_client(tmp_path, env={'FAKE_MCP_EXIT': '3'}) as client:
+            assert client.get_weather_data('Tokyo', START_DATE, END_DATE) is None
+        
+        assert server_log(tmp_path) == ['exit']
+        assert 'boom' in caplog.text
+        assert 'exit code 3' in caplog.text
+
+
+class TestHttpTransport:
+    """Streamable HTTP servers answer with JSON bodies or server-sent events"""
+    
+    @pytest.mark.parametrize('reply', ['json', 'sse'])
+    def test_replies(self, tmp_path, reply):
+        """Both reply formats give the data; later requests carry the session id"""
+        server = FakeHttpServer(reply=reply)
+        with make_http_client(tmp_path, server) as client:
+            assert cities([client.get_weather_data('Tokyo', START_DATE, END_DATE)]) == ['Tokyo']
+            assert cities([client.get_weather_data('Paris', START_DATE, END_DATE)]) == ['Paris']
+        
+        assert server.calls == [('initialize', None), ('get_weather', 's1'), ('get_weather', 's1')]
+        assert server.deleted == ['s1']
+    
+    def test_expired_session_reconnects(self, tmp_path, no_backoff):
+        """A 404 for the session id starts a new session and retries"""
+        server = FakeHttpServer()
+        server.expired.add('s1')
+        with make_http_client(tmp_path, server) as client:
+            assert cities([client.get_weather_data('Tokyo', START_DATE, END_DATE)]) == ['Tokyo']
+        
+        assert server.calls == [
+            ('initialize', None), ('get_weather', 's1'), ('initialize', None), ('get_weather', 's2')
+        ]
+    
+    @pytest.mark.parametrize('status, attempts', [(400, 1), (403, 1), (408, 4), (429, 4), (500, 4), (503, 4)])
+    def test_status_classification(self, tmp_path, no_backoff, status, attempts):
+        """Client errors fail at once; timeouts, throttling and server errors are retried"""
+        server = FakeHttpServer(status=status)
+        with make_http_client(tmp_path, server) as client:
+            assert client.get_weather_data('Tokyo', START_DATE, END_DATE) is None
+        
+        assert len(server.data_calls()) == attempts
+    
+    def test_malformed_reply_is_not_retried(self, tmp_path, no_backoff, caplog):
+        """A body that isn't valid JSON fails the call permanently"""
+        server = FakeHttpServer(reply='malformed')
+        with make_http_client(tmp_path, server) as client:
+            assert client.get_weather_data('Tokyo', START_DATE, END_DATE) is None
+        
+        assert len(server.data_calls()) == 1
+        assert 'failed permanently: Malformed MCP response' in caplog.text
+
+
+class TestDiskCache:
+    """Cached data outlives the client through the disk cache"""
+    
+    def test_round_trip_across_clients(self, tmp_path):
+        """A second client serves data fetched by the first from disk"""
+        caching = {'persistent': True, 'path': str(tmp_path / 'cache.db')}
+        with make_client(tmp_path, caching=caching) as client:
+            first = client.get_weather_data('Tokyo', START_DATE, END_DATE)
+        
+        with make_client(tmp_path, caching=caching) as client:
+            second = client.get_weather_data('Tokyo', START_DATE, END_DATE)
+            stats = client.cache_stats()
+        
+        assert second == first
+        assert stats['disk_hits'] == 1
+        assert server_log(tmp_path) == ['get_weather']
+    
+    def test_close_stops_disk_worker(self, tmp_path):
+        """Closing the client stops the disk worker; the next use restarts it"""
+        caching = {'persistent': True, 'path': str(tmp_path / 'cache.db')}
+        with make_client(tmp_path, caching=caching) as client:
+            client.get_weather_data('Tokyo', START_DATE, END_DATE)
+            executor = client._disk._executor
+        
+        assert executor._shutdown
+        assert client._disk._executor is None
+        assert client.get_stock_data('AAPL', START_DATE, END_DATE)
+        client.close()
+    
+    def test_off_without_config(self, tmp_path):
+        """Without a config file nothing is written to disk"""
+        client = MCPClient(tmp_path / 'missing.json')
+        assert client._disk is None
@@ -0,0 +1,12 @@
+"""Initialize utilities package."""
+
+from backend.utils.dates import parse_iso, parse_range, resolve_date_range
+from backend.utils.responses import (
+    ORJSONProvider, ORJSONResponse, dumps, iter_json, json_response, json_stream_response
+)
+
+__all__ = [
+    'ORJSONProvider', 'ORJSONResponse', 'dumps', 'iter_json', 'json_response',
+    'json_stream_response',
+    'parse_iso', 'parse_range', 'resolve_date_range'
+]
@@ -0,0 +1,76 @@
+"""
+Date range parsing helpers shared by the data and correlation routes.
+Parsed ranges and ISO timestamps are memoized, since requests reuse a
+handful of presets (7d, 30d, 90d) and dashboard date bounds.
+"""
+
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Tuple
+
+# Default preset when a request carries no usable date range
+DEFAULT_DATE_RANGE = '30d'
+
+# Width of the time bucket preset ranges are anchored to (seconds)
+RANGE_BUCKET_SECONDS = 3600
+
+
+def current_bucket() -> int:
+    """Return the index of the current range bucket."""
+    return int(time.time()) // RANGE_BUCKET_SECONDS
+
+
+@lru_cache(maxsize=64)
+def parse_range(date_range: str, now_bucket: int) -> Tuple[datetime, datetime]:
+    """
+    Parse a preset range like '30d' into (start, end) datetimes.
+
+    The range ends at the close of the bucket, so every request within
+    the same hour gets the same bounds and the cache entry stays valid.
+
+    Raises:
+        ValueError: If the preset is not a number of days
+    """
+    days = int(date_range.rstrip('d'))
+    end_date = datetime.fromtimestamp((now_bucket + 1) * RANGE_BUCKET_SECONDS)
+    return end_date - timedelta(days=days), end_date
+
+
+@lru_cache(maxsize=256)
+def parse_iso(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp."""
+    return datetime.fromisoformat(value)
+
+
+def date_range_key(date_range: Any) -> str:
+    """
+    Canonical form of a request's dateRange ('30d', or 'start/end' in ISO).
+
+    Stored with correlation results so a result is only reused for
+    the same requested range.
+
+    Raises:
+        ValueError: If the range can't be parsed
+    """
+    if isinstance(date_range, dict):
+        start_date, end_date = resolve_date_range(date_range)
+        return f"{start_date.isoformat()}/{end_date.isoformat()}"
+    if not isinstance(date_range, str):
+        date_range = DEFAULT_DATE_RANGE
+    return f"{int(date_range.rstrip('d'))}d"
+
+
+def resolve_date_range(date_range: Any) -> Tuple[datetime, datetime]:
+    """
+    Resolve a request's dateRange into (start, end) datetimes.
+
+    Args:
+        date_range: Preset string ('7d', '30d', '90d'), a dict with ISO
+            'start' and 'end', or None for the default 30 days
+    """
+    if isinstance(date_range, dict):
+        return parse_iso(date_range.get('start')), parse_iso(date_range.get('end'))
+    if not isinstance(date_range, str):
+        date_range = DEFAULT_DATE_RANGE
+    return parse_range(date_range, current_bucket())
@@ -0,0 +1,134 @@
+"""
+JSON serialization helpers backed by orjson.
+Encodes datetimes and numpy values in C instead of going through json.dumps.
+"""
+
+import io
+import logging
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Dict, Iterator, Sequence
+
+import orjson
+from flask import Response, stream_with_context
+from flask.json.provider import JSONProvider
+
+logger = logging.getLogger(__name__)
+
+# Check if pyarrow is available for Arrow IPC responses
+try:
+    import pyarrow
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+    logger.info("pyarrow not installed. Arrow responses disabled.")
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# Naive datetimes are emitted without an offset, matching datetime.isoformat()
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+# Array items serialized per chunk of a streamed response
+STREAM_BATCH_SIZE = 256
+
+
+def _default(obj: Any) -> Any:
+    """Serialize types orjson doesn't support natively (Numeric columns)."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize an object to JSON bytes."""
+    return orjson.dumps(obj, default=_default, option=JSON_OPTIONS)
+
+
+class ORJSONResponse(Response):
+    """Response class for pre-serialized JSON bodies."""
+
+    default_mimetype = 'application/json'
+
+
+def json_response(obj: Any, status: int = 200) -> ORJSONResponse:
+    """
+    Build a JSON response with orjson.
+
+    Args:
+        obj: JSON-serializable payload (datetimes, Decimals and numpy values allowed)
+        status: HTTP status code
+
+    Returns:
+        ORJSONResponse instance
+    """
+    return ORJSONResponse(dumps(obj), status=status)
+
+
+def iter_json(obj: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Serialize a JSON object incrementally.
+
+    Nested dicts are expanded in place, iterators and generators become
+    arrays emitted STREAM_BATCH_SIZE items per chunk, and callables are
+    called when reached, so they can report on the items streamed before
+    them. Everything else is serialized by dumps().
+    """
+    yield b'{'
+    for index, (key, value) in enumerate(obj.items()):
+        yield (b',' if index else b'') + dumps(key) + b':'
+        if callable(value):
+            value = value()
+        if isinstance(value, dict):
+            yield from iter_json(value)
+        elif isinstance(value, Iterator):
+            yield from _iter_json_array(value)
+        else:
+            yield dumps(value)
+    yield b'}'
+
+
+def _iter_json_array(items: Iterator[Any]) -> Iterator[bytes]:
+    """Serialize an iterator as a JSON array in batches."""
+    separator = b'['
+    while True:
+        batch = list(islice(items, STREAM_BATCH_SIZE))
+        if not batch:
+            break
+        yield separator + b','.join(dumps(item) for item in batch)
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+
+def json_stream_response(obj: Dict[str, Any], status: int = 200) -> ORJSONResponse:
+    """
+    Build a streamed JSON response, see iter_json().
+
+    The generator runs inside the request context, so database cursors
+    behind streamed iterators stay usable. Errors raised while streaming
+    truncate the body; raise them before building the response.
+    """
+    return ORJSONResponse(stream_with_context(iter_json(obj)), status=status)
+
+
+def arrow_response(columns: Dict[str, Sequence[Any]], status: int = 200) -> Response:
+    """
+    Build an Arrow IPC stream response from a column mapping.
+
+    Column types are inferred by pyarrow; naive datetimes become
+    timestamp[us] columns. Requires ARROW_AVAILABLE.
+    """
+    table = pyarrow.table({name: list(values) for name, values in columns.items()})
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue(), status=status, mimetype=ARROW_STREAM_MIMETYPE)
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider so jsonify() and request.get_json() use orjson too."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
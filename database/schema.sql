@@ -19,7 +19,11 @@ CREATE TABLE IF NOT EXISTS weather_data (
 );
 
 -- Indexes for weather_data
-CREATE INDEX IF NOT EXISTS idx_weather_city_timestamp ON weather_data(city, timestamp DESC);
+-- Covering index: range scans read the numeric columns from the index leaf pages
+CREATE INDEX IF NOT EXISTS idx_weather_city_ts_incl ON weather_data(city, timestamp)
+    INCLUDE (temperature, humidity, precipitation, wind_speed);
+-- One reading per city and timestamp (ingestion relies on ON CONFLICT DO NOTHING)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_weather_city_ts ON weather_data(city, timestamp);
 CREATE INDEX IF NOT EXISTS idx_weather_timestamp ON weather_data(timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_weather_city ON weather_data(city);
 
@@ -44,7 +48,11 @@ CREATE TABLE IF NOT EXISTS stock_data (
 );
 
 -- Indexes for stock_data
-CREATE INDEX IF NOT EXISTS idx_stock_symbol_timestamp ON stock_data(symbol, timestamp DESC);
+-- Covering index: range scans read the numeric columns from the index leaf pages
+CREATE INDEX IF NOT EXISTS idx_stock_symbol_ts_incl ON stock_data(symbol, timestamp)
+    INCLUDE (open_price, close_price, high_price, low_price, volume);
+-- One bar per symbol and timestamp (ingestion relies on ON CONFLICT DO NOTHING)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_stock_symbol_ts ON stock_data(symbol, timestamp);
 CREATE INDEX IF NOT EXISTS idx_stock_timestamp ON stock_data(timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_stock_symbol ON stock_data(symbol);
 
@@ -65,13 +73,14 @@ CREATE TABLE IF NOT EXISTS correlation_results (
     significance_level VARCHAR(20),
     analysis_notes TEXT,
     anomalies_detected INTEGER DEFAULT 0,
+    date_range VARCHAR(64),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- Indexes for correlation_results
-CREATE INDEX IF NOT EXISTS idx_correlation_city_symbol ON correlation_results(city, symbol);
-CREATE INDEX IF NOT EXISTS idx_correlation_calculated_at ON correlation_results(calculated_at DESC);
+CREATE INDEX IF NOT EXISTS ix_corr_city_symbol_calc ON correlation_results(city, symbol, calculated_at DESC);
+CREATE INDEX IF NOT EXISTS ix_corr_calc_at ON correlation_results(calculated_at DESC);
 CREATE INDEX IF NOT EXISTS idx_correlation_values ON correlation_results(correlation_value, p_value);
 
 -- Function to update updated_at timestamp